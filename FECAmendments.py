@@ -0,0 +1,218 @@
+# FEC Amendments
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module works out which filings have been replaced by amendments,
+so FEC Parser can record it as each header is parsed rather than
+leaving it to the database.
+
+A committee that amends a report files the whole report again under a
+new ImageID. A filing is superseded when the same committee has filed
+another report of the same form with the same report code and coverage
+dates and a higher ImageID, which is the rule the UpdateF3Active,
+UpdateF3PActive and UpdateF3XActive triggers used. Filings with an
+empty committee ID, report code or coverage date are never superseded.
+
+Every filing FEC Parser has seen is kept in a small SQLite database,
+Amendments.db in the main directory, indexed on the form, committee ID,
+report code and coverage dates. When a header is parsed, the filings for
+the same report are looked up in the index, so the work done for each
+filing doesn't grow as the history piles up. Each superseded filing
+records the ImageID of the filing that replaces it, which is always the
+latest one.
+
+As each filing is parsed, FEC Parser writes the filings it supersedes,
+or the filing that supersedes it, to a timestamped supersede map,
+Supersedes_<timestamp>.txt in the output directory, with the columns
+FormType (F3, F3P or F3X), ImageID and SupersededBy. To bring the Active
+column up to date in your own database, set Active to 0 for each ImageID
+in the map. If you use SQL Server, FEC Parser instead runs
+usp_UpdateActive (see FECScraper.sql) once at the end of each run.
+
+To fill the database in from header files written by earlier runs, or to
+print the whole supersede map, run:
+    python FECAmendments.py Output\\FormF3XHeaders_2012_01_15_09_00_00.txt
+    python FECAmendments.py --map
+"""
+
+# Import needed libraries
+import sqlite3, threading
+from FECSchedules import forms
+
+# Column headers for the supersede map
+mapheaderstring = 'FormType\tImageID\tSupersededBy\n'
+
+
+class Resolver(object):
+
+    def __init__(self, path):
+        self.path = path
+
+        # Like the manifest, one connection is shared by download
+        # threads behind a lock, and parser worker processes each open
+        # their own and rely on SQLite's locking.
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS filings ('
+                          'imageid INTEGER PRIMARY KEY, '
+                          'form TEXT NOT NULL, '
+                          'commid TEXT, '
+                          'reptcode TEXT, '
+                          'fromdate TEXT, '
+                          'todate TEXT, '
+                          'supersededby INTEGER)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS reports '
+                          'ON filings (form, commid, reptcode, fromdate, todate)')
+        self.conn.commit()
+
+    def resolve(self, form, imageid, key):
+        """
+        Record a filing and work out whether it supersedes, or is
+        superseded by, other filings of the same report. form is 'F3',
+        'F3P' or 'F3X' and key is the tuple returned by
+        FECRecords.Filing.report_key(), or None.
+
+        Returns a list of (imageid, supersededby) pairs for the filings
+        this filing supersedes, or for this filing if it has been
+        superseded. Resolving the same filing again returns the same
+        pairs.
+        """
+        imageid = int(imageid)
+        self.lock.acquire()
+        try:
+            # Take the write lock up front so worker processes can't
+            # both decide they have the latest filing
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                pairs = self.record(form, imageid, key)
+                self.conn.commit()
+            except:
+                self.conn.rollback()
+                raise
+            return pairs
+        finally:
+            self.lock.release()
+
+    def record(self, form, imageid, key):
+        row = self.conn.execute('SELECT form, commid, reptcode, fromdate, todate FROM filings '
+                                'WHERE imageid = ?', (imageid,)).fetchone()
+        if row is not None:
+            form, key = row[0], row[1:]
+            if None in key:
+                key = None
+        else:
+            self.conn.execute('INSERT INTO filings (imageid, form, commid, reptcode, fromdate, todate) '
+                              'VALUES (?, ?, ?, ?, ?, ?)', (imageid, form) + tuple(key or (None,) * 4))
+        if key is None:
+            return []
+
+        # The latest filing of the report supersedes all the others
+        report = (form,) + tuple(key)
+        latest = self.conn.execute('SELECT MAX(imageid) FROM filings WHERE form = ? AND commid = ? '
+                                   'AND reptcode = ? AND fromdate = ? AND todate = ?', report).fetchone()[0]
+        self.conn.execute('UPDATE filings SET supersededby = ? WHERE form = ? AND commid = ? AND reptcode = ? '
+                          'AND fromdate = ? AND todate = ? AND imageid < ? '
+                          'AND (supersededby IS NULL OR supersededby <> ?)', (latest,) + report + (latest, latest))
+        self.conn.execute('UPDATE filings SET supersededby = NULL WHERE imageid = ?', (latest,))
+        return self.conn.execute('SELECT imageid, supersededby FROM filings WHERE form = ? AND commid = ? '
+                                 'AND reptcode = ? AND fromdate = ? AND todate = ? '
+                                 'AND supersededby IS NOT NULL AND (imageid = ? OR supersededby = ?) '
+                                 'ORDER BY imageid', report + (imageid, imageid)).fetchall()
+
+    def active(self, imageid):
+        """
+        Return True if a filing hasn't been superseded, False if it has
+        or None if it hasn't been resolved.
+        """
+        self.lock.acquire()
+        try:
+            row = self.conn.execute('SELECT supersededby FROM filings WHERE imageid = ?',
+                                    (int(imageid),)).fetchone()
+        finally:
+            self.lock.release()
+        return row and row[0] is None
+
+    def superseded(self, imageid):
+        """
+        Return the ImageIDs of the filings a filing supersedes.
+        """
+        self.lock.acquire()
+        try:
+            rows = self.conn.execute('SELECT imageid FROM filings WHERE supersededby = ? ORDER BY imageid',
+                                     (int(imageid),)).fetchall()
+        finally:
+            self.lock.release()
+        return [row[0] for row in rows]
+
+    def supersede_map(self):
+        """
+        Return a list of (form, imageid, supersededby) tuples for every
+        superseded filing.
+        """
+        self.lock.acquire()
+        try:
+            return self.conn.execute('SELECT form, imageid, supersededby FROM filings '
+                                     'WHERE supersededby IS NOT NULL ORDER BY imageid').fetchall()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.conn.close()
+
+
+def load_header_file(resolver, headerfile):
+    """
+    Resolve every filing in a header file written by FEC Parser. Returns
+    the number of filings.
+    """
+    form = None
+    for key in forms:
+        if headerfile.replace('\\', '/').split('/')[-1].startswith(forms[key]['filename']):
+            form = forms[key]
+    if form is None:
+        print 'Skipping ' + headerfile + ': not a header file.'
+        return 0
+    datafile = open(headerfile, 'rb')
+    try:
+        columns = datafile.readline().rstrip('\r\n').split('\t')
+        indexes = [columns.index(name) for name in form['reportcolumns']]
+        count = 0
+        for line in datafile:
+            fields = line.rstrip('\r\n').split('\t')
+            key = []
+            for i in indexes:
+                value = i < len(fields) and fields[i].replace("''", "'").strip().upper() or ''
+                key.append(value != 'NULL' and value or None)
+            if None in key:
+                key = None
+            resolver.resolve(form['key'], fields[0], key and tuple(key))
+            count += 1
+        return count
+    finally:
+        datafile.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    # Use the same settings as FEC Parser
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    amendmentsfile = maindir + 'Amendments.db'
+
+    parser = argparse.ArgumentParser(description='Work out which FEC filings have been superseded by amendments.')
+    parser.add_argument('files', nargs='*', help='header files written by FEC Parser to add')
+    parser.add_argument('--map', action='store_true', help='print the supersede map')
+    args = parser.parse_args()
+
+    resolver = Resolver(amendmentsfile)
+    for headerfile in args.files:
+        print 'Adding ' + str(load_header_file(resolver, headerfile)) + ' filings from ' + headerfile + '.'
+    if args.map:
+        print mapheaderstring,
+        for form, imageid, supersededby in resolver.supersede_map():
+            print form + '\t' + str(imageid) + '\t' + str(supersededby)
+    resolver.close()
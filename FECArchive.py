@@ -0,0 +1,180 @@
+# FEC Archive
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module lets FEC Parser read data files straight out of the ZIP
+archives the FEC publishes for bulk downloads of electronic filings, so
+a cycle can be backfilled without first extracting hundreds of thousands
+of .fec files into the import directory.
+
+Put the archives in the import directory, alongside any loose data
+files. Each .fec member of an archive is parsed as if it were a file of
+its own: its header and rows are decompressed as they are read, and
+when more than one worker is used, members are handed out to the
+worker processes just like files. Members are never split among
+workers, however large they are, because a member can't be read from
+the middle.
+
+Within FEC Parser, a member is named by the archive's path and the
+member's name joined by a vertical bar, which can't appear in a Windows
+path, such as Import\\20120115.zip|421841.fec. Each process opens an
+archive once and keeps it open, so its list of members is read only
+once no matter how many members are parsed.
+
+As each member is finished, its state is recorded in the manifest (see
+FECManifest.py) under its filing ID, as it would be for a loose file,
+with the archive and member as its location. A member that belongs in
+review is copied out of the archive into the review directory. When FEC
+Parser is started again, members already recorded as parsed or sent to
+review are skipped, so an archive that was only partly parsed when a
+run was stopped or crashed picks up where it left off. Once every member
+of an archive has been recorded, the archive is moved to the processed
+directory. Archives aren't picked up in watch mode.
+
+To see how many members of an archive are still to be parsed, run:
+    python FECArchive.py Import\\20120115.zip
+"""
+
+# Import needed libraries
+import os, shutil, zipfile
+from FECManifest import fileid_from_name, PARSED, REVIEW
+
+# Separates an archive's path from a member's name
+membersep = '|'
+
+# Archives opened by this process
+archives = {}
+
+
+def member_path(archive, member):
+    """
+    Return the name FEC Parser uses for a member of an archive.
+    """
+    return archive + membersep + member
+
+
+def is_member(datafile):
+    """
+    Return True if a data file is a member of an archive.
+    """
+    return membersep in datafile
+
+
+def split_member(datafile):
+    """
+    Return the path of the archive holding a member and the member's
+    name within it.
+    """
+    return tuple(datafile.rsplit(membersep, 1))
+
+
+def member_filename(datafile):
+    """
+    Return the name of a member without the archive or any folders it
+    is in, such as 421841.fec.
+    """
+    return split_member(datafile)[1].split('/')[-1]
+
+
+def open_archive(archive):
+    """
+    Return an open zipfile.ZipFile for an archive, opening it the first
+    time it is asked for.
+    """
+    if archive not in archives:
+        archives[archive] = zipfile.ZipFile(archive, 'r')
+    return archives[archive]
+
+
+def close_archives():
+    """
+    Close every archive opened by this process.
+    """
+    for archive in archives.values():
+        archive.close()
+    archives.clear()
+
+
+def list_members(archive):
+    """
+    Return the names FEC Parser uses for the data files in an archive, in
+    the order they are stored.
+    """
+    return [member_path(archive, info.filename) for info in open_archive(archive).infolist()
+            if info.filename.lower().endswith('.fec') and fileid_from_name(info.filename.split('/')[-1])]
+
+
+def pending_members(archive, finished):
+    """
+    Return the members of an archive still to be parsed. finished is a
+    set of the filing IDs already parsed or sent to review.
+    """
+    return [datafile for datafile in list_members(archive)
+            if fileid_from_name(member_filename(datafile)) not in finished]
+
+
+def finished_fileids(manifest):
+    """
+    Return a set of the filing IDs the manifest records as parsed or
+    sent to review.
+    """
+    return set(manifest.fileids(PARSED)) | set(manifest.fileids(REVIEW))
+
+
+def open_member(datafile):
+    """
+    Open a member for reading. Its contents are decompressed as they are
+    read.
+    """
+    archive, member = split_member(datafile)
+    return open_archive(archive).open(member)
+
+
+def member_size(datafile):
+    """
+    Return the size of a member once it has been decompressed.
+    """
+    archive, member = split_member(datafile)
+    return open_archive(archive).getinfo(member).file_size
+
+
+def extract_member(datafile, destination):
+    """
+    Copy a member out of its archive to destination.
+    """
+    source = open_member(datafile)
+    try:
+        output = open(destination, 'wb')
+        try:
+            shutil.copyfileobj(source, output, 1048576)
+        finally:
+            output.close()
+    finally:
+        source.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    from FECManifest import Manifest
+
+    # Use the same settings as FEC Parser
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    manifestfile = maindir + 'Manifest.db'
+
+    parser = argparse.ArgumentParser(description='Show how many members of FEC bulk archives are left to parse.')
+    parser.add_argument('archives', nargs='+', help='ZIP archives of FEC data files')
+    args = parser.parse_args()
+
+    manifest = Manifest(manifestfile)
+    finished = finished_fileids(manifest)
+    for path in args.archives:
+        members = list_members(path)
+        pending = pending_members(path, finished)
+        print os.path.basename(path) + ': ' + str(len(members)) + ' members, ' + \
+              str(len(members) - len(pending)) + ' finished, ' + str(len(pending)) + ' to parse.'
+    close_archives()
+    manifest.close()
@@ -0,0 +1,380 @@
+# FEC Benchmark
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module measures how fast FEC Parser parses filings without having
+to download any real ones.
+
+It generates synthetic Form 3 data files that look like the real thing:
+ * HDR versions 6.4, 7.0 and 8.0, including the 6.4 F3P header layout
+and the column 8.0 dropped from Schedules A, B and E.
+ * F3, F3P and F3X headers.
+ * A configurable mix of Schedule A, B, C, C1, C2, D, E and text rows,
+with amounts, dates, states and names in the columns they belong in.
+ * Fields padded with spaces, and the quotation mark and delimiter
+problems FEC Parser has to clean up: quoted fields, doubled single and
+double quotation marks, and spaces around delimiters.
+Files are generated from a fixed seed, so every run parses exactly the
+same bytes.
+
+The runner parses one filing per header version and schedule, plus one
+with the full mix for each header version, and reports rows per second,
+megabytes per second and peak memory use for each. Each filing is
+parsed in a fresh process with FEC Parser's own parse_lines() and output
+files, so the figures cover the whole hot loop and the memory figure
+isn't inflated by earlier cases. Database integration and bulk loading
+are turned off.
+
+Save a run's results and compare a later run against them to catch
+regressions, for example before and after a change:
+    python FECBenchmark.py --save before.json
+    python FECBenchmark.py --compare before.json
+A case that is more than --tolerance percent slower than the saved run is
+flagged, and the script exits with status 1. Run it with --help for the
+options that control the filings it generates.
+"""
+
+# Import needed libraries
+import os, sys, time, json, zlib, random, shutil, tempfile, multiprocessing
+from FECSchedules import prefixes, schedules
+from FECColumnar import amountcolumns
+
+# Script variables
+delimiter = chr(28)
+versions = ('6.4', '7.0', '8.0')
+
+# Record type used for each schedule's rows
+recordtypes = {'SA': 'SA11AI', 'SB': 'SB17', 'SC/': 'SC/10', 'SC1/': 'SC1/10',
+               'SC2/': 'SC2/10', 'SD': 'SD10', 'SE': 'SE', 'TEXT': 'TEXT'}
+
+# Share of rows from each schedule in a typical filing
+defaultmix = {'SA': 60, 'SB': 25, 'SC/': 1, 'SC1/': 1, 'SC2/': 1, 'SD': 3, 'SE': 5, 'TEXT': 4}
+
+# Number of fields in the second header row of each form, before FEC
+# Parser adds the ImageID. 6.4 F3P headers are four fields short.
+headerwidths = {'F3': 93, 'F3P': 206, 'F3X': 123}
+
+words = ['SMITH', 'JONES', "O'BRIEN", 'GARCIA', 'JOHN', 'MARY', 'ROBERT', 'LINDA',
+         'ACME CORP', 'RETIRED', 'ATTORNEY', 'ENGINEER', 'SELF-EMPLOYED', 'HOMEMAKER',
+         '123 MAIN ST', 'PO BOX 77', 'SUITE 400', 'WASHINGTON', 'SPRINGFIELD', 'AUSTIN']
+states = ['DC', 'VA', 'MD', 'NY', 'CA', 'TX', 'FL', 'IL', 'OH', 'PA']
+
+
+class Generator(object):
+    """
+    Generates synthetic data files from a fixed seed.
+
+    padding is the share of fields padded with spaces and pathologies
+    the share of rows with quotation mark or delimiter problems.
+    """
+
+    def __init__(self, seed=0, padding=0.1, pathologies=0.1):
+        self.random = random.Random(seed)
+        self.padding = padding
+        self.pathologies = pathologies
+        self.transid = 0
+
+    def value(self, column, recordtype):
+        """
+        Return a plausible value for a column.
+        """
+        rnd = self.random
+        if column in ('FormType', 'RecType'):
+            return recordtype
+        if 'CommID' in column or 'FECID' in column:
+            return 'C00%06d' % rnd.randint(0, 999999)
+        if column == 'TransID':
+            self.transid += 1
+            return recordtype[:2] + '.' + str(self.transid)
+        if column in amountcolumns:
+            return '%.2f' % (rnd.randint(1, 500000) / 100.0)
+        if 'Date' in column:
+            return '2012%02d%02d' % (rnd.randint(1, 12), rnd.randint(1, 28))
+        if column.endswith('State'):
+            return rnd.choice(states)
+        if column.endswith('Zip'):
+            return rnd.choice(['20001', '223011234', '10001'])
+        if column == 'EntityType':
+            return rnd.choice(['IND', 'IND', 'IND', 'ORG', 'COM', 'PAC'])
+        if column == 'FullText':
+            return ' '.join([rnd.choice(words) for i in xrange(rnd.randint(5, 60))])
+        if column == 'ElecCode':
+            return rnd.choice(['P2012', 'G2012', ''])
+        if column.endswith(('Code', 'Flag', 'Office')):
+            return rnd.choice(['', '', 'X', 'Y'])
+        if rnd.random() < 0.5:
+            return ''
+        return rnd.choice(words)
+
+    def child_row(self, prefix, version):
+        """
+        Return a raw child row for a schedule.
+        """
+        rnd = self.random
+        recordtype = recordtypes[prefix]
+
+        # FEC Parser adds the ParentType and ImageID columns, and 8.0
+        # dropped the purpose code from Schedules A, B and E
+        columns = schedules[prefix]['columns'][2:]
+        if version == '8.0' and prefix in ('SA', 'SB', 'SE'):
+            columns = columns[:22] + columns[23:]
+        fields = [self.value(column, recordtype) for column in columns]
+
+        # Padding and pathologies. The record type is never padded.
+        if self.padding:
+            for i in xrange(1, len(fields)):
+                if rnd.random() < self.padding:
+                    fields[i] = ' ' * rnd.randint(1, 3) + fields[i] + ' ' * rnd.randint(0, 12)
+        if rnd.random() < self.pathologies:
+            problem = rnd.randint(0, 4)
+            if problem == 0:
+                fields = ['"' + field + '"' for field in fields]
+            elif problem == 1:
+                fields = [field.replace("'", "''") for field in fields]
+                fields[rnd.randrange(1, len(fields))] = "''"
+            elif problem == 2:
+                i = rnd.randrange(1, len(fields))
+                fields[i] = '""' + fields[i] + '""'
+            elif problem == 3:
+                return (' ' + delimiter + ' ').join(fields) + '\r\n'
+            else:
+                fields[-1] += '\t'
+        return delimiter.join(fields) + rnd.choice(['\r\n', '\r\n', '\n', delimiter + '\r\n'])
+
+    def header_rows(self, version, form):
+        """
+        Return the two header rows of a filing.
+        """
+        hdr1 = delimiter.join(['HDR', 'FEC', version, 'FECBenchmark', '1.0', '', '', '']) + '\r\n'
+        width = headerwidths[form]
+        if version == '6.4' and form == 'F3P':
+            width -= 4
+        fields = [form + 'N', 'C00431445', "FRIENDS OF O'BRIEN INC"] + \
+                 ['%d.00' % self.random.randint(0, 100000) for i in xrange(width - 3)]
+        return hdr1 + delimiter.join(fields) + '\r\n'
+
+    def filing(self, path, version='8.0', form='F3X', rows=10000, mix=None):
+        """
+        Write a data file with rows child rows drawn from mix, a
+        dictionary of schedule prefixes and weights. Returns the number
+        of bytes written.
+        """
+        mix = mix or defaultmix
+        choices = []
+        for prefix in prefixes:
+            choices += [prefix] * mix.get(prefix, 0)
+        output = open(path, 'wb')
+        try:
+            output.write(self.header_rows(version, form))
+            block = []
+            for i in xrange(rows):
+                block.append(self.child_row(self.random.choice(choices), version))
+                if len(block) >= 1000:
+                    output.write(''.join(block))
+                    block = []
+            output.write(''.join(block))
+        finally:
+            output.close()
+        return os.path.getsize(path)
+
+
+def parse_mix(text):
+    """
+    Parse a mix such as SA=60,SB=25,TEXT=5. Schedule names may be given
+    with or without their trailing slash.
+    """
+    mix = {}
+    for item in text.split(','):
+        name, weight = item.split('=')
+        name = name.strip().upper()
+        if name not in schedules:
+            name += '/'
+        if name not in schedules:
+            raise ValueError('Unknown schedule: ' + item)
+        mix[name] = int(weight)
+    return mix
+
+
+def peak_rss():
+    """
+    Return this process's peak memory use in megabytes, or None if it
+    can't be measured.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on Mac OS X
+        if sys.platform == 'darwin':
+            return peak / 1048576.0
+        return peak / 1024.0
+    except ImportError:
+        pass
+    try:
+        import ctypes, ctypes.wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', ctypes.wintypes.DWORD),
+                        ('PageFaultCount', ctypes.wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 1048576.0
+    except Exception:
+        return None
+
+
+def parse_case(datafile, workdir, outputformat, results):
+    """
+    Parse a data file with FEC Parser and put its timing in results.
+    Runs in its own process.
+    """
+    import FECParser
+    FECParser.usedatabaseflag = 0
+    FECParser.bulkloadflag = 0
+    FECParser.amendmentsflag = 0
+    FECParser.outputformat = outputformat
+    FECParser.outputdir = workdir + os.sep
+    FECParser.reviewdir = workdir + os.sep
+
+    outputs = FECParser.open_outputs('benchmark')
+    lines = open(datafile, 'rb')
+    start = time.time()
+    try:
+        reviewname = FECParser.parse_lines(lines, os.path.basename(datafile), outputs, interactive=False)
+        FECParser.close_outputs(outputs)
+    finally:
+        lines.close()
+    results.put({'seconds': time.time() - start, 'peakrss': peak_rss(), 'review': reviewname})
+
+
+def run_case(datafile, workdir, outputformat):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=parse_case, args=(datafile, workdir, outputformat, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def run(rows=10000, forms=('F3X',), mix=None, padding=0.1, pathologies=0.1, seed=0,
+        outputformat='tsv', repeat=1):
+    """
+    Generate and parse one filing per header version and schedule, plus
+    one with the full mix per header version. Returns a dictionary of
+    results keyed on case name. With repeat above 1, each filing is
+    parsed that many times and the fastest time is kept.
+    """
+    mix = mix or defaultmix
+    workdir = tempfile.mkdtemp(prefix='fecbenchmark')
+    results = {}
+    try:
+        for form in forms:
+            for version in versions:
+                cases = [('mix', mix)] + [(prefix.rstrip('/'), {prefix: 1}) for prefix in prefixes if prefix in mix]
+                for name, casemix in cases:
+                    casename = ' '.join([form, version, name])
+
+                    # Seed each case on its own so a case's filing stays
+                    # the same when other cases are added or removed
+                    generator = Generator(zlib.crc32(casename) ^ seed, padding, pathologies)
+                    datafile = os.path.join(workdir, '999999.fec')
+                    size = generator.filing(datafile, version, form, rows, casemix)
+
+                    best = None
+                    for i in xrange(repeat):
+                        result = run_case(datafile, workdir, outputformat)
+                        if result['review'] is not None:
+                            raise ValueError(casename + ': FEC Parser rejected the filing as ' + result['review'])
+                        if best is None or result['seconds'] < best['seconds']:
+                            best = result
+                    seconds = max(best['seconds'], 1e-9)
+                    results[casename] = {'rows': rows,
+                                         'bytes': size,
+                                         'seconds': seconds,
+                                         'rowspersec': rows / seconds,
+                                         'mbpersec': size / 1048576.0 / seconds,
+                                         'peakrssmb': best['peakrss']}
+                    print_result(casename, results[casename])
+    finally:
+        shutil.rmtree(workdir, True)
+    return results
+
+
+def print_result(casename, result, baseline=None):
+    line = '%-18s %8d rows %8.2f MB %7.2f sec %10.0f rows/sec %7.2f MB/sec' % \
+           (casename, result['rows'], result['bytes'] / 1048576.0, result['seconds'],
+            result['rowspersec'], result['mbpersec'])
+    if result['peakrssmb'] is not None:
+        line += ' %7.1f MB peak' % result['peakrssmb']
+    if baseline is not None:
+        line += ' %+6.1f%%' % (100.0 * (result['rowspersec'] / baseline['rowspersec'] - 1))
+    print line
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each case's change from a saved run. Returns the names of
+    cases more than tolerance percent slower.
+    """
+    print '\nChange in rows/sec from the saved run:'
+    slower = []
+    for casename in sorted(results):
+        if casename not in baseline:
+            continue
+        print_result(casename, results[casename], baseline[casename])
+        if results[casename]['rowspersec'] < baseline[casename]['rowspersec'] * (1 - tolerance / 100.0):
+            slower.append(casename)
+    return slower
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark FEC Parser on synthetic filings.')
+    parser.add_argument('--rows', type=int, default=10000,
+                        help='child rows per filing (default: %(default)s)')
+    parser.add_argument('--forms', default='F3X',
+                        help='comma-separated header forms: F3, F3P, F3X (default: %(default)s)')
+    parser.add_argument('--mix', default=None,
+                        help='schedule mix, such as SA=60,SB=25,TEXT=5 (default: a typical filing)')
+    parser.add_argument('--padding', type=float, default=0.1,
+                        help='share of fields padded with spaces (default: %(default)s)')
+    parser.add_argument('--pathologies', type=float, default=0.1,
+                        help='share of rows with quotation mark or delimiter problems (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    parser.add_argument('--format', choices=('tsv', 'columnar'), default='tsv',
+                        help='FEC Parser output format (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='times to parse each filing, keeping the fastest (default: %(default)s)')
+    parser.add_argument('--save', metavar='FILE', help='save results to a JSON file')
+    parser.add_argument('--compare', metavar='FILE', help='compare results with a saved JSON file')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='percent slowdown flagged as a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    forms = [form.strip().upper() for form in args.forms.split(',')]
+    mix = args.mix and parse_mix(args.mix)
+    results = run(args.rows, forms, mix, args.padding, args.pathologies, args.seed, args.format,
+                  max(args.repeat, 1))
+
+    if args.save:
+        output = open(args.save, 'w')
+        json.dump(results, output, indent=1, sort_keys=True)
+        output.close()
+        print '\nSaved results to ' + args.save
+
+    if args.compare:
+        slower = compare(results, json.load(open(args.compare)), args.tolerance)
+        if slower:
+            print '\nSlower than the saved run by more than ' + str(args.tolerance) + '%: ' + ', '.join(slower)
+            sys.exit(1)
@@ -0,0 +1,620 @@
+# FEC Columnar
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module writes FEC Parser's schedule rows as typed columns instead of
+tab-delimited text. FEC Parser uses it when the outputformat user
+variable is set to 'columnar'.
+
+Tab-delimited output stores every value as text, so adding up a
+schedule's amounts means reading and splitting every byte of every row.
+Column files store each column separately, in row groups of rowgroupsize
+rows, so a scan reads only the columns it needs. Values are stored as:
+ * decimal: Amounts, such as ContAmount and ExpAmount, as fixed-point
+numbers with two decimal places.
+ * date: Dates, such as strContDate, as calendar dates.
+ * int64: The ImageID.
+ * category: Short codes that repeat from row to row, such as FormType,
+EntityType, MemoCode and state abbreviations, stored once per row group
+with a small number for each row.
+ * string: Everything else.
+Empty fields are stored as nulls. A value that can't be converted to its
+column's type, such as an amount of "1,000.00" or a date of "ON DEMAND",
+is stored as a null with the original text in a string column of the
+same name plus "_raw", so nothing is lost. When FEC Parser writes the
+file, each amount or date that can't be converted is also flagged in
+the review file on a line of its own: MALFORMED, then the ImageID,
+TransID, column name and value, separated by tabs.
+
+Rows are converted a row group at a time rather than one value at a
+time. Amounts, dates and ImageIDs repeat constantly, so each distinct
+value in a column is converted once and the column is then filled in
+from those results in a single pass, into an array of 8-byte or 4-byte
+integers (cents and days) with a null marker (see below) rather than a
+list of Python objects. Arrays are written to .fcol files as they are,
+handed to pyarrow through NumPy for Parquet files and, with typed=True,
+returned as they are by scan(), so a script adding up amounts works on
+whole numbers of cents. On platforms without an 8-byte array type, such
+as Windows, amount and ImageID columns are lists of the same integers.
+
+If pyarrow is installed, files are written in Apache Parquet format
+(.parquet) and can be read by pyarrow, pandas and most analytic tools.
+Otherwise they are written in FEC Parser's own column format (.fcol),
+which needs nothing but Python to read with read_columns(). It is laid
+out like this, with all numbers little-endian:
+ * The 8 bytes FECCOL1 and a newline.
+ * Each row group's column chunks in order, each compressed with zlib.
+ * A footer of JSON text listing the columns (name and type) and, for
+each row group, its row count and the offset and length of each chunk.
+ * The footer's length as a 4-byte unsigned integer, then the same 8
+bytes the file started with.
+Before compression, a chunk of n values is encoded as:
+ * decimal and int64: n 8-byte signed integers (amounts in cents).
+-2**63 is a null.
+ * date: n 4-byte signed integers counting days since January 1, 1970.
+-2**31 is a null.
+ * string: n 4-byte signed lengths (-1 is a null) followed by the values.
+ * category: A 4-byte count k and k distinct values encoded like a
+string chunk, followed by n 4-byte signed indexes into them (-1 is a
+null).
+
+Run this module directly to convert tab-delimited output files to
+column files or to add up an amount column, reading only the columns
+needed:
+    python FECColumnar.py Output\\ScheduleAImport_2012_01_15_09_00_00.txt
+    python FECColumnar.py --sum ContAmount --by CommID Output\\ScheduleAImport_2012_01_15_09_00_00.fcol
+"""
+
+# Import needed libraries
+import os, sys, json, zlib, array, struct, datetime, decimal
+
+# pyarrow is optional
+try:
+    import numpy, pyarrow, pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Script variables
+rowgroupsize = 100000
+magic = 'FECCOL1\n'
+epoch = datetime.date(1970, 1, 1).toordinal()
+nulldecimal = -2 ** 63
+nulldate = -2 ** 31
+
+# Column types. Amount columns are listed by name; dates, categories and
+# the ImageID are recognized by their names.
+amountcolumns = set(['ContAmount', 'ContAggregate', 'ExpAmount', 'SemiAnnRefundedBundledAmt',
+                     'LoanAmt', 'LoanPymtToDate', 'LoanBal', 'B1_CreditAmtThisDraw',
+                     'B2_TotBalance', 'D2_CollateralValue', 'E3_EstimatedValue', 'GuarAmt',
+                     'BegBal_Prd', 'IncurredAmt_Prd', 'PaymtAmt_Prd', 'BalanceAtClose_Prd',
+                     'CalYTD'])
+categorycolumns = set(['ParentType', 'FormType', 'RecType', 'EntityType', 'ElecCod',
+                       'BackRefSchedName', 'BackRefFormName'])
+categorysuffixes = ('State', 'Code', 'Office', 'Flag')
+
+
+def column_type(name):
+    """
+    Return the type a column is stored as.
+    """
+    if name in amountcolumns:
+        return 'decimal'
+    if 'str' in name and 'Date' in name:
+        return 'date'
+    if name.lower() == 'imageid':
+        return 'int64'
+    if name in categorycolumns or name.endswith(categorysuffixes):
+        return 'category'
+    return 'string'
+
+
+def column_fields(columns):
+    """
+    Return a list of (name, type) pairs for a schedule's columns,
+    followed by a string column for the raw text of each typed column.
+    """
+    fields = [(name, column_type(name)) for name in columns]
+    for name, kind in list(fields):
+        if kind in ('decimal', 'date', 'int64'):
+            fields.append((name + '_raw', 'string'))
+    return fields
+
+
+def to_cents(value):
+    """
+    Convert an amount such as 250.00 or -.5 to a whole number of cents.
+    Raises ValueError for anything else.
+    """
+    whole, dot, fraction = value.partition('.')
+    sign = ''
+    if whole[:1] == '-':
+        sign, whole = '-', whole[1:]
+    if not (whole or fraction) or len(whole) > 16 or len(fraction) > 2 \
+       or not (whole + fraction).isdigit():
+        raise ValueError(value)
+    return int(sign + whole + (fraction + '00')[:2])
+
+
+def to_days(value):
+    """
+    Convert a YYYYMMDD date to days since January 1, 1970. Raises
+    ValueError for anything else.
+    """
+    if len(value) != 8 or not value.isdigit():
+        raise ValueError(value)
+    return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:])).toordinal() - epoch
+
+
+def to_int(value):
+    if len(value) > 18 or not value.isdigit():
+        raise ValueError(value)
+    return int(value)
+
+
+converters = {'decimal': to_cents, 'date': to_days, 'int64': to_int}
+
+
+def integer_typecode(size):
+    """
+    Return the array module type code for signed integers of size bytes,
+    or None if there isn't one.
+    """
+    for code in 'ilq':
+        try:
+            if array.array(code).itemsize == size:
+                return code
+        except ValueError:
+            pass
+    return None
+
+
+# Typed columns are held as arrays of integers, with these null markers
+typecodes = {'decimal': integer_typecode(8), 'int64': integer_typecode(8), 'date': integer_typecode(4)}
+packformats = {'decimal': 'q', 'int64': 'q', 'date': 'i'}
+nulls = {'decimal': nulldecimal, 'int64': nulldecimal, 'date': nulldate}
+
+
+def typed_array(kind, values):
+    """
+    Return an array of a typed column's integers, or a list if the
+    platform has no array type of the right size.
+    """
+    if typecodes[kind] is None:
+        return list(values)
+    return array.array(typecodes[kind], values)
+
+
+def convert_column(kind, values):
+    """
+    Convert a column of text values to kind. Returns the converted
+    values and, for typed columns, a list holding the original text of
+    each value that could not be converted, or None if every value
+    converted. Typed columns are returned as a typed_array() with nulls
+    stored as their null marker, other columns as a list with None for
+    nulls.
+    """
+    if kind not in converters:
+        return [value or None for value in values], None
+
+    # Convert each distinct value once, then fill in the column
+    converter = converters[kind]
+    null = nulls[kind]
+    lookup = {'': null}
+    malformed = set()
+    for value in set(values):
+        if value not in lookup:
+            try:
+                lookup[value] = converter(value)
+            except ValueError:
+                lookup[value] = null
+                malformed.add(value)
+    converted = typed_array(kind, map(lookup.__getitem__, values))
+    raw = None
+    if malformed:
+        raw = [value if value in malformed else None for value in values]
+    return converted, raw
+
+
+def pack_column(kind, values):
+    """
+    Encode a typed column as little-endian integers.
+    """
+    if isinstance(values, array.array):
+        if sys.byteorder != 'little':
+            values = array.array(values.typecode, values)
+            values.byteswap()
+        return values.tostring()
+    return struct.pack('<%d%s' % (len(values), packformats[kind]), *values)
+
+
+def unpack_column(kind, data, count):
+    """
+    Decode count little-endian integers into a typed_array().
+    """
+    if typecodes[kind] is None:
+        return list(struct.unpack('<%d%s' % (count, packformats[kind]), data))
+    values = array.array(typecodes[kind])
+    values.fromstring(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def encode_strings(values):
+    lengths = [-1 if value is None else len(value) for value in values]
+    return struct.pack('<%di' % len(lengths), *lengths) + ''.join([value for value in values if value])
+
+
+def encode_chunk(kind, values):
+    """
+    Encode a column chunk for a .fcol file (see above).
+    """
+    if kind in typecodes:
+        return pack_column(kind, values)
+    if kind == 'category':
+        codes = {None: -1}
+        dictionary = []
+        for value in values:
+            if value not in codes:
+                codes[value] = len(dictionary)
+                dictionary.append(value)
+        return struct.pack('<i', len(dictionary)) + encode_strings(dictionary) + \
+               struct.pack('<%di' % len(values), *[codes[value] for value in values])
+    return encode_strings(values)
+
+
+def decode_strings(data, count, offset=0):
+    """
+    Decode count strings from a string chunk starting at offset. Returns
+    the values and the offset just past them.
+    """
+    lengths = struct.unpack_from('<%di' % count, data, offset)
+    offset += 4 * count
+    values = []
+    for length in lengths:
+        if length < 0:
+            values.append(None)
+        else:
+            values.append(data[offset:offset + length])
+            offset += length
+    return values, offset
+
+
+def decode_chunk(kind, data, count, typed=False):
+    """
+    Decode a column chunk from a .fcol file into Python values:
+    decimal.Decimal for amounts and datetime.date for dates. If typed is
+    True, typed columns are returned as a typed_array() instead.
+    """
+    if typed and kind in typecodes:
+        return unpack_column(kind, data, count)
+    if kind in ('decimal', 'int64'):
+        values = struct.unpack('<%dq' % count, data)
+        if kind == 'int64':
+            return [None if value == nulldecimal else value for value in values]
+        cache = {nulldecimal: None}
+        result = []
+        for value in values:
+            if value not in cache:
+                cache[value] = decimal.Decimal(value).scaleb(-2)
+            result.append(cache[value])
+        return result
+    if kind == 'date':
+        cache = {nulldate: None}
+        result = []
+        for value in struct.unpack('<%di' % count, data):
+            if value not in cache:
+                cache[value] = datetime.date.fromordinal(value + epoch)
+            result.append(cache[value])
+        return result
+    if kind == 'category':
+        size = struct.unpack_from('<i', data)[0]
+        dictionary, offset = decode_strings(data, size, 4)
+        dictionary.append(None)
+        return [dictionary[code] for code in struct.unpack_from('<%di' % count, data, offset)]
+    return decode_strings(data, count)[0]
+
+
+class FeccolWriter(object):
+    """
+    Writes row groups to a .fcol file.
+    """
+
+    def __init__(self, path, fields):
+        self.fields = fields
+        self.output = open(path, 'wb')
+        self.output.write(magic)
+        self.rowgroups = []
+
+    def write_rowgroup(self, count, columns):
+        chunks = []
+        for (name, kind), values in zip(self.fields, columns):
+            data = zlib.compress(encode_chunk(kind, values), 6)
+            chunks.append([self.output.tell(), len(data)])
+            self.output.write(data)
+        self.rowgroups.append({'rows': count, 'chunks': chunks})
+
+    def close(self):
+        footer = json.dumps({'version': 1,
+                             'columns': [{'name': name, 'type': kind} for name, kind in self.fields],
+                             'rowgroups': self.rowgroups})
+        self.output.write(footer)
+        self.output.write(struct.pack('<I', len(footer)) + magic)
+        self.output.close()
+
+
+class ParquetWriter(object):
+    """
+    Writes row groups to a Parquet file with pyarrow.
+    """
+
+    def __init__(self, path, fields):
+        self.fields = fields
+        arrowtypes = {'decimal': pyarrow.decimal128(18, 2),
+                      'date': pyarrow.date32(),
+                      'int64': pyarrow.int64(),
+                      'category': pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+                      'string': pyarrow.string()}
+        self.schema = pyarrow.schema([pyarrow.field(name, arrowtypes[kind]) for name, kind in fields])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_rowgroup(self, count, columns):
+        arrays = []
+        for (name, kind), values in zip(self.fields, columns):
+            if kind == 'decimal':
+                # Build 16-byte decimals straight from the cents rather
+                # than creating a decimal.Decimal for every value
+                cents = numpy.array(values, dtype='<i8')
+                valid = cents != nulldecimal
+                cents[~valid] = 0
+                words = numpy.empty((len(values), 2), dtype='<i8')
+                words[:, 0] = cents
+                words[:, 1] = numpy.where(cents < 0, -1, 0)
+                valid = pyarrow.array(valid, type=pyarrow.bool_())
+                arrays.append(pyarrow.Array.from_buffers(pyarrow.decimal128(18, 2), len(values),
+                                                         [valid.buffers()[1], pyarrow.py_buffer(words.tobytes())]))
+            elif kind == 'date':
+                days = numpy.array(values, dtype='<i4')
+                arrays.append(pyarrow.array(days, type=pyarrow.int32(), mask=days == nulldate)
+                              .cast(pyarrow.date32()))
+            elif kind == 'int64':
+                ints = numpy.array(values, dtype='<i8')
+                arrays.append(pyarrow.array(ints, type=pyarrow.int64(), mask=ints == nulldecimal))
+            elif kind == 'category':
+                arrays.append(pyarrow.array(values, type=pyarrow.string()).dictionary_encode())
+            else:
+                arrays.append(pyarrow.array(values, type=pyarrow.string()))
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def extension():
+    """
+    Return the extension of the column files this module writes.
+    """
+    if pyarrow is not None:
+        return '.parquet'
+    return '.fcol'
+
+
+class ColumnarOutput(object):
+    """
+    A schedule output file that takes the same tab-delimited rows FEC
+    Parser writes to its text outputs and stores them as typed columns.
+    Rows can be split across calls to write(). Rows are converted and
+    written a row group at a time, and close() writes the last one. If
+    review is an open file, each amount or date that can't be converted
+    is flagged in it.
+    """
+
+    def __init__(self, path, columns, rowgroupsize=rowgroupsize, review=None):
+        self.name = path
+        self.columns = columns
+        self.kinds = [column_type(name) for name in columns]
+        self.fields = column_fields(columns)
+        self.rowgroupsize = rowgroupsize
+        self.review = review
+        self.rows = []
+        self.partial = ''
+        if pyarrow is not None:
+            self.writer = ParquetWriter(path, self.fields)
+        else:
+            self.writer = FeccolWriter(path, self.fields)
+
+    def write(self, data):
+        lines = (self.partial + data).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.rows.append(line.split('\t'))
+        if len(self.rows) >= self.rowgroupsize:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        count = len(self.rows)
+        width = len(self.columns)
+        for row in self.rows:
+            if len(row) != width:
+                row.extend([''] * (width - len(row)))
+                del row[width:]
+        columns = []
+        raws = []
+        for name, kind, values in zip(self.columns, self.kinds, zip(*self.rows)):
+            converted, raw = convert_column(kind, values)
+            columns.append(converted)
+            if kind in converters:
+                raws.append(raw or [None] * count)
+                if raw is not None and self.review is not None and kind != 'int64':
+                    self.flag(name, raw)
+        self.rows = []
+        self.writer.write_rowgroup(count, columns + raws)
+
+    def flag(self, name, raw):
+        """
+        Write a line to the review file for each value of a column that
+        couldn't be converted.
+        """
+        imageid = [column.lower() for column in self.columns].index('imageid')
+        transid = 'TransID' in self.columns and self.columns.index('TransID') or None
+        for row, value in zip(self.rows, raw):
+            if value is not None:
+                self.review.write('\t'.join(['MALFORMED', row[imageid], transid and row[transid] or '', name,
+                                             value]) + '\n')
+
+    def close(self):
+        if self.partial:
+            self.write('\n')
+        self.flush()
+        self.writer.close()
+
+
+def read_footer(datafile):
+    datafile.seek(-12, 2)
+    tail = datafile.read(12)
+    if tail[4:] != magic:
+        raise ValueError(datafile.name + ' is not a column file')
+    length = struct.unpack('<I', tail[:4])[0]
+    datafile.seek(-12 - length, 2)
+    return json.loads(datafile.read(length))
+
+
+def typed_values(kind, values):
+    """
+    Convert a list of decimal.Decimal amounts, datetime.date dates or
+    ImageIDs, with None for nulls, to a typed_array().
+    """
+    if kind == 'decimal':
+        values = [nulldecimal if value is None else int(value.scaleb(2)) for value in values]
+    elif kind == 'date':
+        values = [nulldate if value is None else value.toordinal() - epoch for value in values]
+    else:
+        values = [nulldecimal if value is None else value for value in values]
+    return typed_array(kind, values)
+
+
+def scan(path, columns=None, typed=False):
+    """
+    Read a column file (.fcol or .parquet) one row group at a time,
+    yielding a dictionary of lists of values for each. Only the columns
+    named are read; by default, all of them are. If typed is True,
+    amounts, dates and ImageIDs are returned as a typed_array() of
+    cents, days since January 1, 1970 or numbers, with nulls stored as
+    nulldecimal or nulldate.
+    """
+    if path.endswith('.parquet'):
+        if pyarrow is None:
+            raise ImportError('pyarrow is needed to read ' + path)
+        parquetfile = pyarrow.parquet.ParquetFile(path)
+        kinds = dict((name, column_type(name)) for name in parquetfile.schema.names)
+        for i in xrange(parquetfile.num_row_groups):
+            table = parquetfile.read_row_group(i, columns=columns)
+            result = dict(zip(table.column_names, [column.to_pylist() for column in table.columns]))
+            if typed:
+                for name in result:
+                    if kinds[name] in typecodes:
+                        result[name] = typed_values(kinds[name], result[name])
+            yield result
+        return
+
+    datafile = open(path, 'rb')
+    try:
+        footer = read_footer(datafile)
+        fields = [(column['name'], column['type']) for column in footer['columns']]
+        if columns is None:
+            columns = [name for name, kind in fields]
+        positions = {}
+        for i, (name, kind) in enumerate(fields):
+            positions[name] = i
+        for rowgroup in footer['rowgroups']:
+            result = {}
+            for name in columns:
+                i = positions[name]
+                offset, length = rowgroup['chunks'][i]
+                datafile.seek(offset)
+                result[name] = decode_chunk(fields[i][1], zlib.decompress(datafile.read(length)),
+                                            rowgroup['rows'], typed)
+            yield result
+    finally:
+        datafile.close()
+
+
+def read_columns(path, columns=None):
+    """
+    Read whole columns from a column file into a dictionary of lists.
+    """
+    result = {}
+    for rowgroup in scan(path, columns):
+        for name in rowgroup:
+            result.setdefault(name, []).extend(rowgroup[name])
+    return result
+
+
+def convert_text_file(textfile):
+    """
+    Convert a tab-delimited schedule output file to a column file next to
+    it. Returns the new file's name.
+    """
+    datafile = open(textfile, 'rb')
+    try:
+        columns = datafile.readline().rstrip('\r\n').split('\t')
+        path = os.path.splitext(textfile)[0] + extension()
+        output = ColumnarOutput(path, columns)
+        while True:
+            block = datafile.read(1048576)
+            if not block:
+                break
+            output.write(block)
+        output.close()
+    finally:
+        datafile.close()
+    return path
+
+
+if __name__ == '__main__':
+    import argparse, time
+
+    parser = argparse.ArgumentParser(description='Convert FEC Parser output files to column files, '
+                                                 'or add up a column in column files.')
+    parser.add_argument('files', nargs='+', help='.txt files to convert or column files to scan')
+    parser.add_argument('--sum', metavar='COLUMN', help='amount column to add up')
+    parser.add_argument('--by', metavar='COLUMN', help='column to group the sum by')
+    args = parser.parse_args()
+
+    for path in args.files:
+        start = time.time()
+        if path.endswith('.txt'):
+            newpath = convert_text_file(path)
+            print '%s: %d bytes -> %s: %d bytes (%.1f seconds)' % (path, os.path.getsize(path), newpath,
+                                                                 os.path.getsize(newpath), time.time() - start)
+            continue
+
+        if not args.sum:
+            rows = 0
+            for rowgroup in scan(path, ['ImageId']):
+                rows += len(rowgroup['ImageId'])
+            print path + ': ' + str(rows) + ' rows'
+            continue
+
+        # Add up whole cents, a row group at a time without a grouping
+        # column
+        totals = {}
+        columns = [args.sum]
+        if args.by:
+            columns.append(args.by)
+        for rowgroup in scan(path, columns, typed=True):
+            cents = rowgroup[args.sum]
+            if not args.by:
+                count = len(cents) - cents.count(nulldecimal)
+                if count:
+                    totals[None] = totals.get(None, 0) + sum(cents) - nulldecimal * (len(cents) - count)
+                continue
+            for key, amount in zip(rowgroup[args.by], cents):
+                if amount != nulldecimal:
+                    totals[key] = totals.get(key, 0) + amount
+        for key in sorted(totals):
+            print str(key) + '\t' + str(decimal.Decimal(totals[key]).scaleb(-2))
+        print '(%.1f seconds)' % (time.time() - start)
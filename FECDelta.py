@@ -0,0 +1,237 @@
+# FEC Delta
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module lets FEC Parser write only the child rows of an amendment
+that differ from the filing it amends. FEC Parser uses it when the
+deltaflag user variable is set to 1 or the --delta option is given.
+
+An amendment repeats every row of the report it replaces, usually with
+only a handful of them changed, so loading it in full means reloading
+tens of thousands of rows that are already in the database. In delta
+mode, FEC Parser keeps a hash of every child row of the latest filing
+of each report, keyed on schedule and TransID, in a small SQLite
+database, Deltas.db in the main directory. The hash covers each value
+of the conformed row except the form type and ImageID, which change
+with every amendment. When an amendment of a report in the index is
+parsed (see FECAmendments.py for how amendments are matched with the
+filings they replace), each of its rows is checked against the index:
+ * A row whose TransID and hash match a row of the earlier filing is
+left out.
+ * A row whose TransID matches but whose hash doesn't is written and
+listed as changed.
+ * A row with a new TransID is written and listed as added.
+ * Each row of the earlier filing left unmatched is listed as removed.
+The list goes to Deltas_<timestamp>.txt in the output directory, with
+the columns ImageID, Amends, Table, TransID and Change. Each filing
+written as a delta starts with a line whose Change is 'filing'. To
+bring your database up to date, for each filing line:
+ * Delete the rows of the Amends filing whose TransID is listed as
+changed or removed for that table.
+ * Set the ImageId of the remaining rows of the Amends filing to the
+amendment's ImageID.
+ * Load the amendment's rows from the schedule output files as usual.
+A filing without a filing line was written in full and is loaded as
+usual. That happens when the filing it amends isn't in the index (it
+was parsed before delta mode was turned on, or the index was cleared),
+when it has itself been superseded by a later amendment, or when it is
+split among worker processes because it is so large.
+
+Review rows are always written. Only the latest filing of each report
+is kept in the index; the rows of the filings it replaces are dropped.
+To see how big the index is, or to empty it, run:
+    python FECDelta.py
+    python FECDelta.py --clear
+"""
+
+# Import needed libraries
+import struct, hashlib, sqlite3, threading
+from FECSchedules import prefixes, schedules
+
+# Column headers for the delta list
+deltaheaderstring = 'ImageID\tAmends\tTable\tTransID\tChange\n'
+
+# Changes
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+FILING = 'filing'
+
+# Position of the TransID column in each schedule's rows
+transidcolumns = dict((prefix, schedules[prefix]['columns'].index('TransID')) for prefix in prefixes)
+
+
+def row_hash(fields):
+    """
+    Return a 64-bit hash of a conformed child row, leaving out the form
+    type and ImageID.
+    """
+    return struct.unpack('<q', hashlib.sha1('\t'.join(fields[2:])).digest()[:8])[0]
+
+
+def delta_plan(imageid, pairs):
+    """
+    Decide how a filing is written in delta mode, given its ImageID and
+    the pairs FECAmendments.Resolver.resolve() returned for it. Returns
+    (imageid, amends, replaces): amends is the ImageID of the filing it
+    amends, if any, and replaces lists every filing it supersedes.
+    Returns None if the filing has been superseded itself, in which case
+    it is written in full and not added to the index.
+    """
+    imageid = int(imageid)
+    replaces = []
+    for superseded, supersededby in pairs:
+        if superseded == imageid:
+            return None
+        replaces.append(superseded)
+    return imageid, replaces and max(replaces) or None, replaces
+
+
+class Differ(object):
+    """
+    Compares the child rows of a filing with those of the filing it
+    amends. previous is what DeltaIndex.load() returned for that filing,
+    or None to treat every row as added.
+    """
+
+    def __init__(self, previous=None):
+        self.previous = previous
+        self.entries = []
+
+    def check(self, kind, fields):
+        """
+        Record a row of the filing and return ADDED or CHANGED, or None
+        if the row is the same as in the filing it amends.
+        """
+        key = (kind, fields[transidcolumns[kind]])
+        rowhash = row_hash(fields)
+        self.entries.append(key + (rowhash,))
+        if self.previous is None or key not in self.previous:
+            return ADDED
+        hashes = self.previous[key]
+        change = None
+        if rowhash not in hashes:
+            rowhash = next(iter(hashes))
+            change = CHANGED
+        if hashes[rowhash] == 1:
+            del hashes[rowhash]
+            if not hashes:
+                del self.previous[key]
+        else:
+            hashes[rowhash] -= 1
+        return change
+
+    def removed(self):
+        """
+        Return the (kind, transid) of each row of the filing amended
+        that no row of this filing matched.
+        """
+        rows = []
+        for key in sorted(self.previous or {}):
+            rows.extend([key] * sum(self.previous[key].values()))
+        return rows
+
+
+class DeltaIndex(object):
+
+    def __init__(self, path):
+        self.path = path
+
+        # Like the amendments database, one connection is shared behind
+        # a lock, and parser worker processes each open their own and
+        # rely on SQLite's locking.
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS filings ('
+                          'imageid INTEGER PRIMARY KEY, '
+                          'rowcount INTEGER NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS rows ('
+                          'imageid INTEGER NOT NULL, '
+                          'kind TEXT NOT NULL, '
+                          'transid TEXT NOT NULL, '
+                          'hash INTEGER NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS filingrows ON rows (imageid)')
+        self.conn.commit()
+
+    def load(self, imageid):
+        """
+        Return the rows of a filing in the index as a dictionary mapping
+        (kind, transid) to a dictionary of hash counts, or None if the
+        filing isn't in the index.
+        """
+        self.lock.acquire()
+        try:
+            if self.conn.execute('SELECT 1 FROM filings WHERE imageid = ?', (int(imageid),)).fetchone() is None:
+                return None
+            previous = {}
+            for kind, transid, rowhash in self.conn.execute('SELECT kind, transid, hash FROM rows '
+                                                            'WHERE imageid = ?', (int(imageid),)):
+                hashes = previous.setdefault((str(kind), str(transid)), {})
+                hashes[rowhash] = hashes.get(rowhash, 0) + 1
+            return previous
+        finally:
+            self.lock.release()
+
+    def store(self, imageid, entries, replaces=()):
+        """
+        Add a filing's rows, as recorded by Differ.check(), to the index
+        and drop the filings it replaces.
+        """
+        imageid = int(imageid)
+        self.lock.acquire()
+        try:
+            try:
+                dropped = [(int(i),) for i in replaces] + [(imageid,)]
+                self.conn.executemany('DELETE FROM rows WHERE imageid = ?', dropped)
+                self.conn.executemany('DELETE FROM filings WHERE imageid = ?', dropped)
+                self.conn.execute('INSERT INTO filings (imageid, rowcount) VALUES (?, ?)', (imageid, len(entries)))
+                self.conn.executemany('INSERT INTO rows (imageid, kind, transid, hash) VALUES (?, ?, ?, ?)',
+                                      [(imageid, kind, transid, rowhash) for kind, transid, rowhash in entries])
+                self.conn.commit()
+            except:
+                self.conn.rollback()
+                raise
+        finally:
+            self.lock.release()
+
+    def report(self):
+        """
+        Return a one-line summary of the index.
+        """
+        self.lock.acquire()
+        try:
+            filings, rows = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(rowcount), 0) FROM filings').fetchone()
+        finally:
+            self.lock.release()
+        return 'Indexed filings: ' + str(filings) + '; rows: ' + str(rows) + '.'
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute('DELETE FROM rows')
+            self.conn.execute('DELETE FROM filings')
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    # Use the same settings as FEC Parser
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    deltafile = maindir + 'Deltas.db'
+
+    index = DeltaIndex(deltafile)
+    if '--clear' in sys.argv[1:]:
+        index.clear()
+        print 'Cleared the delta index.'
+    print index.report()
+    index.close()
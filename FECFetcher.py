@@ -0,0 +1,251 @@
+# FEC Fetcher
+# Companion module for FEC Scraper
+# Developed with Python 2.7.2
+
+"""
+This module downloads pages and data files for FEC Scraper using a pool
+of threads.
+
+Scraping is dominated by waiting on the network, so several requests
+are kept in flight at once. To stay polite to the FEC website:
+ * No more than concurrency requests run at the same time.
+ * Requests to any one host are spaced out so no more than rate
+requests per second are started. Set rate to 0 to disable the limit.
+ * Each thread keeps its connection to a host open and reuses it for
+later requests (HTTP keep-alive) rather than connecting every time.
+ * Failed requests (network errors, server errors and 429 Too Many
+Requests responses) are retried up to retries times, waiting backoff
+seconds before the first retry and twice as long before each one after.
+
+Files are downloaded to a temporary .part file and renamed into place
+once complete, so a failed or interrupted download never leaves a
+partial .fec file behind for FEC Parser to pick up.
+
+Nothing here is specific to the FEC website, so you can point FEC
+Scraper at a local web server that serves saved index pages and data
+files to try it out without touching the real site.
+"""
+
+# Import needed libraries
+import httplib, socket, threading, time, urlparse, random, os, Queue
+
+
+class FetchError(Exception):
+    """
+    Raised when a request still fails after all retries.
+    """
+    pass
+
+
+class CountingReader(object):
+    """
+    Wraps a response and counts the bytes read from it, so the size of
+    a download is known even if the server didn't send Content-Length.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.size = 0
+
+    def read(self, *args):
+        block = self.response.read(*args)
+        self.size += len(block)
+        return block
+
+
+class Fetcher(object):
+
+    def __init__(self, concurrency=4, rate=2.0, retries=3, backoff=1.0, timeout=60):
+        self.concurrency = max(int(concurrency), 1)
+        self.interval = rate and 1.0 / rate or 0
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        # Time each host may next be contacted
+        self.nextturn = {}
+        self.lock = threading.Lock()
+
+        # Each thread keeps its own connection to each host
+        self.local = threading.local()
+
+    def wait_turn(self, host):
+        """
+        Sleep until the rate limit allows another request to host.
+        """
+        if not self.interval:
+            return
+        self.lock.acquire()
+        try:
+            now = time.time()
+            turn = max(now, self.nextturn.get(host, 0))
+            self.nextturn[host] = turn + self.interval
+        finally:
+            self.lock.release()
+        if turn > now:
+            time.sleep(turn - now)
+
+    def connection(self, scheme, host):
+        """
+        Return this thread's open connection to host, creating it if
+        necessary.
+        """
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        key = (scheme, host)
+        conn = self.local.connections.get(key)
+        if conn is None:
+            if scheme == 'https':
+                conn = httplib.HTTPSConnection(host, timeout=self.timeout)
+            else:
+                conn = httplib.HTTPConnection(host, timeout=self.timeout)
+            self.local.connections[key] = conn
+        return conn
+
+    def drop_connection(self, scheme, host):
+        conn = self.local.connections.pop((scheme, host), None)
+        if conn is not None:
+            conn.close()
+
+    def abandon(self, url):
+        """
+        Close this thread's connection to url's host. Call this if a
+        response from open() was not read to the end.
+        """
+        self.drop_connection(*urlparse.urlsplit(url)[:2])
+
+    def close(self):
+        """
+        Close this thread's connections.
+        """
+        for key in list(getattr(self.local, 'connections', {})):
+            self.drop_connection(*key)
+
+    def open(self, url, method='GET', headers=None):
+        """
+        Send a request, following redirects and retrying failures, and
+        return the httplib response. The caller must read the whole
+        response body before making another request from this thread.
+        """
+        for redirect in xrange(5):
+            parts = urlparse.urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            attempt = 0
+            while True:
+                self.wait_turn(parts.netloc)
+                conn = self.connection(parts.scheme, parts.netloc)
+                try:
+                    conn.request(method, path, headers=headers or {})
+                    response = conn.getresponse()
+                except (socket.error, httplib.HTTPException), e:
+                    # The server may simply have closed a kept-alive
+                    # connection, so start over with a fresh one
+                    self.drop_connection(parts.scheme, parts.netloc)
+                    error = str(e) or e.__class__.__name__
+                else:
+                    if response.status < 500 and response.status != 429:
+                        break
+                    response.read()
+                    error = 'HTTP ' + str(response.status)
+
+                if attempt >= self.retries:
+                    raise FetchError(url + ': ' + error)
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random() / 4))
+                attempt += 1
+
+            if response.status in (301, 302, 303, 307) and response.getheader('location'):
+                response.read()
+                url = urlparse.urljoin(url, response.getheader('location'))
+                continue
+            return response
+
+        raise FetchError(url + ': too many redirects')
+
+    def get(self, url, headers=None):
+        """
+        Fetch url and return its status, headers and body.
+        """
+        response = self.open(url, headers=headers)
+        body = response.read()
+        return response.status, dict(response.getheaders()), body
+
+    def retrieve(self, url, filename, blocksize=65536):
+        """
+        Download url to filename. Returns the number of bytes saved.
+        Raises FetchError if the server does not return the file.
+        """
+        response = self.open(url)
+        if response.status != 200:
+            response.read()
+            raise FetchError(url + ': HTTP ' + str(response.status))
+
+        partname = filename + '.part'
+        size = 0
+        try:
+            output = open(partname, 'wb')
+            try:
+                while True:
+                    block = response.read(blocksize)
+                    if not block:
+                        break
+                    output.write(block)
+                    size += len(block)
+            finally:
+                output.close()
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(partname, filename)
+        except (socket.error, httplib.HTTPException), e:
+            self.abandon(url)
+            if os.path.exists(partname):
+                os.remove(partname)
+            raise FetchError(url + ': ' + (str(e) or e.__class__.__name__))
+        return size
+
+    def map(self, function, items):
+        """
+        Call function on each item using up to concurrency threads and
+        return a list of results in the same order as items. If any
+        call raises an exception, the first one is raised again once
+        all items are finished.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        errors = []
+        queue = Queue.Queue()
+        for i, item in enumerate(items):
+            queue.put((i, item))
+
+        def work():
+            try:
+                while True:
+                    try:
+                        i, item = queue.get_nowait()
+                    except Queue.Empty:
+                        return
+                    try:
+                        results[i] = function(item)
+                    except Exception, e:
+                        errors.append((i, e))
+            finally:
+                self.close()
+
+        threads = []
+        for n in xrange(min(self.concurrency, len(items))):
+            thread = threading.Thread(target=work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        # Join with a timeout so Ctrl+C still works while waiting
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+
+        if errors:
+            errors.sort()
+            raise errors[0][1]
+        return results
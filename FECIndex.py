@@ -0,0 +1,227 @@
+# FEC Index
+# Companion module for FEC Scraper
+# Developed with Python 2.7.2
+
+"""
+This module reads a committee's index page on the FEC website and
+returns what it says about each filing listed there, not just the
+filing number, so FEC Scraper can decide which filings are worth
+downloading before it downloads them.
+
+Each filing on the page is listed on its own line with its form type,
+such as Form F3X, and usually its report code or name, the dates it
+covers and the date it was filed. For each line that names a form and
+a filing number, an IndexFiling is returned holding:
+ * number: The filing number.
+ * form: The form type without the N (new), A (amendment) or T
+(termination) suffix the FEC sometimes adds, such as F3X.
+ * amended: True if the filing is marked as an amendment.
+ * reptcode: The report code, such as Q1 or YE. Report names such as
+YEAR-END or APRIL QUARTERLY are converted to their codes.
+ * fromdate and todate: The dates the report covers, as YYYYMMDD.
+ * filed: The date the filing was received, as YYYYMMDD.
+Anything not shown on the page is None. The page is read once, line by
+line, and lines that don't name a form are skipped with a single
+substring test.
+
+A committee that amends a report files the whole report again, so once
+a later filing of the same form, report code and coverage dates is
+listed, the earlier ones don't need to be downloaded. superseded()
+finds them using the same rule as FECAmendments.py. Filings whose report
+code or coverage dates aren't shown are never treated as superseded.
+"""
+
+# Import needed libraries
+import re
+
+# Filing numbers are six or more digits standing on their own, so the
+# digits inside a committee ID don't count
+numberregex = re.compile(r'\b[0-9]{6,}\b')
+formregex = re.compile(r'\bForm\s+(F[0-9][0-9A-Z]*)\b')
+tagregex = re.compile(r'<[^>]*>')
+dateregex = re.compile(r'\b([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})\b')
+filedregex = re.compile(r'\b(?:FILED|RECEIVED)\b\D{0,12}$')
+amendregex = re.compile(r'\bAMEND|\(A\)')
+codeprefix = r'(?<![0-9A-Z-])'
+codesuffix = r'(?![0-9A-Z-])'
+coderegex = re.compile(codeprefix + r'(Q[1-3]|YE|MY|TER|M[2-9]|M1[0-2]|(?:10|12|30)[CDGPRS])' + codesuffix)
+
+# Report names shown in place of report codes
+reportnames = {
+    'APRIL QUARTERLY': 'Q1',
+    'JULY QUARTERLY': 'Q2',
+    'OCTOBER QUARTERLY': 'Q3',
+    'YEAR-END': 'YE',
+    'YEAR END': 'YE',
+    'MID-YEAR': 'MY',
+    'MID YEAR': 'MY',
+    'TERMINATION': 'TER',
+    'FEBRUARY MONTHLY': 'M2',
+    'MARCH MONTHLY': 'M3',
+    'APRIL MONTHLY': 'M4',
+    'MAY MONTHLY': 'M5',
+    'JUNE MONTHLY': 'M6',
+    'JULY MONTHLY': 'M7',
+    'AUGUST MONTHLY': 'M8',
+    'SEPTEMBER MONTHLY': 'M9',
+    'OCTOBER MONTHLY': 'M10',
+    'NOVEMBER MONTHLY': 'M11',
+    'DECEMBER MONTHLY': 'M12',
+    'PRE-PRIMARY': '12P',
+    'PRE-GENERAL': '12G',
+    'PRE-RUNOFF': '12R',
+    'PRE-SPECIAL': '12S',
+    'PRE-CONVENTION': '12C',
+    'POST-PRIMARY': '30P',
+    'POST-GENERAL': '30G',
+    'POST-RUNOFF': '30R',
+    'POST-SPECIAL': '30S'}
+nameregex = re.compile(codeprefix + '(' + '|'.join(sorted(reportnames, key=len, reverse=True)) + ')' + codesuffix)
+
+
+class IndexFiling(object):
+    """
+    A filing listed on a committee's index page. See the notes at the
+    top of this module.
+    """
+
+    __slots__ = ('number', 'form', 'amended', 'reptcode', 'fromdate', 'todate', 'filed')
+
+    def __init__(self, number, form, amended=False, reptcode=None, fromdate=None, todate=None, filed=None):
+        self.number = number
+        self.form = form
+        self.amended = amended
+        self.reptcode = reptcode
+        self.fromdate = fromdate
+        self.todate = todate
+        self.filed = filed
+
+    def __repr__(self):
+        return 'IndexFiling(%s)' % ', '.join(repr(value) for value in self.fields())
+
+    def fields(self):
+        """
+        Return the filing's values as a list, in the order the
+        constructor takes them.
+        """
+        return [getattr(self, name) for name in self.__slots__]
+
+    def report(self):
+        """
+        Return the (form, reptcode, fromdate, todate) the filing reports
+        on, or None if any of them aren't known.
+        """
+        report = (self.form, self.reptcode, self.fromdate, self.todate)
+        if None in report:
+            return None
+        return report
+
+
+def to_date(match):
+    month, day, year = match.groups()
+    return year + month.zfill(2) + day.zfill(2)
+
+
+def parse_line(line):
+    """
+    Return the filings listed on a line of an index page. The line must
+    name a form.
+    """
+    match = formregex.search(line)
+    numbers = numberregex.findall(line)
+    if match is None or not numbers:
+        return []
+    form = match.group(1)
+    text = tagregex.sub(' ', line).upper()
+
+    # F3XA, F3XN and so on are the F3X with an amendment indicator
+    amended = bool(amendregex.search(text))
+    if len(form) > 2 and form[-1] in 'NAT':
+        amended = amended or form[-1] == 'A'
+        form = form[:-1]
+
+    # Text that is part of a link or tag, such as the filing number in
+    # the link's address, isn't mistaken for a report code or date
+    reptcode = None
+    match = coderegex.search(text)
+    if match:
+        reptcode = match.group(1)
+    else:
+        match = nameregex.search(text)
+        if match:
+            reptcode = reportnames[match.group(1)]
+
+    # The filing date is labeled; the first two other dates are the
+    # dates covered
+    filed = None
+    dates = []
+    for match in dateregex.finditer(text):
+        if filed is None and filedregex.search(text, 0, match.start()):
+            filed = to_date(match)
+        else:
+            dates.append(to_date(match))
+    fromdate = todate = None
+    if len(dates) >= 2 and dates[0] <= dates[1]:
+        fromdate, todate = dates[:2]
+
+    # A filing number usually appears in the link and in its text
+    filings = []
+    for i, number in enumerate(numbers):
+        if number not in numbers[:i]:
+            filings.append(IndexFiling(number, form, amended, reptcode, fromdate, todate, filed))
+    return filings
+
+
+def parse_page(page):
+    """
+    Return an IndexFiling for each filing listed on a committee's index
+    page, in the order they are listed.
+    """
+    filings = []
+    for line in page.splitlines():
+        if 'Form F' in line:
+            filings += parse_line(line)
+    return filings
+
+
+def superseded(filings):
+    """
+    Return the set of filing numbers in filings that have been replaced
+    by a later filing of the same report.
+    """
+    latest = {}
+    for filing in filings:
+        report = filing.report()
+        if report is not None and int(filing.number) > int(latest.get(report, 0)):
+            latest[report] = filing.number
+    numbers = set()
+    for filing in filings:
+        report = filing.report()
+        if report is not None and latest[report] != filing.number:
+            numbers.add(filing.number)
+    return numbers
+
+
+def in_window(filing, fromdate='', todate=''):
+    """
+    Return False if a filing covers only dates before fromdate or after
+    todate (both YYYYMMDD, or '' for no limit). Filings whose coverage
+    dates aren't known are always in the window.
+    """
+    if fromdate and filing.todate is not None and filing.todate < fromdate:
+        return False
+    if todate and filing.fromdate is not None and filing.fromdate > todate:
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    import sys
+
+    # Show what is found on saved index pages
+    for path in sys.argv[1:]:
+        filings = parse_page(open(path, 'rb').read())
+        replaced = superseded(filings)
+        for filing in filings:
+            print filing.number + '\t' + '\t'.join(str(value) for value in filing.fields()[1:]) + \
+                  (filing.number in replaced and '\tsuperseded' or '')
@@ -0,0 +1,172 @@
+# FEC Journal
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module lets a batch run of FEC Parser pick up where it left off
+after a crash. FEC Parser uses it when the batchflag user variable is
+set to 1 or the --batch option is given.
+
+The journal is a text file in the output directory,
+Journal_<timestamp>.txt, with one line of JSON for each event:
+ * The first line records the run's timestamp and the path of each of
+its output files.
+ * If database integration is enabled, a line is added recording each
+filing before its header is sent to the database.
+ * After each filing's rows have been written, the output files are
+flushed to disk and a line is added recording the filing, where it is
+being moved (the processed or review directory) and the size of every
+output file. Only then is the filing moved. This is the point at which
+a filing counts as done.
+Each line is flushed to disk as soon as it is written, and a line cut
+short by a crash is ignored.
+
+When a batch run starts and finds a journal, the run it belongs to
+didn't finish, so it is resumed rather than starting a new one:
+ * Filings recorded in the journal but still in the import directory
+are moved where the journal says, without being parsed again.
+ * Filings that were started but not recorded as done may already have
+their headers in the database, so FEC Parser treats a header it finds
+there for one of them as its own and parses the filing again.
+ * Each output file is cut back to the size recorded for the last
+filing, dropping any rows written for a filing that wasn't finished.
+ * The remaining filings are parsed into the same output files.
+When the run finishes, the journal is deleted.
+
+Output files are cut back by size, so a run can only be resumed if its
+schedule output files are uncompressed, tab-delimited text files that
+aren't rotated, and if rows aren't being loaded into a database as they
+are parsed.
+"""
+
+# Import needed libraries
+import os, glob, json
+
+
+class JournalError(Exception):
+    """
+    Raised when an unfinished run can't be resumed.
+    """
+    pass
+
+
+def find_journal(outputdir):
+    """
+    Return the path of the journal for an unfinished run in outputdir,
+    or None if there isn't one.
+    """
+    paths = sorted(glob.glob(outputdir + 'Journal_*.txt'))
+    return paths and paths[-1] or None
+
+
+def file_size(output):
+    """
+    Flush an open output file to disk and return its size.
+    """
+    output.flush()
+    os.fsync(output.fileno())
+    return os.fstat(output.fileno()).st_size
+
+
+class Journal(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.timestamp = None
+        self.paths = {}
+        self.filings = []
+        self.started = set()
+        self.sizes = {}
+
+        # Read what an unfinished run recorded, dropping any line cut
+        # short by a crash
+        end = 0
+        if os.path.exists(path):
+            for line in open(path, 'rb'):
+                try:
+                    if not line.endswith('\n'):
+                        raise ValueError
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                end += len(line)
+                if 'started' in entry:
+                    self.started.add(entry['started'])
+                    continue
+                if 'timestamp' in entry:
+                    self.timestamp = entry['timestamp']
+                    self.paths = entry['paths']
+                else:
+                    self.filings.append(entry)
+                    self.started.discard(entry['filename'])
+                self.sizes = entry['sizes']
+        self.journal = open(path, 'ab')
+        self.journal.truncate(end)
+
+    def write(self, entry):
+        self.journal.write(json.dumps(entry, sort_keys=True) + '\n')
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def start(self, timestamp, outputs):
+        """
+        Record the start of a run and its open output files.
+        """
+        self.timestamp = timestamp
+        self.paths = dict((key, outputs[key].name) for key in outputs)
+        self.sizes = dict((key, file_size(outputs[key])) for key in outputs)
+        self.write({'timestamp': timestamp, 'paths': self.paths, 'sizes': self.sizes})
+
+    def begin(self, filename):
+        """
+        Record that a filing is about to be parsed.
+        """
+        self.write({'started': filename})
+
+    def commit(self, filename, state, destination, outputs):
+        """
+        Record that a filing's rows have been written to outputs and
+        that it is about to be moved to destination.
+        """
+        self.sizes = dict((key, file_size(outputs[key])) for key in outputs)
+        entry = {'filename': filename, 'state': state, 'destination': destination, 'sizes': self.sizes}
+        self.filings.append(entry)
+        self.write(entry)
+
+    def rollback(self, outputs):
+        """
+        Drop anything written to outputs since the last filing recorded.
+        """
+        for key in outputs:
+            outputs[key].flush()
+            outputs[key].seek(self.sizes[key])
+            outputs[key].truncate(self.sizes[key])
+
+    def truncate(self, keys):
+        """
+        Cut the output files of an unfinished run back to the sizes
+        recorded for the last filing. keys are the outputs the resumed
+        run will write, which must be the same as the original run's.
+        """
+        if sorted(keys) != sorted(self.paths):
+            raise JournalError('The output settings have changed since the unfinished run in ' + self.path +
+                               ' was started.')
+        for key in self.paths:
+            path = self.paths[key]
+            if not os.path.exists(path) or os.path.getsize(path) < self.sizes[key]:
+                raise JournalError(path + ' is missing or shorter than ' + self.path + ' records.')
+            output = open(path, 'r+b')
+            try:
+                output.truncate(self.sizes[key])
+            finally:
+                output.close()
+
+    def finish(self):
+        """
+        Delete the journal once the run is over.
+        """
+        self.journal.close()
+        os.remove(self.path)
+
+    def close(self):
+        self.journal.close()
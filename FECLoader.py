@@ -0,0 +1,335 @@
+# FEC Loader
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module loads the schedule rows FEC Parser writes to its output
+files straight into the Contribs_SchedA through Contribs_Text tables
+created by FECScraper.sql, so they no longer have to be imported by hand.
+
+Rows are sent to the database in batches with a single executemany()
+call per batch rather than one INSERT per row:
+ * batchsize rows are collected for a table before they are sent.
+ * Each filing's rows are committed together once the filing has been
+parsed, so a filing is either loaded in full or not at all.
+ * Empty fields are loaded as NULL.
+
+Two backends are included:
+ * sqlserver: Uses pyodbc and your connection string. If your version of
+pyodbc supports it, fast_executemany is turned on so each batch is sent
+to the server in one round trip.
+ * sqlite: Loads into a local SQLite database file, creating the tables
+if necessary. This needs nothing but Python and is handy for trying out
+the parser or timing loads.
+Any other DB-API connection can be used by passing it to Loader along
+with its parameter marker.
+
+You also can load output files you've already created, for example:
+    python FECLoader.py --sqlite FEC.db Output\\ScheduleAImport_2012_01_15_09_00_00.txt
+Compressed output files and parts (see FECOutputs.py) are read as they
+are, and a Parts_<timestamp>.json file loads every part listed in it.
+Run it with --help for the full list of options.
+"""
+
+# Import needed libraries
+import os, sys, time
+from FECSchedules import prefixes, schedules
+from FECOutputs import read_lines, manifest_files
+
+# Script variables
+batchsize = 5000
+
+
+def connect(backend, connstr=None, dbfile=None):
+    """
+    Open a connection for a backend. Returns the connection and the
+    parameter marker its driver uses.
+    """
+    if backend == 'sqlserver':
+        import pyodbc
+        return pyodbc.connect(connstr), '?'
+    if backend == 'sqlite':
+        import sqlite3
+        conn = sqlite3.connect(dbfile, timeout=60, check_same_thread=False)
+        create_sqlite_tables(conn)
+        return conn, '?'
+    raise ValueError('Unknown database backend: ' + str(backend))
+
+
+def create_sqlite_tables(conn):
+    """
+    Create the schedule tables in a SQLite database if they don't exist.
+    Every column is stored as text, just as in FECScraper.sql.
+    """
+    for prefix in prefixes:
+        schedule = schedules[prefix]
+        conn.execute('CREATE TABLE IF NOT EXISTS ' + schedule['table'] + ' ('
+                     'USATID INTEGER PRIMARY KEY, ' +
+                     ', '.join([column + ' TEXT' for column in schedule['columns']]) + ')')
+    conn.commit()
+
+
+class Loader(object):
+
+    def __init__(self, conn, marker='?', batchsize=batchsize):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batchsize = max(int(batchsize), 1)
+
+        # Send each batch to SQL Server in one round trip if pyodbc
+        # supports it. Other drivers don't have this attribute.
+        try:
+            self.cursor.fast_executemany = True
+        except AttributeError:
+            pass
+
+        # INSERT statement for each schedule, naming its columns so the
+        # table's identity column is filled in by the database
+        self.statements = {}
+        for prefix in prefixes:
+            schedule = schedules[prefix]
+            self.statements[prefix] = 'INSERT INTO ' + schedule['table'] + ' (' + \
+                                      ', '.join(schedule['columns']) + ') VALUES (' + \
+                                      ', '.join([marker] * schedule['width']) + ')'
+
+        # Rows waiting to be sent, and any partial line at the end of the
+        # data passed to feed(), for each schedule
+        self.pending = {}
+        self.partial = {}
+        for prefix in prefixes:
+            self.pending[prefix] = []
+
+        # Totals for report()
+        self.rows = 0
+        self.batches = 0
+        self.filings = 0
+        self.failures = 0
+        self.elapsed = 0.0
+        self.filingrows = 0
+
+        # First error raised by the database for the current filing
+        self.error = None
+
+    def feed(self, prefix, data):
+        """
+        Add tab-delimited output rows for a schedule. data can hold any
+        number of rows, and a row can be split across calls. If the
+        database rejects a batch, the rest of the filing is ignored and
+        the error is reported by finish().
+        """
+        if self.error is not None:
+            return
+        lines = (self.partial.pop(prefix, '') + data).split('\n')
+        tail = lines.pop()
+        if tail:
+            self.partial[prefix] = tail
+        batch = self.pending[prefix]
+        for line in lines:
+            batch.append([field or None for field in line.split('\t')])
+        if len(batch) >= self.batchsize:
+            self.flush(prefix)
+
+    def flush(self, prefix):
+        """
+        Send a schedule's pending rows to the database in batches.
+        """
+        batch = self.pending[prefix]
+        self.pending[prefix] = []
+        start = time.time()
+        try:
+            for i in xrange(0, len(batch), self.batchsize):
+                self.cursor.executemany(self.statements[prefix], batch[i:i + self.batchsize])
+                self.batches += 1
+        except Exception, e:
+            self.error = e
+        self.elapsed += time.time() - start
+        self.filingrows += len(batch)
+
+    def finish(self, filename):
+        """
+        Send the rest of a filing's rows and commit them. If the database
+        rejected any of them, the filing's rows are rolled back and a
+        message is printed. Returns True if the rows were loaded.
+        """
+        for prefix in list(self.partial):
+            self.feed(prefix, '\n')
+        for prefix in prefixes:
+            if self.pending[prefix] and self.error is None:
+                self.flush(prefix)
+
+        start = time.time()
+        try:
+            if self.error is not None:
+                raise self.error
+            self.conn.commit()
+        except Exception, e:
+            self.rollback()
+            print 'Could not load the rows for ' + filename + ' into the database: ' + str(e)
+            print 'They are still in the output files and can be imported by hand.\n'
+            return False
+        finally:
+            self.elapsed += time.time() - start
+
+        self.rows += self.filingrows
+        self.filings += 1
+        self.filingrows = 0
+        return True
+
+    def rollback(self):
+        """
+        Throw away the current filing's rows.
+        """
+        for prefix in prefixes:
+            self.pending[prefix] = []
+        self.partial = {}
+        self.filingrows = 0
+        self.failures += 1
+        self.error = None
+        self.conn.rollback()
+
+    def report(self):
+        """
+        Return a one-line summary of what has been loaded.
+        """
+        text = 'Loaded ' + str(self.rows) + ' rows from ' + str(self.filings) + \
+               ' filings in ' + str(self.batches) + ' batches'
+        if self.elapsed:
+            text += ' (%.1f seconds in the database, %.0f rows/sec)' % (self.elapsed, self.rows / self.elapsed)
+        if self.failures:
+            text += '. ' + str(self.failures) + ' filings could not be loaded'
+        return text + '.'
+
+    def close(self):
+        self.cursor.close()
+        self.conn.close()
+
+
+class LoaderGroup(object):
+    """
+    Hands the same rows to several loaders, such as a Loader and a
+    FECRollups.Aggregator.
+    """
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+
+    def feed(self, prefix, data):
+        for loader in self.loaders:
+            loader.feed(prefix, data)
+
+    def finish(self, filename):
+        results = [loader.finish(filename) for loader in self.loaders]
+        return False not in results
+
+    def rollback(self):
+        for loader in self.loaders:
+            loader.rollback()
+
+    def report(self):
+        return '\n'.join([loader.report() for loader in self.loaders])
+
+    def close(self):
+        for loader in self.loaders:
+            loader.close()
+
+
+class LoadingOutput(object):
+    """
+    An output file that also feeds the rows written to it to a Loader,
+    so rows can be loaded as FEC Parser writes them.
+    """
+
+    def __init__(self, output, loader, prefix):
+        self.output = output
+        self.loader = loader
+        self.prefix = prefix
+
+    def write(self, data):
+        self.output.write(data)
+        self.loader.feed(self.prefix, data)
+
+    def __getattr__(self, name):
+        # Anything else, such as the flush() and truncate() a batch run
+        # needs (see FECJournal.py), goes to the output file
+        return getattr(self.output, name)
+
+    def close(self):
+        self.output.close()
+
+
+def prefix_from_name(filename):
+    """
+    Return the schedule prefix for an output file name, or None.
+    """
+    basename = os.path.basename(filename).split('\\')[-1]
+    for prefix in prefixes:
+        if basename.startswith(schedules[prefix]['filename']):
+            return prefix
+    return None
+
+
+def load_output_file(loader, outputfile):
+    """
+    Load an existing schedule output file, committing each filing's rows
+    as they are read. Rows are grouped on the ImageID column.
+    """
+    prefix = prefix_from_name(outputfile)
+    if prefix is None:
+        print 'Skipping ' + outputfile + ': not a schedule output file.'
+        return
+    datafile = read_lines(outputfile)
+    try:
+        # Skip column headers
+        next(datafile, '')
+        imageid = None
+        rows = []
+        for line in datafile:
+            rowid = line.split('\t', 2)[1]
+            if rowid != imageid and rows:
+                loader.feed(prefix, ''.join(rows))
+                loader.finish(imageid)
+                rows = []
+            imageid = rowid
+            rows.append(line)
+        if rows:
+            loader.feed(prefix, ''.join(rows))
+            loader.finish(imageid)
+    finally:
+        datafile.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    # Use the same settings as FEC Parser
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        connstr = 'DRIVER={SQL Server};SERVER=;DATABASE=FEC;UID=;PWD=;'
+
+    parser = argparse.ArgumentParser(description='Load FEC Parser schedule output files into a database.')
+    parser.add_argument('files', nargs='+', help='schedule output files or Parts_<timestamp>.json files to load')
+    parser.add_argument('--sqlite', metavar='FILE',
+                        help='load into a SQLite database file instead of SQL Server')
+    parser.add_argument('--batch', type=int, default=batchsize,
+                        help='rows per executemany() call (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        conn, marker = connect('sqlite', dbfile=args.sqlite)
+    else:
+        conn, marker = connect('sqlserver', connstr=connstr)
+    loader = Loader(conn, marker, args.batch)
+    outputfiles = []
+    for path in args.files:
+        if path.endswith('.json'):
+            outputfiles.extend(manifest_files(path))
+        else:
+            outputfiles.append(path)
+    for outputfile in outputfiles:
+        print 'Loading: ' + outputfile
+        load_output_file(loader, outputfile)
+    print loader.report()
+    loader.close()
+    if loader.failures:
+        sys.exit(1)
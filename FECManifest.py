@@ -0,0 +1,233 @@
+# FEC Manifest
+# Companion module for FEC Scraper and FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module keeps a persistent list of every filing FEC Scraper has
+downloaded and what FEC Parser has done with it, so the scraper no
+longer has to list the import, review and processed directories on
+every run to find out which filings it already has.
+
+The manifest is a SQLite database with one row per filing ID holding
+its state and current location:
+ * downloaded: saved to the import directory and waiting to be parsed.
+ * parsed: parsed successfully and moved to the processed directory.
+ * review: moved to the review directory.
+
+FEC Scraper adds a row as each file is downloaded and FEC Parser updates
+it as each file is moved, so looking up a filing ID is a single indexed
+query no matter how many filings have piled up over the years.
+
+The manifest also lists filings whose header was added to the database
+but whose rows were dropped because the download they were being parsed
+from failed partway (see FECParser.StreamParser). When such a filing is
+parsed again, FEC Parser accepts the header it finds in the database as
+its own instead of sending the filing to review. A filing is taken off
+the list once it is parsed or sent to review.
+
+The first time the manifest is opened it is empty, so it is seeded from
+whatever is already in the import, review and processed directories.
+If you add or delete files by hand, rebuild it from the directories:
+    python FECManifest.py --rebuild
+"""
+
+# Import needed libraries
+import os, re, glob, time, sqlite3, threading
+
+# Filing states
+DOWNLOADED = 'downloaded'
+PARSED = 'parsed'
+REVIEW = 'review'
+
+# Filing IDs are the leading digits of a data file's name. Files in the
+# review directory can carry a suffix explaining why they're there, such
+# as 421841_INV_HDR.fec.
+fileidpattern = re.compile(r'[0-9]+')
+
+
+def fileid_from_name(filename):
+    """
+    Return the filing ID for a data file name or path, or None if the
+    name does not begin with a number.
+    """
+    match = fileidpattern.match(os.path.basename(filename))
+    if match:
+        return match.group(0)
+    return None
+
+
+class Manifest(object):
+
+    def __init__(self, path):
+        self.path = path
+
+        # The scraper updates the manifest from several download
+        # threads, so share one connection behind a lock. Parser worker
+        # processes each open their own connection and rely on SQLite's
+        # own locking, waiting up to timeout seconds for each other.
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS filings ('
+                          'fileid TEXT PRIMARY KEY, '
+                          'state TEXT NOT NULL, '
+                          'location TEXT, '
+                          'updated TEXT NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS headers ('
+                          'fileid TEXT PRIMARY KEY, '
+                          'updated TEXT NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS settings ('
+                          'name TEXT PRIMARY KEY, '
+                          'value TEXT)')
+        self.conn.commit()
+
+    def __contains__(self, fileid):
+        return self.get(fileid) is not None
+
+    def get(self, fileid):
+        """
+        Return (state, location) for a filing ID, or None if the filing
+        is not in the manifest.
+        """
+        self.lock.acquire()
+        try:
+            return self.conn.execute('SELECT state, location FROM filings WHERE fileid = ?',
+                                     (str(fileid),)).fetchone()
+        finally:
+            self.lock.release()
+
+    def update(self, fileid, state, location=None):
+        """
+        Record the state and location of a filing.
+        """
+        self.update_many([(fileid, state, location)])
+
+    def update_many(self, filings):
+        """
+        Record the state and location of several filings at once from a
+        list of (fileid, state, location) tuples. Filings that have been
+        parsed or sent to review are taken off the list of headers.
+        """
+        updated = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.lock.acquire()
+        try:
+            self.conn.executemany('INSERT OR REPLACE INTO filings (fileid, state, location, updated) '
+                                  'VALUES (?, ?, ?, ?)',
+                                  [(str(f), s, l, updated) for f, s, l in filings])
+            self.conn.executemany('DELETE FROM headers WHERE fileid = ?',
+                                  [(str(f),) for f, s, l in filings if s != DOWNLOADED])
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def add_header(self, fileid):
+        """
+        Record that a filing's header was added to the database but its
+        rows were dropped.
+        """
+        updated = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.lock.acquire()
+        try:
+            self.conn.execute('INSERT OR REPLACE INTO headers (fileid, updated) VALUES (?, ?)',
+                              (str(fileid), updated))
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def has_header(self, fileid):
+        """
+        Return True if a filing's header was added to the database by a
+        parse that didn't finish.
+        """
+        self.lock.acquire()
+        try:
+            return self.conn.execute('SELECT 1 FROM headers WHERE fileid = ?',
+                                     (str(fileid),)).fetchone() is not None
+        finally:
+            self.lock.release()
+
+    def fileids(self, state=None):
+        """
+        Return a list of filing IDs, optionally only those in one state.
+        """
+        self.lock.acquire()
+        try:
+            if state is None:
+                rows = self.conn.execute('SELECT fileid FROM filings')
+            else:
+                rows = self.conn.execute('SELECT fileid FROM filings WHERE state = ?', (state,))
+            return [row[0] for row in rows]
+        finally:
+            self.lock.release()
+
+    def setting(self, name, value=None):
+        """
+        Return a stored setting, or store it if value is given.
+        """
+        self.lock.acquire()
+        try:
+            if value is None:
+                row = self.conn.execute('SELECT value FROM settings WHERE name = ?', (name,)).fetchone()
+                return row and row[0]
+            self.conn.execute('INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)', (name, value))
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def reconcile(self, directories, replace=False):
+        """
+        Record every data file found in a list of (directory, state)
+        pairs. Directories are scanned in order, so if the same filing
+        shows up in more than one, the last directory wins. If replace
+        is True, filings not found in any directory are forgotten.
+        Returns the number of files found.
+        """
+        if replace:
+            self.lock.acquire()
+            try:
+                self.conn.execute('DELETE FROM filings')
+            finally:
+                self.lock.release()
+        filings = []
+        for directory, state in directories:
+            for datafile in glob.glob(os.path.join(directory, '*.fec')):
+                fileid = fileid_from_name(datafile)
+                if fileid:
+                    filings.append((fileid, state, datafile))
+        self.update_many(filings)
+        self.setting('seeded', time.strftime('%Y-%m-%d %H:%M:%S'))
+        return len(filings)
+
+    def seed(self, directories):
+        """
+        Reconcile the manifest with directories the first time it is
+        used. Returns the number of files found, or None if the manifest
+        had already been seeded.
+        """
+        if self.setting('seeded'):
+            return None
+        return self.reconcile(directories)
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    # Use the same settings as FEC Scraper and FEC Parser
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    savedir = maindir + 'Import\\'
+    reviewdir = maindir + 'Review\\'
+    processeddir = maindir + 'Processed\\'
+    manifestfile = maindir + 'Manifest.db'
+
+    manifest = Manifest(manifestfile)
+    if '--rebuild' in sys.argv[1:]:
+        count = manifest.reconcile([(processeddir, PARSED), (reviewdir, REVIEW), (savedir, DOWNLOADED)], True)
+        print 'Recorded ' + str(count) + ' files.'
+    for state in (DOWNLOADED, PARSED, REVIEW):
+        print state + ': ' + str(len(manifest.fileids(state)))
+    manifest.close()
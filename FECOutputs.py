@@ -0,0 +1,330 @@
+# FEC Outputs
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module writes FEC Parser's tab-delimited schedule output files
+compressed and split into numbered parts. FEC Parser uses it when the
+outputcompression, rotatemb or rotaterows user variables are set.
+
+A busy run can produce tens of gigabytes of schedule rows. Compressed
+with gzip, the text files take up a fraction of the space, and splitting
+them into parts lets a loader import several parts at once:
+ * Compression: 'gzip' writes .txt.gz files that any gzip tool can
+read. 'zstd' writes .txt.zst files, which are faster to write and read;
+it needs the zstandard library (https://pypi.org/project/zstandard/).
+ * Rotation: Once a part holds rotatemb megabytes (before compression)
+or rotaterows rows, the next filing's rows start a new part, numbered
+ScheduleAImport_<timestamp>_0001, _0002 and so on. A filing's rows are
+never split between two parts, so a part can go over the limit by the
+rows of one filing, and each part can be loaded on its own.
+Every part starts with the usual column headers.
+
+Each part is listed in a JSON file next to the output files,
+Parts_<timestamp>.json, as soon as it is finished. For each part it
+records the output's schedule prefix and table, the file name, the part
+number, the number of rows and bytes before compression, the size of
+the file and the first and last ImageID in it. A loader watching a run
+can safely import any part listed there.
+
+FECLoader.py can load the parts directly, or every part listed in a
+Parts_<timestamp>.json file:
+    python FECLoader.py --sqlite FEC.db Output\\Parts_2012_01_15_09_00_00.json
+"""
+
+# Import needed libraries
+import os, gzip, json
+
+# zstandard is optional
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Script variables
+extensions = {'none': '.txt', 'gzip': '.txt.gz', 'zstd': '.txt.zst'}
+bufsize = 1048576
+
+
+def check_compression(compression):
+    """
+    Raise ValueError if a compression can't be used.
+    """
+    if compression not in extensions:
+        raise ValueError('Unknown output compression: ' + str(compression))
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError('zstd compression needs the zstandard library')
+
+
+class ZstdFile(object):
+    """
+    A file that compresses what is written to it with zstandard.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.compressor = zstandard.ZstdCompressor().compressobj()
+
+    def write(self, data):
+        self.file.write(self.compressor.compress(data))
+
+    def close(self):
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+
+def open_compressed(path, compression):
+    """
+    Open a file for writing with a compression: 'none', 'gzip' or 'zstd'.
+    """
+    check_compression(compression)
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', 6)
+    if compression == 'zstd':
+        return ZstdFile(path)
+    return open(path, 'wb')
+
+
+def read_lines(path, blocksize=bufsize):
+    """
+    Yield the lines of an output file or part, uncompressing it if its
+    name ends with .gz or .zst.
+    """
+    if path.endswith('.gz'):
+        datafile = gzip.open(path, 'rb')
+    else:
+        datafile = open(path, 'rb')
+    try:
+        if not path.endswith('.zst'):
+            for line in datafile:
+                yield line
+            return
+        check_compression('zstd')
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        pending = ''
+        while True:
+            block = datafile.read(blocksize)
+            if not block:
+                break
+            lines = (pending + decompressor.decompress(block)).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        if pending:
+            yield pending
+    finally:
+        datafile.close()
+
+
+def row_imageid(rows, start):
+    """
+    Return the ImageID of the row starting at index start of rows.
+    Schedule rows start with the form type and the ImageID.
+    """
+    first = rows.find('\t', start) + 1
+    end = rows.find('\t', first)
+    if first and end >= 0 and rows.find('\n', start, end) < 0:
+        return rows[first:end]
+    end = rows.find('\n', start)
+    if end < 0:
+        end = len(rows)
+    fields = rows[start:end].split('\t', 2)
+    return len(fields) > 1 and fields[1] or ''
+
+
+class PartsManifest(object):
+    """
+    The list of finished parts for a run, saved to path as JSON each time
+    a part is added.
+    """
+
+    def __init__(self, path, compression):
+        self.path = path
+        self.compression = compression
+        self.parts = []
+
+    def add(self, part):
+        self.parts.append(part)
+        self.save()
+
+    def save(self):
+        output = open(self.path, 'w')
+        try:
+            json.dump({'compression': self.compression, 'parts': self.parts}, output, indent=1, sort_keys=True)
+        finally:
+            output.close()
+
+
+def manifest_files(path):
+    """
+    Return the paths of the parts listed in a Parts_<timestamp>.json file.
+    """
+    datafile = open(path)
+    try:
+        parts = json.load(datafile)['parts']
+    finally:
+        datafile.close()
+    folder = os.path.dirname(path)
+    return [os.path.join(folder, part['file']) for part in parts]
+
+
+class RotatingOutput(object):
+    """
+    A schedule output that takes the same tab-delimited rows FEC Parser
+    writes to its text outputs and writes them to compressed, numbered
+    parts. Rows can be split across calls to write().
+
+    prefix is the start of each part's path, such as
+    Output\\ScheduleAImport_2012_01_15_09_00_00. If maxbytes and maxrows
+    are both 0, a single file is written without a part number.
+    """
+
+    def __init__(self, prefix, header, output, table, manifest, compression='gzip', maxbytes=0, maxrows=0):
+        check_compression(compression)
+        self.prefix = prefix
+        self.header = header
+        self.output = output
+        self.table = table
+        self.manifest = manifest
+        self.compression = compression
+        self.maxbytes = maxbytes
+        self.maxrows = maxrows
+        self.rotate = bool(maxbytes or maxrows)
+        self.name = None
+        self.part = None
+        self.number = 0
+        self.partial = ''
+        self.buffer = []
+        self.buffered = 0
+
+    def open_part(self):
+        self.number += 1
+        self.name = self.prefix
+        if self.rotate:
+            self.name += '_%04d' % self.number
+        self.name += extensions[self.compression]
+        self.part = open_compressed(self.name, self.compression)
+        self.rows = 0
+        self.bytes = 0
+        self.full = False
+        self.firstid = None
+        self.lastrows = ''
+        self.add(self.header)
+
+    def close_part(self):
+        self.part.close()
+        self.manifest.add({'output': self.output,
+                           'table': self.table,
+                           'file': os.path.basename(self.name),
+                           'part': self.number,
+                           'rows': self.rows,
+                           'bytes': self.bytes,
+                           'size': os.path.getsize(self.name),
+                           'firstimageid': self.firstid,
+                           'lastimageid': self.last_imageid()})
+        self.part = None
+
+    def add(self, data):
+        """
+        Write data to the current part.
+        """
+        self.part.write(data)
+        self.bytes += len(data)
+
+    def add_rows(self, rows):
+        """
+        Write complete rows to the current part.
+        """
+        if self.firstid is None:
+            self.firstid = row_imageid(rows, 0)
+        self.lastrows = rows
+        self.rows += rows.count('\n')
+        self.add(rows)
+
+    def last_imageid(self):
+        """
+        Return the ImageID of the last row in the current part.
+        """
+        rows = self.lastrows
+        return rows and row_imageid(rows, rows.rfind('\n', 0, len(rows) - 1) + 1) or None
+
+    def limit(self, rows):
+        """
+        Return the index in rows just past the row that fills the current
+        part, or None if the part isn't filled by rows.
+        """
+        cut = None
+        if self.maxbytes and self.bytes + len(rows) >= self.maxbytes:
+            cut = rows.find('\n', max(self.maxbytes - self.bytes - 1, 0)) + 1
+        if self.maxrows and self.rows + rows.count('\n') >= self.maxrows:
+            end = -1
+            for i in xrange(self.maxrows - self.rows):
+                end = rows.find('\n', end + 1)
+            if cut is None or end + 1 < cut:
+                cut = end + 1
+        return cut
+
+    def write(self, data):
+        # FEC Parser writes a row at a time, so collect the rows into
+        # blocks before sorting them into parts
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= bufsize:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the collected rows to the current part, starting a new part
+        whenever one fills up.
+        """
+        # Hold back any partial row until the rest of it arrives
+        data = self.partial + ''.join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        end = data.rfind('\n') + 1
+        self.partial = data[end:]
+        rows = data[:end]
+
+        while rows:
+            if self.part is None:
+                self.open_part()
+            if not self.rotate:
+                self.add_rows(rows)
+                return
+
+            # Write rows until the part is full
+            if not self.full:
+                cut = self.limit(rows)
+                if cut is None:
+                    self.add_rows(rows)
+                    return
+                if cut:
+                    self.add_rows(rows[:cut])
+                    rows = rows[cut:]
+                self.full = True
+                self.lastid = self.last_imageid()
+                if not rows:
+                    return
+
+            # Then finish the last filing in it. A filing's rows are all
+            # together, so if the last row belongs to it, they all do.
+            lastid = self.lastid
+            if row_imageid(rows, rows.rfind('\n', 0, len(rows) - 1) + 1) == lastid:
+                self.add_rows(rows)
+                return
+            end = 0
+            while end < len(rows) and row_imageid(rows, end) == lastid:
+                end = rows.find('\n', end) + 1
+            if end:
+                self.add_rows(rows[:end])
+                rows = rows[end:]
+            self.close_part()
+
+    def close(self):
+        self.flush()
+        if self.partial:
+            self.write('\n')
+            self.flush()
+        if self.part is None:
+            self.open_part()
+        self.close_part()
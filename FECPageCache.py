@@ -0,0 +1,213 @@
+# FEC Page Cache
+# Companion module for FEC Scraper
+# Developed with Python 2.7.2
+
+"""
+This module remembers what FEC Scraper found on each committee's index
+page so the pages don't have to be downloaded and searched in full on
+every run. Most committees haven't filed anything new since the last
+run, so most pages haven't changed.
+
+The cache is a SQLite database with one row per index page holding:
+ * The ETag and Last-Modified headers the website sent with the page.
+ * A hash of the page's contents.
+ * The filings found on the page, with the form type, report code and
+coverage dates shown for each (see FECIndex.py).
+
+When a page is requested again:
+ * The ETag and Last-Modified values are sent back to the website, which
+can answer 304 Not Modified instead of sending the page. The cached
+filings are used.
+ * If the website sends the page anyway but it hasn't changed, the
+cached filings are used without searching the page again.
+ * Otherwise the page is searched and the cache is updated.
+
+Two limits keep the cache from growing stale or large:
+ * maxage: Pages last downloaded in full more than maxage days ago are
+dropped, so every page is downloaded in full at least that often.
+ * maxpages: If more than maxpages pages are cached, those checked
+least recently are dropped.
+
+The cache can be deleted at any time; it is rebuilt as pages are
+downloaded. To empty it, run:
+    python FECPageCache.py --clear
+"""
+
+# Import needed libraries
+import hashlib, json, sqlite3, threading, time
+from FECIndex import IndexFiling
+
+# Script variables
+maxage = 30
+maxpages = 10000
+
+
+class PageCache(object):
+
+    def __init__(self, path, maxage=maxage, maxpages=maxpages):
+        self.path = path
+        self.maxage = maxage
+        self.maxpages = maxpages
+
+        # Pages are checked from several download threads, so share one
+        # connection behind a lock, as FECManifest.py does
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+
+        # Caches from before filings were kept hold only filing numbers,
+        # so start them over
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(pages)')]
+        if columns and 'filings' not in columns:
+            self.conn.execute('DROP TABLE pages')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS pages ('
+                          'url TEXT PRIMARY KEY, '
+                          'etag TEXT, '
+                          'lastmodified TEXT, '
+                          'hash TEXT NOT NULL, '
+                          'filings TEXT NOT NULL, '
+                          'stored REAL NOT NULL, '
+                          'checked REAL NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS pages_checked ON pages (checked)')
+        self.conn.commit()
+        self.evict()
+
+        # How each page request turned out, for report()
+        self.counts = {'notmodified': 0, 'unchanged': 0, 'changed': 0}
+
+    def __len__(self):
+        self.lock.acquire()
+        try:
+            return self.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+        finally:
+            self.lock.release()
+
+    def get(self, url):
+        """
+        Return (etag, lastmodified, hash, filings) for a cached page, or
+        None if the page is not in the cache.
+        """
+        self.lock.acquire()
+        try:
+            row = self.conn.execute('SELECT etag, lastmodified, hash, filings FROM pages WHERE url = ?',
+                                    (url,)).fetchone()
+        finally:
+            self.lock.release()
+        if row is None:
+            return None
+        return row[0], row[1], row[2], [IndexFiling(*fields) for fields in json.loads(row[3])]
+
+    def store(self, url, etag, lastmodified, pagehash, filings, full=True):
+        """
+        Record what was found on a page. full is False if the page was
+        not downloaded in full (the website answered 304), in which case
+        the time it was last downloaded in full is kept.
+        """
+        now = time.time()
+        self.lock.acquire()
+        try:
+            if full:
+                self.conn.execute('INSERT OR REPLACE INTO pages '
+                                  '(url, etag, lastmodified, hash, filings, stored, checked) '
+                                  'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                  (url, etag, lastmodified, pagehash,
+                                   json.dumps([filing.fields() for filing in filings]), now, now))
+            else:
+                self.conn.execute('UPDATE pages SET checked = ? WHERE url = ?', (now, url))
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def fetch(self, fetcher, url, search):
+        """
+        Fetch an index page with fetcher (see FECFetcher.py), sending a
+        conditional request if the page is cached, and return its HTTP
+        status and the filings on it. search is called with the page's
+        contents to find the filings (a list of FECIndex.IndexFiling)
+        when the page has changed. The filings are None if the page could
+        not be fetched.
+        """
+        cached = self.get(url)
+        headers = {}
+        if cached is not None:
+            etag, lastmodified, pagehash, filings = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if lastmodified:
+                headers['If-Modified-Since'] = lastmodified
+
+        status, responseheaders, body = fetcher.get(url, headers)
+        if status == 304 and cached is not None:
+            self.store(url, etag, lastmodified, pagehash, filings, full=False)
+            self.count('notmodified')
+            return status, filings
+        if status != 200:
+            return status, None
+
+        newhash = hashlib.sha1(body).hexdigest()
+        if cached is not None and newhash == pagehash:
+            self.count('unchanged')
+        else:
+            filings = search(body)
+            self.count('changed')
+        self.store(url, responseheaders.get('etag'), responseheaders.get('last-modified'), newhash, filings)
+        return status, filings
+
+    def count(self, outcome):
+        self.lock.acquire()
+        try:
+            self.counts[outcome] += 1
+        finally:
+            self.lock.release()
+
+    def evict(self):
+        """
+        Drop pages older than maxage days and, if more than maxpages
+        pages are cached, those checked least recently.
+        """
+        self.lock.acquire()
+        try:
+            if self.maxage:
+                self.conn.execute('DELETE FROM pages WHERE stored < ?', (time.time() - self.maxage * 86400,))
+            if self.maxpages:
+                self.conn.execute('DELETE FROM pages WHERE url NOT IN '
+                                  '(SELECT url FROM pages ORDER BY checked DESC LIMIT ?)', (self.maxpages,))
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute('DELETE FROM pages')
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def report(self):
+        """
+        Return a one-line summary of how the cache was used.
+        """
+        return 'Index pages: ' + str(self.counts['notmodified']) + ' not modified, ' + \
+               str(self.counts['unchanged']) + ' unchanged, ' + str(self.counts['changed']) + ' new or changed.'
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    # Use the same settings as FEC Scraper
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    pagecachefile = maindir + 'PageCache.db'
+
+    cache = PageCache(pagecachefile)
+    if '--clear' in sys.argv[1:]:
+        cache.clear()
+        print 'Cleared the index page cache.'
+    print 'Cached pages: ' + str(len(cache))
+    cache.close()
@@ -22,6 +22,9 @@ Files with unsupported headers are moved to the review directory.
 Child rows with unrecognizable codes in the first (FormType) column
 are saved to a timestamped "review" file saved in the review directory.
 
+The rows themselves are read and cleaned by FECRecords.py, which has no
+settings of its own. Import it to parse filings from your own programs.
+
 For complete documentation, see the README file.
 """
 
@@ -41,762 +44,1459 @@ destdir = maindir + 'Processed\\'
 outputdir = maindir + 'Output\\'
 reviewdir = maindir + 'Review\\'
 
+# The manifest records where each filing is and whether it has been
+# parsed (see FECManifest.py). It is shared with FEC Scraper.
+manifestfile = maindir + 'Manifest.db'
+
 # Database integration flag
 # Set to 1 to integrate with your database.
 # Set to 0 to disable this functionality
 usedatabaseflag = 1
 
-# Script variables
-delimiter = chr(28)
+# Amendments
+# Set to 1 to work out which filings have been superseded by amendments
+# as each header is parsed, and write them to Supersedes_<timestamp>.txt
+# in the output directory (see FECAmendments.py). Every filing seen is
+# kept in amendmentsfile.
+amendmentsflag = 1
+amendmentsfile = maindir + 'Amendments.db'
+
+# Delta mode
+# Set to 1 to write only the child rows of an amendment that have been
+# added or changed since the filing it amends, and list the changes,
+# including removed rows, in Deltas_<timestamp>.txt in the output
+# directory (see FECDelta.py). A hash of each row of the latest filing
+# of every report is kept in deltafile. Needs amendmentsflag set to 1.
+# You also can use the --delta command-line option.
+deltaflag = 0
+deltafile = maindir + 'Deltas.db'
+
+# Number of worker processes
+# Set to 1 to parse files one at a time.
+# Set higher to parse several files at once. You also can use the
+# --workers command-line option.
+workers = 1
+
+# Large files
+# Data files of at least splitsize megabytes are split into byte ranges
+# that are parsed at once by several worker processes, so a single very
+# large filing doesn't keep the other processors waiting. The rows are
+# written in the same order as if the file had been parsed in one piece.
+# When files are parsed one at a time, splitworkers processes are used
+# (0 for one per processor); otherwise the --workers processes are.
+# Set splitsize to 0 to parse every file in one piece. You also can use
+# the --split-size command-line option.
+splitsize = 500
+splitworkers = 0
+
+# Output format for schedule rows
+# 'tsv' writes tab-delimited text files.
+# 'columnar' writes typed column files instead (see FECColumnar.py):
+# Parquet if pyarrow is installed, otherwise FEC Parser's own format.
+# You also can use the --format command-line option.
+outputformat = 'tsv'
+
+# Compression and rotation of tab-delimited schedule output files
+# (see FECOutputs.py)
+# outputcompression is 'none' for plain text files, 'gzip' for .txt.gz
+# files or 'zstd' for .txt.zst files (needs the zstandard library).
+# Set rotatemb or rotaterows to start a new numbered part of a schedule
+# output file once it holds this many megabytes (before compression) or
+# rows; 0 for no limit. A filing's rows are never split between parts.
+# Each finished part is listed in Parts_<timestamp>.json. You also can
+# use the --compress, --rotate-mb and --rotate-rows command-line options.
+outputcompression = 'none'
+rotatemb = 0
+rotaterows = 0
+
+# Bulk loading
+# Set to 1 to also load schedule rows into the Contribs_SchedA through
+# Contribs_Text tables as each file is parsed (see FECLoader.py).
+# loadbackend is 'sqlserver' to load into the database in connstr or
+# 'sqlite' to load into the SQLite database file loaddbfile.
+# loadbatchsize is the number of rows sent to the database at once.
+bulkloadflag = 0
+loadbackend = 'sqlserver'
+loaddbfile = maindir + 'FEC.db'
+loadbatchsize = 5000
+
+# Rollups
+# Set rollupflag to 1 to add up schedule rows into summary tables as
+# each file is parsed, kept up to date in rollupfile as filings are
+# added and amended (see FECRollups.py). Each rollup in rollups is
+# given as (name, schedule prefix, columns to group by, amount column).
+# Rollups can't be built in delta mode, which leaves out the rows of an
+# amendment that haven't changed.
+rollupflag = 0
+rollupfile = maindir + 'Rollups.db'
+rollups = (('ReceiptsByState', 'SA', ('CommID', 'ContState'), 'ContAmount'),
+           ('ReceiptsByZip', 'SA', ('CommID', 'ContZip'), 'ContAmount'),
+           ('ReceiptsByEmployer', 'SA', ('CommID', 'ContEmployer'), 'ContAmount'),
+           ('DisbursementsByPurpose', 'SB', ('FilerCommID', 'ExpPurpDesc'), 'ExpAmount'),
+           ('TopDonors', 'SA', ('CommID', 'ContLastName', 'ContFirstName', 'ContZip'), 'ContAmount'))
+
+# Search index
+# Set searchflag to 1 to add the contributors, payees and committees
+# named in Schedule A, B and E rows to a search index in searchfile as
+# each file is parsed, so every row for a donor can be looked up by name,
+# ZIP code, employer or committee (see FECSearch.py). The index can't be
+# built in delta mode, which leaves out the rows of an amendment that
+# haven't changed.
+searchflag = 0
+searchfile = maindir + 'Search.db'
+
+# Parsing statistics
+# Set to 1 to time each stage of parsing and count the rows written for
+# each filing, and save the figures next to the output files as
+# Stats_<timestamp>.json and .csv (see FECStats.py).
+# You also can use the --stats command-line option.
+statsflag = 0
+
+# Batch mode
+# Set to 1 to run without stopping to wait for Enter. A file that causes
+# an unexpected error has its rows dropped and is moved to the review
+# directory, and the run carries on with the next file. A journal is
+# kept so a run that crashes can be resumed by starting FEC Parser
+# again (see FECJournal.py). Batch mode needs uncompressed tab-delimited
+# output files that aren't rotated, and bulkloadflag set to 0.
+# You also can use the --batch command-line option.
+batchflag = 0
+
+# Watch mode
+# With the --watch option, FEC Parser keeps running and parses each data
+# file as soon as it lands in the import directory, so files can be
+# parsed while FEC Scraper is still downloading (see FECWatch.py). All
+# the files go into a single set of timestamped output files, which are
+# closed when you press Ctrl+C or when no new file has arrived for
+# watchidle seconds (0 to keep watching until stopped):
+#  * watchinterval: How often, in seconds, to look for new files if the
+# pyinotify library isn't installed.
+#  * watchqueue: Most files to queue for parsing at once.
+watchinterval = 2
+watchqueue = 16
+watchidle = 0
 
 # Import needed libraries
-import os, glob, time, linecache, shutil
+import os, sys, glob, time, mmap, shutil, signal, argparse, itertools, threading, multiprocessing, collections
+import cStringIO
+from FECRecords import Filing, FilingError, read_lines
+from FECSchedules import prefixes, schedules, forms
+from FECManifest import Manifest, fileid_from_name, PARSED, REVIEW
+from FECAmendments import Resolver, mapheaderstring
+from FECDelta import DeltaIndex, Differ, delta_plan, deltaheaderstring, transidcolumns, FILING, REMOVED
+from FECJournal import Journal, JournalError, find_journal
+from FECLoader import Loader, LoaderGroup, LoadingOutput, connect
+from FECRollups import Aggregator
+from FECSearch import SearchIndex
+from FECWatch import Watcher
+from FECArchive import is_member, split_member, member_filename, open_member, member_size, extract_member, \
+    pending_members, finished_fileids, close_archives
+import FECColumnar, FECOutputs, FECStats
 
-# Create text files for data dump
-try:
-    timestamp = time.strftime('%Y_%m_%d_%H_%M_%S')
-    scheduleafile = outputdir + 'ScheduleAImport_' + timestamp + '.txt'
-    schedulebfile = outputdir + 'ScheduleBImport_' + timestamp + '.txt'
-    schedulecfile = outputdir + 'ScheduleCImport_' + timestamp + '.txt'
-    schedulec1file = outputdir + 'ScheduleC1Import_' + timestamp + '.txt'
-    schedulec2file = outputdir + 'ScheduleC2Import_' + timestamp + '.txt'
-    scheduledfile = outputdir + 'ScheduleDImport_' + timestamp + '.txt'
-    scheduleefile = outputdir + 'ScheduleEImport_' + timestamp + '.txt'
-    textfile = outputdir + 'TextImport_' + timestamp + '.txt'
-    reviewfile = reviewdir + 'Review_' + timestamp + '.txt'
-
-    sched_a_file = open(scheduleafile, 'w')
-    sched_b_file = open(schedulebfile, 'w')
-    sched_c_file = open(schedulecfile, 'w')
-    sched_c1_file = open(schedulec1file, 'w')
-    sched_c2_file = open(schedulec2file, 'w')
-    sched_d_file = open(scheduledfile, 'w')
-    sched_e_file = open(scheduleefile, 'w')
-    text_file = open(textfile, 'w')
-    review_file = open(reviewfile, 'w')
-
-    # Create column headers
-    scheduleaheaderstring = 'ParentType\tImageId\tFormType\tCommID\tTransID\tBackRefTransID\tBackRefSchedName\t' \
-                   'EntityType\tContOrgName\tContLastName\tContFirstName\tContMidName\t' \
-                   'ContPrefix\tContSuffix\tContAddress1\tContAddress2\tContCity\tContState\t' \
-                   'ContZip\tElecCode\tElecOtherDesc\tstrContDate\tContAmount\tContAggregate\t' \
-                   'ContPurposeCode\tContPurposeDesc\tContEmployer\tContOccupation\t' \
-                   'DonorCommFECID\tDonorCommName\tDonorCandFECID\tDonorCandLastName\t' \
-                   'DonorCandFirstName\tDonorCandMidName\tDonorCandPrefix\tDonorCandSuffix\t' \
-                   'DonorCandOffice\tDonorCandState\tDonorCandDist\tConduitName\t' \
-                   'ConduitAddress1\tConduitAddress2\tConduitCity\tConduitState\tConduitZip\t' \
-                   'MemoCode\tMemoText\n'
-    schedulebheaderstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\tBackRefSchedName\t' \
-                    'EntityType\tPayeeOrgName\tPayeeLastName\tPayeeFirstName\tPayeeMidName\t' \
-                    'PayeePrefix\tPayeeSuffix\tPayeeAddress1\tPayeeAddress2\tPayeeCity\t' \
-                    'PayeeState\tPayeeZip\tElecCode\tElecOtherDesc\tstrExpDate\tExpAmount\t' \
-                    'SemiAnnRefundedBundledAmt\tExpPurpCode\tExpPurpDesc\tCatCode\tBenCommFECID\t' \
-                    'BenCommName\tBenCandFECID\tBenCandLastName\tBenCandFirstName\tBenCandMidName\t' \
-                    'BenCandPrefix\tBenCandSuffix\tBenCandOffice\tBenCandState\tBenCandDist\t' \
-                    'ConduitName\tConduitAddress1\tConduitAddress2\tConduitCity\tConduitState\t' \
-                    'ConduitZip\tMemoCode\tMemoText\n'
-    schedulecheaderstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tRectLineNbr\tEntityType\t' \
-                    'LenderOrgName\tLenderLastName\tLenderFirstName\tLenderMidName\t' \
-                    'LenderPrefix\tLenderSuffix\tLenderAddress1\tLenderAddress2\t' \
-                    'LenderCity\tLenterState\tLenderZip\tElecCod\tElecOtherDesc\t' \
-                    'LoanAmt\tLoanPymtToDate\tLoanBal\tstrLoanIncurredDate\t' \
-                    'strLoanDueDate\tLoanIntRate\tLoanSecuredFlag\tLoanPersFundsFlag\t' \
-                    'LenderCommID\tLenderCandID\tLenderCandLastName\tLenderCandFirstName\t' \
-                    'LenderCandMidName\tLenderCandPrefix\tLenderCandSuffix\tLenderCandOffice\t' \
-                    'LenderCandState\tLenderCandDist\tMemoCode\tMemoText\n'
-    schedulec1headerstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\t' \
-                    'LenderOrgName\tLenderAddress1\tLenderAddress2\tLenderCity\t' \
-                    'LenderState\tLenderZip\tLoanAmt\tLoanIntRate\tstrLoanIncurredDate\t' \
-                    'strLoanDueDate\tA1_LoanRestructuredFlag\tA2_strOrigLoanIncurredDate\t' \
-                    'B1_CreditAmtThisDraw\tB2_TotBalance\tC_OthersLiableFlag\t' \
-                    'D_CollateralFlag\tD1_CollateralDescription\tD2_CollateralValue\t' \
-                    'D3_PerfectedInterestFlag\tE1_FutureIncomeFlag\tE2_FutureIncomeDesc\t' \
-                    'E3_EstimatedValue\tE4_strDepositoryAcctEstablishedDate\tE5_AcctLocName\t' \
-                    'E6_AcctAddress1\tE7_AcctAddress1\tE8_AcctCity\tE9_State\tE10_Zip\t' \
-                    'E11_strDepositAcctAuthDate\tF_LoanBasisDesc\tG_TreasLastName\t' \
-                    'G_TreasFirstName\tG_TreasMidName\tG_TreasPrefix\tG_TreasSuffix\t' \
-                    'G_strDateSigned\tH_AuthorizedLastName\tH_AuthorizedfirstName\t' \
-                    'H_AuthorizedMidName\tH_AuthorizedPrefix\tH_AuthorizedSuffix\t' \
-                    'H_AuthorizedTitle\tH_strDateSigned\n'
-    schedulec2headerstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\t' \
-                    'GuarLastName\tGuarFirstName\tGuarMidName\tGuarPrefix\t' \
-                    'GuarSuffix\tGuarAddress1\tGuarAddress2\tGuarCity\tGuarState\t' \
-                    'GuarZip\tGuarEmployer\tGuarOccupation\tGuarAmt\n'
-    scheduledheaderstring = 'ParentType\tImageId\tFormType\tCommID\tTransID\tEntityType\tCredOrgName\t' \
-                    'CredLastName\tCredFirstName\tCredMidName\tCredPrefix\t' \
-                    'CredSuffix\tCredAddress1\tCredAddress2\tCredCity\tCredState\t' \
-                    'CredZip\tDebtPurpose\tBegBal_Prd\tIncurredAmt_Prd\tPaymtAmt_Prd\t' \
-                    'BalanceAtClose_Prd\n'
-    scheduleeheaderstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\t' \
-                    'BackRefSchedName\tEntityType\tPayeeOrgName\tPayeeLastName\t' \
-                    'PayeeFirstName\tPayeeMidName\tPayeePrefix\tPayeeSuffix\t' \
-                    'PayeeAddress1\tPayeeAddress2\tPayeeCity\tPayeeState\tPayeeZip\t' \
-                    'ElecCode\tElecOtherDesc\tstrExpDate\tExpAmount\tCalYTD\t' \
-                    'ExpPurpCode\tExpPurpDesc\tCatCode\tPayeeCommFECID\tSuppOppCode\t' \
-                    'SuppOppCandID\tSuppOppCandLastName\tSuppOppCandFirstName\t' \
-                    'SuppOppCandMidName\tSuppOppCandPrefix\tSuppOppCandSuffix\t' \
-                    'SuppOppCandOffice\tSuppOppCandState\tSuppOppCandDist\t' \
-                    'CompLastName\tCompFirstName\tCompMidName\tCompPrefix\tCompSuffix\t' \
-                    'strDateSigned\tMemoCode\tMemoText\n'
-    textheaderstring = 'ParentType\tImageId\tRecType\tCommID\tTransID\tBackRefTransID\tBackRefFormName\tFullText\n'
-
-    # Write headers to output files
-    sched_a_file.write(scheduleaheaderstring)
-    sched_b_file.write(schedulebheaderstring)
-    sched_c_file.write(schedulecheaderstring)
-    sched_c1_file.write(schedulec1headerstring)
-    sched_c2_file.write(schedulec2headerstring)
-    sched_d_file.write(scheduledheaderstring)
-    sched_e_file.write(scheduleeheaderstring)
-    text_file.write(textheaderstring)
-
-    # Import appropriate library if database integration is enabled.
-    # Otherwise, create text files to house headers.
-    if usedatabaseflag == 1:
-
-        # import necessary library
-        import pyodbc # SQL Server
 
+def output_names():
+    """
+    Return a dictionary mapping each output to the prefix of its file
+    name. Outputs are keyed on schedule prefix (see FECSchedules.py),
+    'review', 'supersedes' for the supersede map when amendments are
+    being worked out, 'deltas' for the delta list in delta mode and,
+    when database integration is disabled, 'F3', 'F3P' and 'F3X' for the
+    header files.
+    """
+    names = {'review': 'Review_'}
+    for prefix in prefixes:
+        names[prefix] = schedules[prefix]['filename']
+    if usedatabaseflag == 0:
+        for key in forms:
+            names[key] = forms[key]['filename']
+    if amendmentsflag == 1:
+        names['supersedes'] = 'Supersedes_'
+    if deltaflag == 1:
+        names['deltas'] = 'Deltas_'
+    return names
+
+
+def column_headers():
+    """
+    Return a dictionary of column headers keyed like output_names().
+    The review file has no column headers.
+    """
+    headers = {'review': '', 'supersedes': mapheaderstring, 'deltas': deltaheaderstring}
+    for key in forms:
+        headers[key] = forms[key]['headerstring']
+    for prefix in prefixes:
+        headers[prefix] = schedules[prefix]['headerstring']
+    return headers
+
+
+def open_outputs(timestamp, append=False):
+    """
+    Create the timestamped output files and write column headers.
+    The review file is saved in the review directory and all others
+    in the output directory. If append is True, the text files of a
+    batch run being resumed are opened to add to them instead.
+    """
+    mode = append and 'a' or 'w'
+    headers = column_headers()
+    outputs = {}
+    parts = None
+    for key, name in output_names().items():
+        if key == 'review':
+            outputs[key] = open(reviewdir + name + timestamp + '.txt', mode)
+        elif key in schedules and outputformat == 'columnar':
+            outputs[key] = FECColumnar.ColumnarOutput(outputdir + name + timestamp + FECColumnar.extension(),
+                                                      schedules[key]['columns'])
+            continue
+        elif key in schedules and (outputcompression != 'none' or rotatemb or rotaterows):
+            if parts is None:
+                parts = FECOutputs.PartsManifest(outputdir + 'Parts_' + timestamp + '.json', outputcompression)
+            outputs[key] = FECOutputs.RotatingOutput(outputdir + name + timestamp, headers[key], key,
+                                                     schedules[key]['table'], parts, outputcompression,
+                                                     rotatemb * 1048576, rotaterows)
+            continue
+        else:
+            outputs[key] = open(outputdir + name + timestamp + '.txt', mode)
+        if not append:
+            outputs[key].write(headers[key])
+    flag_malformed(outputs)
+    return outputs
+
+
+def flag_malformed(outputs):
+    """
+    Have column files flag values that don't fit their column's type in
+    the review file (see FECColumnar.py).
+    """
+    for key in outputs:
+        if isinstance(outputs[key], FECColumnar.ColumnarOutput):
+            outputs[key].review = outputs['review']
+
+
+def close_outputs(outputs):
+    # Column files flag values in the review file as they are closed, so
+    # it is closed last
+    for key in sorted(outputs, key=lambda key: key == 'review'):
+        outputs[key].close()
+
+
+def open_loader():
+    """
+    Connect to the database schedule rows are loaded into and open the
+    rollup database and search index, if any of them are enabled.
+    Returns whatever the rows are to be handed to, or None.
+    """
+    loaders = []
+    if bulkloadflag == 1:
+        conn, marker = connect(loadbackend, connstr, loaddbfile)
+        loaders.append(Loader(conn, marker, loadbatchsize))
+    if rollupflag == 1:
+        loaders.append(Aggregator(rollupfile, rollups, amendmentsflag == 1 and amendmentsfile or None))
+    if searchflag == 1:
+        loaders.append(SearchIndex(searchfile, amendmentsflag == 1 and amendmentsfile or None))
+    if not loaders:
+        return None
+    if len(loaders) == 1:
+        return loaders[0]
+    return LoaderGroup(loaders)
+
+
+def close_loader(loader):
+    if loader is not None:
+        print loader.report()
+        loader.close()
+
+
+def save_stats(stats, timestamp):
+    """
+    Print a summary of a run's statistics and save them, along with any
+    profile, to the output directory.
+    """
+    if stats is not None:
+        print stats.summary()
+        stats.save(outputdir + 'Stats_' + timestamp)
+        stats.save_profile(outputdir + 'Profile_' + timestamp + '.prof')
+
+
+def update_active(timestamp):
+    """
+    Set the Active column for the filings superseded by amendments in a
+    run once its headers have been added to the database, by calling
+    usp_UpdateActive (see FECScraper.sql) with each (ImageID,
+    SupersededBy) pair in the run's supersede map.
+    """
+    if usedatabaseflag != 1 or amendmentsflag != 1:
+        return
+    pairs = []
+    mapfile = open(outputdir + output_names()['supersedes'] + timestamp + '.txt', 'rb')
+    try:
+        mapfile.readline()
+        for line in mapfile:
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) == 3:
+                pairs.append((fields[1], fields[2]))
+    finally:
+        mapfile.close()
+    if not pairs:
+        return
+
+    import pyodbc
+    conn = pyodbc.connect(connstr)
+    cursor = conn.cursor()
+    cursor.executemany('EXEC dbo.usp_UpdateActive ?, ?', pairs)
+    conn.commit()
+    conn.close()
+
+
+def pause(interactive):
+    """
+    Wait for the user to acknowledge a message. Worker processes have
+    no console to read from, so they just carry on.
+    """
+    if interactive:
+        raw_input('Press Enter to continue...')
+
+
+# Each process opens the manifest the first time it moves a file, the
+# amendments database the first time it parses a header and the delta
+# index the first time it writes rows in delta mode
+manifest = None
+resolver = None
+deltaindex = None
+
+# Filing IDs of the files a resumed batch run was parsing when it
+# stopped, whose headers may already be in the database
+resumedheaders = set()
+
+
+def file_away(datafile, destination, state):
+    """
+    Move a data file to the processed or review directory and record
+    its new state and location in the manifest. A member of an archive
+    stays in the archive, unless it belongs in review, in which case it
+    is copied out to the review directory.
+    """
+    global manifest
+    if not is_member(datafile):
+        shutil.move(datafile, destination)
+    elif state == REVIEW:
+        extract_member(datafile, destination)
     else:
-        formf3headerfile = outputdir + 'FormF3Headers_' + timestamp + '.txt'
-        formf3pheaderfile = outputdir + 'FormF3PHeaders_' + timestamp + '.txt'
-        formf3xheaderfile = outputdir + 'FormF3XHeaders_' + timestamp + '.txt'
-
-        form_f3_file = open(formf3headerfile, 'w')
-        form_f3p_file = open(formf3pheaderfile, 'w')
-        form_f3x_file = open(formf3xheaderfile, 'w')
-
-        formf3headerstring = 'ImageID\tFormType\tCommID\tCommName\t' \
-            'AddressChange\tCommAddress1\tCommAddress2\tCommCity\tCommState\t' \
-            'CommZip\tElecState\tElecDist\tReptCode\tElecCode\tstrElecDate\t' \
-            'StateOfElec\tstrCovgFromDate\tstrCovgToDate\tTreasLastName\t' \
-            'TreasFirstName\tTreasMidName\tTreasPrefix\tTreasSuffix\tstrDateSigned\t' \
-            'Line6a_TotalContribs_Prd\tLine6b_TotalContribRefunds_Prd\t' \
-            'Line6c_NetContribs_Prd\tLine7a_TotOpExps_Prd\tLine7b_TotOffsetToOpExps_Prd\t' \
-            'Line7c_NetOpExps_Prd\tLine8_CashOnHandAtClose_Prd\tLine9_DebtsTo_Prd\t' \
-            'Line10_DebtsBy_Prd\tLine11a1_IndivsItemized_Prd\tLine11a2_IndivsUnitemized_Prd\t' \
-            'Line11a3_IndivsContribTotal_Prd\tLine11b_PolPtyComms_Prd\tLine11c_OtherPACs_Prd\t' \
-            'Line11d_Candidate_Prd\tLine11e_TotalContribs_Prd\tLine12_TransfersFrom_Prd\t' \
-            'Line13a_LoansByCand_Prd\tLine13b_OtherLoans_Prd\tLine13c_TotLoans_Prd\t' \
-            'Line14_OffsetsToOpExps_Prd\tLine15_OtherReceipts_Prd\tLine16_TotReceipts_Prd\t' \
-            'Line17_OpExps_Prd\tLine18_TransToOtherComms_Prd\tLine19a_LoanRepaymts_Cand_Prd\t' \
-            'Line19b_LoanRepaymts_Other_Prd\tLine19c_TotLoanRepaymts_Prd\t' \
-            'Loan20a_IndivRefunds_Prd\tLine20b_PolPartyCommRefunds_Prd\t' \
-            'Line20c_OtherPolCommRefunds_Prd\tLine20d_TotContRefunds_Prd\t' \
-            'Line21_OtherDisb_Prd\tLine22_TotDisb_Prd\tLine23_CashBegin_Prd\t' \
-            'Line24_TotReceipts_Prd\tLine25_Subtotal\tLine26_TotDisbThisPrd_Prd\t' \
-            'Line27_CashAtClose_Prd\tLine6a_TotalContribs_Tot\t' \
-            'Line6b_TotalContribRefunds_Tot\tLine6c_NetContribs_Tot\tLine7a_TotOpExps_Tot\t' \
-            'Line7b_TotOffsetToOpExps_Tot\tLine7c_NetOpExps_Tot\t' \
-            'Line11a1_IndivsItemized_Tot\tLine11a2_IndivsUnitemized_Tot\t' \
-            'Line11a3_IndivsContribTotal_Tot\tLine11b_PolPtyComms_Tot\t' \
-            'Line11c_OtherPACs_Tot\tLine11d_Candidate_Tot\tLine11e_TotalContribs_Tot\t' \
-            'Line12_TransfersFrom_Tot\tLine13a_LoansByCand_Tot\tLine13b_OtherLoans_Tot\t' \
-            'Line13c_TotLoans_Tot\tLine14_OffsetsToOpExps_Tot\tLine15_OtherReceipts_Tot\t' \
-            'Line16_TotReceipts_Tot\tLine17_OpExps_Tot\tLine18_TransToOtherComms_Tot\t' \
-            'Line19a_LoanRepaymts_Cand_Tot\tLine19b_LoanRepaymts_Other_Tot\t' \
-            'Line19c_TotLoanRepaymts_Tot\tLoan20a_IndivRefunds_Tot\t' \
-            'Line20b_PolPartyCommRefunds_Tot\tLine20c_OtherPolCommRefunds_Tot\t' \
-            'Line20d_TotContRefunds_Tot\tLine21_OtherDisb_Tot\tLine22_TotDisb_Tot\n'
-        formf3pheaderstring = 'ImageID\tFormType\tCommID\tCommName\t' \
-            'AddressChange\tCommAddress1\tCommAddress2\tCommCity\tCommState\t' \
-            'CommZip\tActivityPrim\tActivityGen\tReptCode\tElecCode\t' \
-            'strElecDate\tElecState\tstrFromDate\tstrToDate\tTreasLastName\t' \
-            'TreasFirstName\tTreasMidName\tTreasPrefix\tTreasSuffix\t' \
-            'strDateSigned\tLine6_CashBegin\tLine7_TotReceipts\t' \
-            'Line8_Subtotal\tLine9_TotalDisb\tLine10_CashClose\t' \
-            'Line11_DebtsTo\tLine12_DebtsBy\tLine13_ExpendsSubToLimits\t' \
-            'Line14_NetContribs\tLine15_NetOpExps\tLine16_FedFunds_Prd\t' \
-            'Line17a1_IndivsItemzd_Prd\tLine17a2_IndivsUnItemzd_Prd\t' \
-            'Line17a3_IndContTot_Prd\tLine17b_PolPartyComms_Prd\t' \
-            'Line17c_OtherPACs_Prd\tLine17d_Candidate_Prd\t' \
-            'Line17e_TotContribs_Prd\tLine18_TransfersFrom_Prd\t' \
-            'Line19a_CandLoans_Prd\tLine19b_OtherLoans_Prd\t' \
-            'Line19c_TotLoans_Prd\tLine20a_Operating_Prd\t' \
-            'Line20b_Fundraising_Prd\tLine20c_LegalAcctg_Prd\t' \
-            'Line20d_TotExpOffsets_Prd\tLine21_OtherReceipts_Prd\t' \
-            'Line22_TotReceipts_Prd\tLine23_OpExpends_Prd\t' \
-            'Line24_TransToOtherComms_Prd\tLine25_FundraisingDisbursed_Prd\t' \
-            'Line26_ExemptLegalAcctgDisb_Prd\tLine27a_CandRepymts_Prd\t' \
-            'Line27b_OtherRepymts_Prd\tLine27c_TotLoanRepymts_Prd\t' \
-            'Line28a_IndivRefunds_Prd\tLine28b_PolPartyCommRefunds_Prd\t' \
-            'Line28c_OtherPolCommRefunds_Prd\tLine28d_TotalContRefunds_Prd\t' \
-            'Line29_OtherDisb_Prd\tLine30_TotDisb_Prd\t' \
-            'Line31_ItemsToLiq_Prd\tAllocAlabama_Prd\tAllocAlaska_Prd\t' \
-            'AllocArizona_Prd\tAllocArkansas_Prd\tAllocCalifornia_Prd\t' \
-            'AllocColorado_Prd\tAllocConnecticut_Prd\tAllocDelaware_Prd\t' \
-            'AllocDistCol_Prd\tAllocFlorida_Prd\tAllocGeorgia_Prd\t' \
-            'AllocHawaii_Prd\tAllocIdaho_Prd\tAllocIllinois_Prd\t' \
-            'AllocIndiana_Prd\tAllocIowa_Prd\tAllocKansas_Prd\t' \
-            'AllocKentucky_Prd\tAllocLouisiana_Prd\tAllocMaine_Prd\t' \
-            'AllocMaryland_Prd\tAllocMassachusetts_Prd\tAllocMichigan_Prd\t' \
-            'AllocMinnesota_Prd\tAllocMississippi_Prd\tAllocMissouri_Prd\t' \
-            'AllocMontana_Prd\tAllocNebraska_Prd\tAllocNevada_Prd\t' \
-            'AllocNewHampshire_Prd\tAllocNewJersey_Prd\tAllocNewMexico_Prd\t' \
-            'AllocNewYork_Prd\tAllocNorthCarolina_Prd\t' \
-            'AllocNorthDakota_Prd\tAllocOhio_Prd\tAllocOklahoma_Prd\t' \
-            'AllocOregon_Prd\tAllocPennsylvania_Prd\tAllocRhodeIsland_Prd\t' \
-            'AllocSouthCarolina_Prd\tAllocSouthDakota_Prd\t' \
-            'AllocTennessee_Prd\tAllocTexas_Prd\tAllocUtah_Prd\t' \
-            'AllocVermont_Prd\tAllocVirginia_Prd\tAllocWashington_Prd\t' \
-            'AllocWestVirginia_Prd\tAllocWisconsin_Prd\tAllocWyoming_Prd\t' \
-            'AllocPuertoRico_Prd\tAllocGuam_Prd\tAllocVirginIslands_Prd\t' \
-            'AllocStatesTotal_Prd\tLine16_FedFunds_Tot\t' \
-            'Line17a1_IndivsItemzd_Tot\tLine17a2_IndivsUnItemzd_Tot\t' \
-            'Line17a3_IndContTot_Tot\tLine17b_PolPartyComms_Tot\t' \
-            'Line17c_OtherPACs_Tot\tLine17d_Candidate_Tot\t' \
-            'Line17e_TotContribs_Tot\tLine18_TransfersFrom_Tot\t' \
-            'Line19a_CandLoans_Tot\tLine19b_OtherLoans_Tot\t' \
-            'Line19c_TotLoans_Tot\tLine20a_Operating_Tot\t' \
-            'Line20b_Fundraising_Tot\tLine20c_LegalAcctg_Tot\t' \
-            'Line20d_TotExpOffsets_Tot\tLine21_OtherReceipts_Tot\t' \
-            'Line22_TotReceipts_Tot\tLine23_OpExpends_Tot\t' \
-            'Line24_TransToOtherComms_Tot\tLine25_FundraisingDisbursed_Tot\t' \
-            'Line26_ExemptLegalAcctgDisb_Tot\tLine27a_CandRepymts_Tot\t' \
-            'Line27b_OtherRepymts_Tot\tLine27c_TotLoanRepymts_Tot\t' \
-            'Line28a_IndivRefunds_Tot\tLine28b_PolPartyCommRefunds_Tot\t' \
-            'Line28c_OtherPolCommRefunds_Tot\t' \
-            'Line28d_TotalContRefunds_Tot\tLine29_OtherDisb_Tot\t' \
-            'Line30_TotDisb_Tot\tAllocAlabama_Tot\tAllocAlaska_Tot\t' \
-            'AllocArizona_Tot\tAllocArkansas_Tot\tAllocCalifornia_Tot\t' \
-            'AllocColorado_Tot\tAllocConnecticut_Tot\tAllocDelaware_Tot\t' \
-            'AllocDistCol_Tot\tAllocFlorida_Tot\tAllocGeorgia_Tot\t' \
-            'AllocHawaii_Tot\tAllocIdaho_Tot\tAllocIllinois_Tot\t' \
-            'AllocIndiana_Tot\tAllocIowa_Tot\tAllocKansas_Tot\t' \
-            'AllocKentucky_Tot\tAllocLouisiana_Tot\tAllocMaine_Tot\t' \
-            'AllocMaryland_Tot\tAllocMassachusetts_Tot\t' \
-            'AllocMichigan_Tot\tAllocMinnesota_Tot\tAllocMississippi_Tot\t' \
-            'AllocMissouri_Tot\tAllocMontana_Tot\tAllocNebraska_Tot\t' \
-            'AllocNevada_Tot\tAllocNewHampshire_Tot\tAllocNewJersey_Tot\t' \
-            'AllocNewMexico_Tot\tAllocNewYork_Tot\tAllocNorthCarolina_Tot\t' \
-            'AllocNorthDakota_Tot\tAllocOhio_Tot\tAllocOklahoma_Tot\t' \
-            'AllocOregon_Tot\tAllocPennsylvania_Tot\tAllocRhodeIsland_Tot\t' \
-            'AllocSouthCarolina_Tot\tAllocSouthDakota_Tot\t' \
-            'AllocTennessee_Tot\tAllocTexas_Tot\tAllocUtah_Tot\t' \
-            'AllocVermont_Tot\tAllocVirginia_Tot\tAllocWashington_Tot\t' \
-            'AllocWestVirginia_Tot\tAllocWisconsin_Tot\tAllocWyoming_Tot\t' \
-            'AllocPuertoRico_Tot\tAllocGuam_Tot\tAllocVirginIslands_Tot\t' \
-            'AllocStatesTotal_Tot\n'
-        formf3xheaderstring = 'ImageID\tFormType\tCommID\t' \
-            'CommName\tAddressChange\tCommAddress1\tCommAddress2\t' \
-            'CommCity\tCommState\tCommZip\tReptCode\tElecCode\t' \
-            'strElecDate\tElecState\tstrFromDate\tstrToDate\t' \
-            'flgQualifiedComm\tTreasLastName\tTreasFirstName\t' \
-            'TreasMidName\tTreasPrefix\tTreasSuffix\tstrDateSigned\t' \
-            'Line6b_CashBegin_Prd\tLine6c_TotalRects_Prd\t' \
-            'Line6d_CashBeginSubtotal_Prd\tLine7_TotDisbmts_Prd\t' \
-            'Line8_CashOnHandAtClose_Prd\tLine9_DebtsTo_Prd\t' \
-            'Line10_DebtsBy_Prd\tLine11a1_Itemized_Prd\t' \
-            'Line11a2_Unitemized_Prd\tLine11a3_Total_Prd\t' \
-            'Line11b_PolPtyComms_Prd\tLine11c_OtherPACs_Prd\t' \
-            'Line11d_TotalContribs_Prd\tLine12_TransfersFrom_Prd\t' \
-            'Line13_AllLoansRcvd_Prd\tLine14_LoanRepymtsRecv_Prd\t' \
-            'Line15_OffsetsToOpExps_Refunds_Prd\t' \
-            'Line16_RefundsOfFedContribs_Prd\t' \
-            'Line17_OtherFedRects_Divds_Prd\t' \
-            'Line18a_TransfersFromNonFedAcct_H3_Prd\t' \
-            'Line18b_TransfersFromNonFed_LevinH5_Prd\t' \
-            'Line18c_TotalNonFedTransfers_Prd\t' \
-            'Line19_TotalReceipts_Prd\tLine20_TotalFedReceipts_Prd\t' \
-            'Line21a1_FedShare_Prd\tLine21a2_NonFedShare_Prd\t' \
-            'Line21b_OtherFedOpExps_Prd\tLine21c_TotOpExps_Prd\t' \
-            'Line22_TransToOtherComms_Prd\t' \
-            'Line23_ContribsToFedCandsOrComms_Prd\t' \
-            'Line24_IndptExps_Prd\tLine25_CoordtdExpByPrtyComms_Prd\t' \
-            'Line26_LoanRepayments_Prd\tLine27_LoansMade_Prd\t' \
-            'Line28a_IndivRefunds_Prd\t' \
-            'Line28b_PolPartyCommRefunds_Prd\t' \
-            'Line28c_OtherPolCommRefunds_Prd\t' \
-            'Line28d_TotalContRefunds_Prd\tLine29_OtherDisb_Prd\t' \
-            'Line30a1_SharedFedActH6FedShare_Prd\t' \
-            'Line30a2_SharedFedActH6NonFed_Prd\t' \
-            'Line30b_NonAlloc100PctFedElecActivity_Prd\t' \
-            'Line30c_TotFedElecActivity_Prd\tLine31_TotDisbmts_Prd\t' \
-            'Line32_TotFedDisbmts_Prd\tLine33_TotContribs_Prd\t' \
-            'Line34_TotContribRefunds_Prd\tLine35_NetContribs_Prd\t' \
-            'Line36_TotFedOpExps_Prd\tLine37_OffsetsToOpExps_Prd\t' \
-            'Line38_NetOpExps_Prd\tLine6b_CashBegin_Tot\tLine6b_Year\t' \
-            'Line6c_TotalRects_Tot\tLine6d_CashBeginSubtotal_Tot\t' \
-            'Line7_TotDisbmts_Tot\tLine8_CashOnHandAtClose_Tot\t' \
-            'Line11a1_Itemized_Tot\tLine11a2_Unitemized_Tot\t' \
-            'Line11a3_Total_Tot\tLine11b_PolPtyComms_Tot\t' \
-            'Line11c_OtherPACs_Tot\tLine11d_TotalContribs_Tot\t' \
-            'Line12_TransfersFrom_Tot\tLine13_AllLoansRcvd_Tot\t' \
-            'Line14_LoanRepymtsRecv_Tot\t' \
-            'Line15_OffsetsToOpExps_Refunds_Tot\t' \
-            'Line16_RefundsOfFedContribs_Tot\t' \
-            'Line17_OtherFedRects_Divds_Tot\t' \
-            'Line18a_TransfersFromNonFedAcct_H3_Tot\t' \
-            'Line18b_TransfersFromNonFed_LevinH5_Tot\t' \
-            'Line18c_TotalNonFedTransfers_Tot\t' \
-            'Line19_TotalReceipts_Tot\tLine20_TotalFedReceipts_Tot\t' \
-            'Line21a1_FedShare_Tot\tLine21a2_NonFedShare_Tot\t' \
-            'Line21b_OtherFedOpExps_Tot\tLine21c_TotOpExps_Tot\t' \
-            'Line22_TransToOtherComms_Tot\t' \
-            'Line23_ContribsToFedCandsOrComms_Tot\t' \
-            'Line24_IndptExps_Tot\tLine25_CoordtdExpByPrtyComms_Tot\t' \
-            'Line26_LoanRepayments_Tot\tLine27_LoansMade_Tot\t' \
-            'Line28a_IndivRefunds_Tot\t' \
-            'Line28b_PolPartyCommRefunds_Tot\t' \
-            'Line28c_OtherPolCommRefunds_Tot\t' \
-            'Line28d_TotalContRefunds_Tot\tLine29_OtherDisb_Tot\t' \
-            'Line30a1_SharedFedActH6FedShare_Tot\t' \
-            'Line30a2_SharedFedActH6NonFed_Tot\t' \
-            'Line30b_NonAlloc100PctFedElecActivity_Tot\t' \
-            'Line30c_TotFedElecActivity_Tot\tLine31_TotDisbmts_Tot\t' \
-            'Line32_TotFedDisbmts_Tot\tLine33_TotContribs_Tot\t' \
-            'Line34_TotContribRefunds_Tot\tLine35_NetContribs_Tot\t' \
-            'Line36_TotFedOpExps_Tot\tLine37_OffsetsToOpExps_Tot\t' \
-            'Line38_NetOpExps_Tot\n'
-
-        form_f3_file.write(formf3headerstring)
-        form_f3p_file.write(formf3pheaderstring)
-        form_f3x_file.write(formf3xheaderstring)
+        destination = datafile
+    if manifest is None:
+        manifest = Manifest(manifestfile)
+    manifest.update(fileid_from_name(source_name(datafile)), state, destination)
 
-    # Iterate through all files in the source directory
-    # and process those with .fec extension
+
+def header_added(filename):
+    """
+    Return True if a data file's header is in the database because an
+    earlier attempt to parse it didn't finish: either the batch run
+    being resumed was parsing it (see FECJournal.py) or the download it
+    was being parsed from failed (see StreamParser).
+    """
+    global manifest
+    fileid = fileid_from_name(filename)
+    if fileid in resumedheaders:
+        return True
+    if manifest is None:
+        manifest = Manifest(manifestfile)
+    return manifest.has_header(fileid)
+
+
+def parse_header(lines, filename, outputs, interactive=True, stats=None):
+    """
+    Read and check the header rows of a single data file and either send
+    the header to the database or write it to outputs. Returns the
+    FECRecords.Filing and None if the file's child rows can be parsed,
+    otherwise None and the name the file should be given in the review
+    directory.
+    """
+    global resolver
     try:
-        for datafile in glob.glob(os.path.join(sourcedir, '*.fec')):
-            filename = datafile.replace(sourcedir, '')
-            print 'Processing: ' + filename
-
-            # Store file ID in variable
-            imageid = filename.replace('.fec','')
-
-            # Grab first two lines
-            hdr1 = linecache.getline(datafile, 1)
-            hdr1list = hdr1.split(delimiter)
-            hdr2 = linecache.getline(datafile, 2)
-            hdr2list = hdr2.split(delimiter)
-            
-            # Check header version
-            # Presently, only 6.4, 7.0 and 8.0 are supported
-            if hdr1list[0].strip('"') == 'HDR':
-                headerversion = hdr1list[2].strip('"').strip()
-            else:
-                shutil.move(datafile, reviewdir + filename.replace('.fec','_INV_HDR.fec'))
-                continue
+        # Read and check the header rows (see FECRecords.py)
+        filing = Filing(lines, filename)
+
+        # If database integration has been enabled, send header info
+        # to the database manager. Note that you will need to modify
+        # this code if you are not using SQL Server, which processes
+        # this data with stored procedure calls.
+
+        # When the script is NOT integrated with a database, the file ID
+        # (imageid) is prefixed to each child row.
+        if usedatabaseflag == 1:
+
+            # Create stored procedure call
+            sql = filing.header_sql()
+            if stats is not None:
+                stats.lap('header')
 
-            if headerversion != '6.4' and headerversion !='7.0' and headerversion !='8.0':
-                shutil.move(datafile, reviewdir + filename.replace('.fec','_HDR_' + headerversion + '.fec'))
+            # Create SQL Server connection. pyodbc is imported here rather
+            # than at the top so FEC Parser's functions can be imported
+            # (by FEC Scraper or FECBenchmark.py, for example) on machines
+            # without it.
+            import pyodbc
+            conn = pyodbc.connect(connstr)
+            cursor = conn.cursor()
+
+            # Excecute stored procedure
+            cursor.execute(sql)
+            sqlresult = cursor.fetchone()
+            fileid = sqlresult[0]
+            conn.commit()
+            conn.close()
+            if stats is not None:
+                stats.lap('database')
+
+            # Alert user if file may have been previously imported
+            # and move to review directory, unless the header was added
+            # by a run that didn't finish parsing the file
+            if fileid == -1 and not header_added(filename):
+                print 'This file may already be in the FEC database, so the ' \
+                      'header was not imported. See the Review directory.\n'
+                pause(interactive)
+                print '\n'
+                return None, filename
+
+        # Otherwise, database integration disabled;
+        # Store ImageID as FileID
+        # and copy second header line to header text file.
+        else:
+            header = filing.header_record()
+            outputs[header.kind].write(header.line())
+
+        # Add the filings this one supersedes, or the filing that
+        # supersedes it, to the supersede map (see FECAmendments.py)
+        fileid = fileid_from_name(filename)
+        if amendmentsflag == 1 and fileid is not None:
+            if resolver is None:
+                resolver = Resolver(amendmentsfile)
+            key = filing.report_key()
+            pairs = resolver.resolve(filing.form['key'], fileid, key)
+            for imageid, supersededby in pairs:
+                outputs['supersedes'].write(filing.form['key'] + '\t' + str(imageid) + '\t' +
+                                            str(supersededby) + '\n')
+
+            # In delta mode, work out which filing this one amends
+            # (see FECDelta.py)
+            if deltaflag == 1 and key is not None:
+                filing.delta = delta_plan(fileid, pairs)
+
+    except FilingError, e:
+        if e.notice:
+            print e.notice
+            pause(interactive)
+            print '\n'
+        return None, e.reviewname
+
+    return filing, None
+
+
+def write_rows(filing, outputs, stats=None):
+    """
+    Write each child row of a filing to the appropriate output.
+    """
+    # Count the rows written to each output and, if statistics are
+    # being kept, time each stage of the row loop (see FECStats.py)
+    rowcounts = dict.fromkeys(outputs, 0)
+    writers = {}
+    for key in outputs:
+        writers[key] = outputs[key].write
+    if stats is not None:
+        stats.rows = rowcounts
+        for key in writers:
+            writers[key] = stats.timed('write', writers[key])
+        stats.start_rows()
+
+    # In delta mode, rows that haven't changed since the filing this
+    # one amends are left out
+    if filing.delta is not None:
+        write_delta_rows(filing, writers, rowcounts, stats)
+        return
+
+    # At this point, we have a valid header for a new file
+    # Copy each child row to the appropriate output file.
+    for key, fields in filing.rows(stats):
+        writers[key]('\t'.join(fields) + '\n')
+        rowcounts[key] += 1
+
+
+def write_delta_rows(filing, writers, rowcounts, stats=None):
+    """
+    Write the child rows of a filing that have been added or changed
+    since the filing it amends, list the changes in the delta list and
+    add the filing's rows to the delta index (see FECDelta.py). If the
+    filing it amends isn't in the index, every row is written and
+    nothing is listed.
+    """
+    global deltaindex
+    if deltaindex is None:
+        deltaindex = DeltaIndex(deltafile)
+    imageid, amends, replaces = filing.delta
+    previous = None
+    if amends is not None:
+        previous = deltaindex.load(amends)
+    differ = Differ(previous)
+    lineprefix = str(imageid) + '\t' + str(amends) + '\t'
+    if previous is not None:
+        writers['deltas'](lineprefix + '\t\t' + FILING + '\n')
+
+    for key, fields in filing.rows(stats):
+        if key != 'review':
+            change = differ.check(key, fields)
+            if change is None:
                 continue
+            if previous is not None:
+                writers['deltas'](lineprefix + schedules[key]['table'] + '\t' + fields[transidcolumns[key]] +
+                                  '\t' + change + '\n')
+        writers[key]('\t'.join(fields) + '\n')
+        rowcounts[key] += 1
 
-            # Header 1 is valid, so now let's parse line 2.
-            # First, retrieve form type
-            formtype = hdr2list[0].strip('"')
-            
-            # Make sure form type is valid
-            # Supported:
-            #   F3: F3A, F3N
-            #   F3P: F3PA, F3PN
-            #   F3X: F3XA, F3XN
-            if formtype != 'F3A' and formtype != 'F3N' \
-               and formtype != 'F3PA' and formtype != 'F3PN'\
-               and formtype != 'F3XA' and formtype != 'F3XN':
-                    shutil.move(datafile, reviewdir + filename.replace('.fec','_INV_FORMTYPE_' + formtype + '.fec'))
-                    continue
-
-            # At this point, the header is valid.
-            # Run custom code to ensure various header types conform.
-            
-            # Header 6.4, Forms F3PA and F3PN
-            if headerversion == '6.4' and formtype.startswith('F3P'):
-
-                # 6.4 does not have separate values for line 17a, so we
-                # need to insert blank values for 17a1 and 17a2 and leave
-                # the reported values (period and total) for 17a3.
-                cols = hdr2.split(delimiter)
-                cols.insert(34, '')
-                cols.insert(34, '')
-                cols.insert(121, '')
-                cols.insert(121, '')
-
-                # Convert list back to string
-                hdr2 = delimiter.join(map(str, cols))
-
-            # Generic cleanup of header lines
-            
-            # Change all tabs and newlines to spaces
-            lineclean = hdr2.expandtabs(1).replace('\r',' ').replace('\n',' ')
-            # Remove leading and trailing whitespace
-            lineclean = lineclean.strip()
-            # Remove all instances of two spaces
-            while '  ' in lineclean:
-                lineclean = lineclean.replace('  ',' ')
-            # Remove spaces immediately before or after a delimiter
-            while ' ' + delimiter in lineclean:
-                lineclean = lineclean.replace(' ' + delimiter, delimiter)
-            while delimiter + ' ' in lineclean:
-                lineclean = lineclean.replace(delimiter + ' ', delimiter)
-            # Remove leading and trailing quotation marks
-            while lineclean.startswith('"') or lineclean.endswith('"') or lineclean.startswith("'") or lineclean.endswith("'"):
-                lineclean = lineclean.strip().strip('"').strip("'").strip()
-            # Remove double quotation marks when immediately before or after a delimiter.
-            while '"' + delimiter in lineclean:
-                lineclean = lineclean.replace('"' + delimiter, delimiter)
-            while delimiter + '"' in lineclean:
-                lineclean = lineclean.replace(delimiter + '"', delimiter)
-            # Remove single quotation marks when immediately before or after a delimiter.
-            while "'" + delimiter in lineclean:
-                lineclean = lineclean.replace("'" + delimiter, delimiter)
-            while delimiter + "'" in lineclean:
-                lineclean = lineclean.replace(delimiter + "'", delimiter)
-            # Replace '' between two delimiters with just two delimiters
-            lineclean = lineclean.replace(delimiter + "''" + delimiter, delimiter + delimiter)
-            # Replace all cases of '' with "
-            while "''" in lineclean:
-                lineclean = lineclean.replace("''", '"')
-            # Replace all cases of "" with "
-            while '""' in lineclean:
-                lineclean = lineclean.replace('""', '"')
-            # Change all instances of ' to ''
-            lineclean = lineclean.replace("'", "''")
-            # Insert NULL between delimiters
-            while delimiter + delimiter in lineclean:
-                lineclean = lineclean.replace(delimiter + delimiter, delimiter + 'NULL' + delimiter)
-            # Add image id
-            lineclean = "'" + imageid + delimiter + lineclean
-            # Replace delimiters with single quotations and commas
-            if usedatabaseflag == 1:
-                lineclean = lineclean.replace(delimiter, "','")
-                if lineclean.endswith(",'"):
-                    lineclean = lineclean[:-2]
-            else:
-                lineclean = lineclean.replace(delimiter, "'\t'")
-                if lineclean.endswith("\t'"):
-                    lineclean = lineclean[:-2]
-            # Remove ' from around NULL
-            lineclean = lineclean.replace(",'NULL'",',NULL').replace("\t'NULL'",'\tNULL')
-            # Make sure last field has closing '
-            if not lineclean.endswith("'") and not lineclean.endswith('NULL'):
-                lineclean += "'"
-            
-            # If database integration has been enabled, send header info
-            # to the database manager. Note that you will need to modify
-            # this code if you are not using SQL Server, which processes
-            # this data with stored procedure calls.
-
-            # When the script is NOT integrated with a database, the file ID
-            # (imageid) is prefixed to each child row.
-            if usedatabaseflag == 1:
+    for key, transid in differ.removed():
+        writers['deltas'](lineprefix + schedules[key]['table'] + '\t' + transid + '\t' + REMOVED + '\n')
+    deltaindex.store(imageid, differ.entries, replaces)
 
-                # Create stored procedure call
-                sql = 'EXEC '
-
-                # Add appropriate stored procedure
-                if formtype == 'F3A' or formtype == 'F3N':
-                    sql += "dbo.usp_AddF3Header"
-                elif formtype == 'F3PA' or formtype == 'F3PN':
-                    sql += "dbo.usp_AddF3PHeader"
-                elif formtype == 'F3XA' or formtype == 'F3XN':
-                    sql += "dbo.usp_AddF3XHeader"
-
-                # Build final sql string, with new line
-                sql += ' ' + lineclean + '\n'
-
-                # Create SQL Server connection
-                conn = pyodbc.connect(connstr)
-                cursor = conn.cursor()
-
-                # Excecute stored procedure
-                cursor.execute(sql)
-                sqlresult = cursor.fetchone()
-                fileid = sqlresult[0]
-                conn.commit()
-                conn.close()
-
-                # Alert user if file may have been previously imported
-                # and move to review directory
-                if fileid == -1:
-                    print 'This file may already be in the FEC database, so the ' \
-                          'header was not imported. See the Review directory.\n'
-                    raw_input('Press Enter to continue...')
-                    shutil.move(datafile, reviewdir + filename)
-                    print '\n'
-                    continue
-
-            # Otherwise, database integration disabled;
-            # Store ImageID as FileID
-            # and copy second header line to header text file.
-            else:
-
-                # Write header to appropriate file
-                if lineclean.startswith("'"):
-                    lineclean = lineclean[1:]
-                if lineclean.endswith("'"):
-                    lineclean = lineclean[:-1]
-                lineclean += '\n'
-                lineclean = lineclean.replace("'\t","\t").replace("\t'","\t")
-                colct = len(lineclean.split('\t'))
-                if formtype == 'F3A' or formtype == 'F3N':
-                    while colct < 94:
-                        lineclean = lineclean.replace('\n', '\t\n')
-                        colct = len(lineclean.split('\t'))
-                    while colct > 94 and lineclean.endswith('\t\n'):
-                        lineclean = lineclean[:-2] + '\n'
-                        colct = len(lineclean.split('\t'))
-                    if colct == 94:
-                        form_f3_file.write(lineclean)
-                    else:
-                        print 'The header row for ' + filename + ' does not have ' \
-                              'the correct number of columns. This file will be ' \
-                              'moved to the review directory and will not ' \
-                              'be imported.\n'
-                        raw_input('Press Enter to continue...')
-                        shutil.move(datafile, reviewdir + filename)
-                        print '\n'
-                        continue
-                elif formtype == 'F3PA' or formtype == 'F3PN':
-                    while colct < 207:
-                        lineclean = lineclean.replace('\n', '\t\n')
-                        colct = len(lineclean.split('\t'))
-                    while colct > 207 and lineclean.endswith('\t\n'):
-                        lineclean = lineclean[:-2] + '\n'
-                        colct = len(lineclean.split('\t'))
-                    if colct == 207:
-                        form_f3p_file.write(lineclean)
-                    else:
-                        print 'The header row for ' + filename + ' does not have ' \
-                              'the correct number of columns. This file will be ' \
-                              'moved to the review directory and will not ' \
-                              'be imported.\n'
-                        raw_input('Press Enter to continue...')
-                        shutil.move(datafile, reviewdir + filename)
-                        print '\n'
-                        continue
-                elif formtype == 'F3XA' or formtype == 'F3XN':
-                    while colct < 124:
-                        lineclean = lineclean.replace('\n', '\t\n')
-                        colct = len(lineclean.split('\t'))
-                    while colct > 124 and lineclean.endswith('\t\n'):
-                        lineclean = lineclean[:-2] + '\n'
-                        colct = len(lineclean.split('\t'))
-                    if colct == 124:
-                        form_f3x_file.write(lineclean)
-                    else:
-                        print 'The header row for ' + filename + ' does not have ' \
-                              'the correct number of columns. This file will be ' \
-                              'moved to the review directory and will not ' \
-                              'be imported.\n'
-                        raw_input('Press Enter to continue...')
-                        shutil.move(datafile, reviewdir + filename)
-                        print '\n'
-                        continue
-                else:
-                        print 'An unexpected error occurred while processing the ' \
-                              'header for ' + filename + '. This file has been ' \
-                              'moved to the review directory and will not ' \
-                              'be imported.\n'
-                        raw_input('Press Enter to continue...')
-                        shutil.move(datafile, reviewdir + filename)
-                        print '\n'
-                        continue
-
-            # At this point, we have a valid header for a new file
-            # Copy each subsequent line to the appropriate output file.
-            for line in open(datafile, 'rb'):
-
-                # If the row is just white space, skip it
-                if line.replace('/n','').expandtabs(1).replace(' ','').replace('"','').replace("'",'').replace(delimiter,'').strip() == '':
-                    continue
-
-                # Skip this row if it's a header line
-                linetest = line.replace(delimiter,'').replace('"','').replace("'",'').upper()
-                if linetest.startswith('HDR') or linetest.startswith('F3'):
-                    continue
-
-                # THIS SECTION INCLUDES CUSTOM CODE TO MAKE SURE DIFFERENT HEADER VERSIONS CONFORM
-
-                # Header 8.0:
-                # -----------
-                if headerversion == '8.0':
-                    # Schedule A:
-                    # -----------
-                    # Contribution Purpose Code (field 23) removed
-                    # Add placeholder
-                    if linetest.startswith('SA'):
-                        cols = line.split(delimiter)
-                        cols.insert(22, '')
-                        line = delimiter.join(map(str, cols))
-                    
-                    # Schedule B:
-                    # -----------
-                    # Expenditure Purpose Code (field 23) removed
-                    # Add placeholder
-                    elif linetest.startswith('SB'):
-                        cols = line.split(delimiter)
-                        cols.insert(22, '')
-                        line = delimiter.join(map(str, cols)) 
-                    
-                    # Schedule E:
-                    # -----------
-                    # Expenditure Purpose Code (field 23) removed
-                    # Add placeholder
-                    elif linetest.startswith('SE'):
-                        cols = line.split(delimiter)
-                        cols.insert(22, '')
-                        line = delimiter.join(map(str, cols)) 
-
-                # Parse the line on the delimiter and put in a list
-                cols = line.split(delimiter)
-
-                # Add header type and ID
-                # Old code: datarow = formtype + delimiter + str(fileid) + delimiter + line
-                datarow = formtype + delimiter + str(imageid) + delimiter + line
-
-                # Clean up the line
-                # Change all tabs and newlines to spaces,
-                # and strip leading/trailing whitespace
-                datarow = datarow.replace('\t',' ').replace('\r',' ').replace('\n',' ').strip()
-
-                # Remove leading and trailing whitespace
-                # datarow = datarow.strip()
-                # Remove all instances of two spaces
-                while '  ' in datarow:
-                    datarow = datarow.replace('  ',' ')
-                # Remove spaces immediately before or after a delimiter
-                while ' ' + delimiter in datarow:
-                    datarow = datarow.replace(' ' + delimiter, delimiter)
-                while delimiter + ' ' in datarow:
-                    datarow = datarow.replace(delimiter + ' ', delimiter)
-                # Remove leading and trailing quotation marks
-                while datarow.startswith('"') or datarow.endswith('"') or datarow.startswith("'") or datarow.endswith("'"):
-                    datarow = datarow.strip().strip('"').strip("'").strip()
-                # Remove double quotation marks when immediately before or after a delimiter.
-                while '"' + delimiter in datarow:
-                    datarow = datarow.replace('"' + delimiter, delimiter)
-                while delimiter + '"' in datarow:
-                    datarow = datarow.replace(delimiter + '"', delimiter)
-                # Remove single quotation marks when immediately before or after a delimiter.
-                while "'" + delimiter in datarow:
-                    datarow = datarow.replace("'" + delimiter, delimiter)
-                while delimiter + "'" in datarow:
-                    datarow = datarow.replace(delimiter + "'", delimiter)
-                # Replace '' between two delimiters with just two delimiters
-                datarow = datarow.replace(delimiter + "''" + delimiter, delimiter + delimiter)
-		# Replace all cases of '' with "
-                while "''" in datarow:
-                    datarow = datarow.replace("''", '"')
-                # Replace all cases of "" with "
-                while '""' in datarow:
-                    datarow = datarow.replace('""', '"')
-                # Replace all delimiters with tabs and add newline
-                datarow = datarow.replace(delimiter, '\t') + '\n'
- 
-                # Now write the data row to the appropriate file
-                rowtype = cols[0].strip('"')
-                colct = len(datarow.split('\t'))
-                
-                if rowtype.startswith('SA'):
-                    while colct < 47:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 47 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 47:
-                        sched_a_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                elif rowtype.startswith('SB'):
-                    while colct < 46:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 46 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 46:
-                        sched_b_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                elif rowtype.startswith('SC/'):
-                    while colct < 40:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 40 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 40:
-                        sched_c_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                elif rowtype.startswith('SC1/'):
-                    while colct < 50:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 50 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 50:
-                        sched_c1_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                elif rowtype.startswith('SC2/'):
-                    while colct < 19:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 19 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 19:
-                        sched_c2_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                elif rowtype.startswith('SD'):
-                    while colct < 22:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 22 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 22:
-                        sched_d_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                elif rowtype.startswith('SE'):
-                    while colct < 46:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 46 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 46:
-                        sched_e_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                elif rowtype.startswith('TEXT'):
-                    while colct < 8:
-                        datarow = datarow.replace('\n', '\t\n')
-                        colct = len(datarow.split('\t'))
-                    while colct > 8 and datarow.endswith('\t\n'):
-                        datarow = datarow[:-2] + '\n'
-                        colct = len(datarow.split('\t'))
-                    if colct == 8:
-                        text_file.write(datarow)
-                    else:
-                        review_file.write(datarow)
-                else:
-                    review_file.write(datarow)
 
-            # Move the file to the processed directory
-            shutil.move(datafile, destdir + filename)
+def parse_lines(lines, filename, outputs, interactive=True, stats=None):
+    """
+    Parse the lines of a single data file, writing its header and child
+    rows to outputs. lines can be any iterable of raw lines, such as an
+    open file or a download in progress. Returns None if the file was
+    parsed, otherwise the name it should be given in the review
+    directory. If stats is a FECStats.FilingStats, the time spent in each
+    stage and the rows written to each output are recorded in it.
+
+    The rows themselves are read and cleaned by FECRecords.Filing.
+    """
+    filing, reviewname = parse_header(lines, filename, outputs, interactive, stats)
+    if filing is not None:
+        write_rows(filing, outputs, stats)
+    return reviewname
+
+
+def source_name(datafile):
+    """
+    Return the name of a data file without the source directory, or of
+    a member of an archive without the archive (see FECArchive.py).
+    """
+    if is_member(datafile):
+        return member_filename(datafile)
+    return datafile.replace(sourcedir, '')
+
+
+def read_file(datafile, outputs, interactive=True, stats=None):
+    """
+    Parse a single data file, writing its header and child rows to
+    outputs, without moving it. Returns None if the file was parsed,
+    otherwise the name it should be given in the review directory.
+    """
+    filename = source_name(datafile)
+    print 'Processing: ' + filename
+
+    # Members of archives are decompressed as they are read
+    if is_member(datafile):
+        handle = open_member(datafile)
+        lines = read_lines(handle)
+        size = member_size(datafile)
+    else:
+        handle = lines = open(datafile, 'rb')
+        size = os.path.getsize(datafile)
+    try:
+        if stats is not None:
+            stats.bytes = size
+        return parse_lines(lines, filename, outputs, interactive, stats)
+    finally:
+        handle.close()
+
+
+def file_destination(filename, reviewname):
+    """
+    Return where a data file goes once it has been parsed and its state
+    in the manifest.
+    """
+    if reviewname is None:
+        return destdir + filename, PARSED
+    return reviewdir + reviewname, REVIEW
+
+
+def parse_file(datafile, outputs, interactive=True, stats=None, journal=None, loader=None):
+    """
+    Parse a single data file, writing its header and child rows to
+    outputs, and move it to the processed or review directory. Returns
+    True if the file was parsed and False if it was moved to review. If
+    journal is a FECJournal.Journal, the file is recorded in it before
+    it is moved. If loader is given, the file is finished in it (see
+    FECLoader.py) before it is recorded, so a file the journal counts as
+    done has always been loaded.
+    """
+    filename = source_name(datafile)
+    if journal is not None and usedatabaseflag == 1:
+        journal.begin(datafile.replace(sourcedir, ''))
+    reviewname = read_file(datafile, outputs, interactive, stats)
+    if loader is not None:
+        loader.finish(filename)
+
+    # Move the file to the processed or review directory
+    destination, state = file_destination(filename, reviewname)
+    if journal is not None:
+        journal.commit(datafile.replace(sourcedir, ''), state, destination, outputs)
+    file_away(datafile, destination, state)
+    if stats is not None:
+        stats.finish(reviewname is None and 'parsed' or 'review', reviewname)
+    return reviewname is None
+
+
+def review_failed(datafile, outputs, journal=None):
+    """
+    Move a data file that caused an unexpected error to the review
+    directory. In a batch run, its rows are first dropped from outputs
+    and the file is recorded in the journal.
+    """
+    filename = source_name(datafile)
+    print 'An unexpected error has occurred regarding file ' + filename.replace('.fec','') + '.'
+    if journal is not None:
+        journal.rollback(outputs)
+        journal.commit(datafile.replace(sourcedir, ''), REVIEW, reviewdir + filename, outputs)
+    if is_member(datafile) or os.path.exists(datafile):
+        file_away(datafile, reviewdir + filename, REVIEW)
+
+
+def output_marks(outputs):
+    """
+    Return the current end of each output that is a plain file, so the
+    rows written after it can be dropped again with stop_file().
+    Compressed, rotated and columnar outputs can't be cut back.
+    """
+    marks = {}
+    for key in outputs:
+        if isinstance(outputs[key], file):
+            marks[key] = outputs[key].tell()
+    return marks
+
 
+def stop_file(datafile, outputs, marks, loader=None):
+    """
+    Drop the rows written to outputs since output_marks() for a data
+    file whose parsing was stopped with Ctrl+C, leaving the file in the
+    import directory to be parsed next time. Nothing is dropped if the
+    file had already been moved.
+    """
+    if not is_member(datafile) and not os.path.exists(datafile):
+        return
+    for key in marks:
+        outputs[key].seek(marks[key])
+        outputs[key].truncate()
+    if loader is not None:
+        loader.rollback()
+
+
+def parse_serial(files, timestamp, stats=None, journal=None):
+    """
+    Parse files one at a time into a single set of output files. If
+    stats is a FECStats.Stats, each file's statistics are added to it.
+    If journal is a FECJournal.Journal, the run is a batch run: each
+    file is recorded in the journal as it is finished, and a file that
+    causes an error is sent to review without stopping the run.
+    files can also be a FECWatch.Watcher, which yields None while it
+    waits for the next file. Ctrl+C stops the run, dropping the rows of
+    the file being parsed and leaving it in the import directory.
+    """
+    outputs = open_outputs(timestamp, journal is not None and journal.timestamp is not None)
+    if journal is not None and journal.timestamp is None:
+        journal.start(timestamp, outputs)
+
+    # Schedule rows are also handed to the loader as they are written.
+    # Split files are merged into the plain outputs, which hand the rows
+    # to the loader themselves.
+    loader = open_loader()
+    merged = dict(outputs)
+    if loader is not None:
+        for prefix in prefixes:
+            outputs[prefix] = LoadingOutput(outputs[prefix], loader, prefix)
+
+    # Large files are split among a pool of worker processes, started
+    # the first time one is needed
+    pool = None
+    readers = {}
+
+    current = None
+    try:
+        for datafile in files:
+            if datafile is None:
+                continue
+            current = datafile
+            marks = output_marks(merged)
+            filing = None
+            if stats is not None:
+                filing = stats.filing(source_name(datafile))
+            try:
+                if should_split(datafile):
+                    if pool is None:
+                        sharddir = os.path.join(outputdir, 'Shards_' + timestamp)
+                        os.mkdir(sharddir)
+                        pool = multiprocessing.Pool(split_processes(), init_worker,
+                                                    (sharddir, stats is not None, deltaflag, resumedheaders))
+                    parse_split(datafile, merged, pool, split_processes(), readers, loader, journal is None,
+                                filing, journal)
+                else:
+                    parse_file(datafile, outputs, journal is None, filing, journal, loader)
+            except Exception:
+                if journal is None:
+                    raise
+                if loader is not None:
+                    loader.rollback()
+                review_failed(datafile, outputs, journal)
+                if filing is not None and filing.result is None:
+                    filing.finish('error')
+            if filing is not None:
+                stats.add(filing)
+            current = None
+    except KeyboardInterrupt:
+        if current is not None:
+            stop_file(current, merged, marks, loader)
+        print '\nStopped. Any file not finished was left in the import directory.'
     except:
+        if journal is not None:
+            raise
+        filename = source_name(datafile)
+        imageid = filename.replace('.fec','')
+        if loader is not None:
+            loader.rollback()
+        if filing is not None and filing.result is None:
+            filing.finish('error')
+            stats.add(filing)
         raw_input('An unexpected error has occurred regarding file ' + imageid + '. Press Enter to continue.')
-        shutil.move(datafile, reviewdir + filename)
-        
-finally:
-    sched_a_file.close()
-    sched_b_file.close()
-    sched_c_file.close()
-    sched_c1_file.close()
-    sched_c2_file.close()
-    sched_d_file.close()
-    sched_e_file.close()
-    text_file.close()
-    review_file.close()
+        file_away(datafile, reviewdir + filename, REVIEW)
+    finally:
+        close_outputs(outputs)
+        close_loader(loader)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+            close_outputs(readers)
+            shutil.rmtree(sharddir)
 
-    if usedatabaseflag == 0:
-        form_f3_file.close()
-        form_f3p_file.close()
-        form_f3x_file.close()
+
+# Files parsed in parallel, whether by worker processes or by download
+# threads in FEC Scraper, are written to per-worker shard files in a
+# scratch directory under the output directory. After each file is
+# parsed, the worker notes where that file's rows start and end in each
+# shard so the rows can be copied into the final output files.
+
+def open_merged_outputs(timestamp, append=False):
+    """
+    Create the timestamped output files with column headers, then
+    reopen the text files in binary mode so shard bytes are copied
+    exactly. If append is True, the text files of a batch run being
+    resumed are opened to add to them instead.
+    """
+    outputs = open_outputs(timestamp, append)
+    for key in outputs:
+        if isinstance(outputs[key], file):
+            path = outputs[key].name
+            outputs[key].close()
+            outputs[key] = open(path, 'ab')
+    flag_malformed(outputs)
+    return outputs
+
+
+def open_shards(sharddir, worker):
+    """
+    Open a set of shard files, one per output, for a worker.
+    """
+    shards = {}
+    for key, name in output_names().items():
+        shards[key] = open(os.path.join(sharddir, name + worker + '.txt'), 'w')
+    return shards
+
+
+def shard_starts(shards):
+    """
+    Return the current end of each shard file.
+    """
+    starts = {}
+    for key in shards:
+        starts[key] = shards[key].tell()
+    return starts
+
+
+def shard_rollback(shards, starts):
+    """
+    Drop anything written to the shard files since shard_starts().
+    """
+    for key in shards:
+        shards[key].seek(starts[key])
+        shards[key].truncate()
+
+
+def shard_ranges(shards, starts):
+    """
+    Flush the shard files and return a dictionary mapping each output
+    to its shard file and the byte range written since shard_starts().
+    """
+    ranges = {}
+    for key in shards:
+        shards[key].flush()
+        ranges[key] = (shards[key].name, starts[key], shards[key].tell())
+    return ranges
+
+
+def merge_ranges(ranges, outputs, readers, loader=None):
+    """
+    Copy the byte ranges returned by shard_ranges() to the merged
+    output files, and feed schedule rows to loader if one is given.
+    readers caches open shard files between calls.
+    """
+    for key in ranges:
+        shardname, start, end = ranges[key]
+        if end <= start:
+            continue
+        if shardname not in readers:
+            readers[shardname] = open(shardname, 'rb')
+        shard = readers[shardname]
+        shard.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = shard.read(min(remaining, 1048576))
+            outputs[key].write(chunk)
+            if loader is not None and key in schedules:
+                loader.feed(key, chunk)
+            remaining -= len(chunk)
+
+
+# Shard files for this worker process, whether it keeps statistics and
+# whether it leaves moving files to the main process
+shard_outputs = {}
+shard_stats = False
+
+
+def init_worker(sharddir, keepstats=False, delta=0, resumed=()):
+    """
+    Open this worker's shard files. Ctrl+C is left to the main process,
+    which stops the pool. delta is the main process's deltaflag and
+    resumed its resumedheaders, which workers started by re-importing
+    this module (as on Windows) would otherwise not see.
+    """
+    global shard_stats, deltaflag
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    deltaflag = delta
+    resumedheaders.update(resumed)
+    shard_outputs.update(open_shards(sharddir, str(os.getpid())))
+    shard_stats = keepstats
+
+
+def parse_shard(datafile):
+    """
+    Parse a single data file in a worker process. Returns the data file,
+    its byte ranges in this worker's shards, if the worker keeps
+    statistics, the file's statistics (see FECStats.FilingStats.record)
+    and the (destination, state) the main process should move it to once
+    its rows are merged and, in a batch run, it is recorded in the
+    journal. The file is left where it is until then, so a run stopped
+    before its rows are merged doesn't count it as parsed.
+    """
+    filename = source_name(datafile)
+    filing = None
+    if shard_stats:
+        filing = FECStats.FilingStats(filename)
+    starts = shard_starts(shard_outputs)
+    try:
+        reviewname = read_file(datafile, shard_outputs, False, filing)
+        moveto = file_destination(filename, reviewname)
+        if filing is not None:
+            filing.finish(reviewname is None and 'parsed' or 'review', reviewname)
+    except:
+        # Drop any rows already written for this file and send it to
+        # the review directory, then carry on with the next file.
+        shard_rollback(shard_outputs, starts)
+        print 'An unexpected error has occurred regarding file ' + filename.replace('.fec','') + '.'
+        moveto = (reviewdir + filename, REVIEW)
+        if filing is not None:
+            filing.finish('error')
+    record = None
+    if filing is not None:
+        record = filing.record()
+    return datafile, shard_ranges(shard_outputs, starts), record, moveto
+
+
+# A data file of at least splitsize megabytes is split into byte ranges
+# instead. The header rows are read and checked first, then the child
+# rows are cut into ranges that end at the end of a row, and each range
+# is parsed by a worker process into its shard files. Once every range
+# is finished, the ranges are merged in file order, so the output is the
+# same as if the file had been parsed in one piece.
+
+def should_split(datafile):
+    """
+    Return True if a data file is large enough to be split into ranges.
+    Members of archives can't be mapped into memory, so they are never
+    split.
+    """
+    return splitsize > 0 and not is_member(datafile) and os.path.getsize(datafile) >= splitsize * 1048576
+
+
+def split_processes():
+    """
+    Return the number of worker processes used to split files when
+    files are parsed one at a time.
+    """
+    return splitworkers or multiprocessing.cpu_count()
+
+
+def open_map(datafile):
+    """
+    Open a data file and map it into memory. Returns the open file and
+    the read-only map.
+    """
+    handle = open(datafile, 'rb')
+    try:
+        return handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except:
+        handle.close()
+        raise
+
+
+def split_ranges(data, start, count):
+    """
+    Split a mapped data file from byte start to its end into up to count
+    (start, end) byte ranges of about the same size. Each range ends just
+    after a newline, so no row is split between two ranges.
+    """
+    size = len(data)
+    step = max((size - start) // max(count, 1), 1)
+    bounds = [start]
+    while bounds[-1] + step < size:
+        newline = data.find('\n', bounds[-1] + step)
+        if newline < 0 or newline + 1 >= size:
+            break
+        bounds.append(newline + 1)
+    bounds.append(size)
+    return zip(bounds[:-1], bounds[1:])
+
+
+def range_lines(datafile, start, end):
+    """
+    Yield the raw lines of a data file from byte start to byte end.
+    """
+    handle, data = open_map(datafile)
+    try:
+        data.seek(start)
+        readline = data.readline
+        position = start
+        while position < end:
+            line = readline()
+            position += len(line)
+            yield line
+    finally:
+        data.close()
+        handle.close()
+
+
+def parse_range(task):
+    """
+    Parse the child rows in one byte range of a large data file in a
+    worker process. task holds the data file, its two header rows and
+    the range. Returns the range's byte ranges in this worker's shards
+    and, if the worker keeps statistics, the range's statistics. If
+    parsing fails, the range's rows are dropped and the error is raised.
+    """
+    datafile, hdr1, hdr2, start, end = task
+    filename = datafile.replace(sourcedir, '')
+    filing = None
+    if shard_stats:
+        filing = FECStats.FilingStats(filename)
+    starts = shard_starts(shard_outputs)
+    lines = range_lines(datafile, start, end)
+    try:
+        # The header rows are handed over again so the rows are read
+        # just as they would be if the file were parsed in one piece
+        write_rows(Filing(itertools.chain((hdr1, hdr2), lines), filename), shard_outputs, filing)
+    except:
+        shard_rollback(shard_outputs, starts)
+        raise
+    finally:
+        lines.close()
+    record = None
+    if filing is not None:
+        filing.finish('parsed')
+        record = filing.record()
+    return shard_ranges(shard_outputs, starts), record
+
+
+def parse_split(datafile, outputs, pool, processes, readers, loader=None, interactive=True, stats=None,
+                journal=None):
+    """
+    Parse a single large data file by splitting its child rows into
+    ranges parsed by the worker processes in pool, which has processes
+    workers, and merge them into outputs, feeding the schedule rows to
+    loader and finishing the file in it if one is given. Then move the
+    file to the processed or review directory, recording it in journal
+    first if one is given. Returns True if the file was parsed and False
+    if it was moved to review. If parsing fails, nothing is written to
+    outputs and the error is raised.
+    """
+    filename = datafile.replace(sourcedir, '')
+    print 'Processing: ' + filename
+    if journal is not None and usedatabaseflag == 1:
+        journal.begin(filename)
+
+    handle, data = open_map(datafile)
+    try:
+        hdr1 = data.readline()
+        hdr2 = data.readline()
+        ranges = split_ranges(data, data.tell(), processes * 4)
+    finally:
+        data.close()
+        handle.close()
+    if stats is not None:
+        stats.bytes = os.path.getsize(datafile)
+
+    # Hold the header row back until the child rows have been parsed
+    header = {}
+    for key in outputs:
+        header[key] = cStringIO.StringIO()
+    reviewname = parse_header([hdr1, hdr2], filename, header, interactive, stats)[1]
+
+    if reviewname is None:
+        if stats is not None:
+            stats.start_rows()
+        results = pool.map(parse_range, [(datafile, hdr1, hdr2, start, end) for start, end in ranges], 1)
+        for key in header:
+            if header[key].tell():
+                outputs[key].write(header[key].getvalue())
+        for shardranges, record in results:
+            merge_ranges(shardranges, outputs, readers, loader)
+            if stats is not None and record is not None:
+                stats.merge(record)
+    if loader is not None:
+        loader.finish(filename)
+
+    # Move the file to the processed or review directory
+    destination, state = file_destination(filename, reviewname)
+    if journal is not None:
+        journal.commit(filename, state, destination, outputs)
+    file_away(datafile, destination, state)
+    if stats is not None:
+        stats.finish(reviewname is None and 'parsed' or 'review', reviewname)
+    return reviewname is None
+
+
+def parse_parallel(files, timestamp, workers, stats=None, journal=None):
+    """
+    Parse files in a pool of worker processes and merge the shards into
+    a single set of timestamped output files in the same order a serial
+    run would write them. If stats is a FECStats.Stats, each file's
+    statistics are added to it. If journal is a FECJournal.Journal, each
+    file is recorded in it once its rows are merged, and only then
+    moved. files can also be a FECWatch.Watcher, which yields None while
+    it waits for the next file, so the files that have arrived are
+    parsed without waiting for more. Ctrl+C stops the run, leaving any
+    file whose rows haven't been merged in the import directory.
+    """
+    sharddir = os.path.join(outputdir, 'Shards_' + timestamp)
+    os.mkdir(sharddir)
+    outputs = open_merged_outputs(timestamp, journal is not None and journal.timestamp is not None)
+    if journal is not None and journal.timestamp is None:
+        journal.start(timestamp, outputs)
+    readers = {}
+    loader = open_loader()
+    pool = multiprocessing.Pool(workers, init_worker,
+                                (sharddir, stats is not None, deltaflag, resumedheaders))
+    try:
+        # Files are handed to the workers as soon as they come, with at
+        # most two per worker waiting to be merged, so in watch mode the
+        # files are parsed while the rest are still arriving and the
+        # watcher's queue holds back any more. Results are merged in the
+        # order files were submitted, and each file's rows are flushed
+        # before its result is returned, so rows can be merged while the
+        # workers keep parsing. Everything waiting is merged before a
+        # file large enough to be split, and whenever no new file has
+        # arrived in watch mode.
+        waiting = collections.deque()
+        for datafile in itertools.chain(files, [None]):
+            if datafile is not None and not should_split(datafile):
+                if journal is not None and usedatabaseflag == 1:
+                    journal.begin(datafile.replace(sourcedir, ''))
+                waiting.append(pool.apply_async(parse_shard, (datafile,)))
+                while waiting and (len(waiting) > workers * 2 or waiting[0].ready()):
+                    merge_shard(waiting.popleft().get(), outputs, readers, loader, stats, journal)
+                continue
+            while waiting:
+                merge_shard(waiting.popleft().get(), outputs, readers, loader, stats, journal)
+            if datafile is not None:
+                split_parallel(datafile, outputs, pool, workers, readers, loader, stats, journal)
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        print '\nStopped. Any file not finished was left in the import directory.'
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        close_outputs(readers)
+        close_outputs(outputs)
+        close_loader(loader)
+
+    shutil.rmtree(sharddir)
+
+
+def merge_shard(result, outputs, readers, loader=None, stats=None, journal=None):
+    """
+    Merge a file parsed by parse_shard() into outputs in a parallel run,
+    then finish it in loader, record it in journal in a batch run and
+    move it.
+    """
+    parsedfile, ranges, record, moveto = result
+    marks = output_marks(outputs)
+    try:
+        merge_ranges(ranges, outputs, readers, loader)
+        if loader is not None:
+            loader.finish(source_name(parsedfile))
+        if journal is not None:
+            journal.commit(parsedfile.replace(sourcedir, ''), moveto[1], moveto[0], outputs)
+        file_away(parsedfile, moveto[0], moveto[1])
+    except KeyboardInterrupt:
+        stop_file(parsedfile, outputs, marks, loader)
+        raise
+    if record is not None:
+        stats.add(record)
+
+
+def split_parallel(datafile, outputs, pool, processes, readers, loader=None, stats=None, journal=None):
+    """
+    Split a large data file among the worker processes in a parallel
+    run. If parsing fails, the file is moved to the review directory and
+    the run carries on with the next file.
+    """
+    filename = datafile.replace(sourcedir, '')
+    filing = None
+    if stats is not None:
+        filing = stats.filing(filename)
+    marks = output_marks(outputs)
+    try:
+        parse_split(datafile, outputs, pool, processes, readers, loader, False, filing, journal)
+    except KeyboardInterrupt:
+        stop_file(datafile, outputs, marks, loader)
+        raise
+    except Exception:
+        review_failed(datafile, outputs, journal)
+        if filing is not None and filing.result is None:
+            filing.finish('error')
+    if filing is not None:
+        stats.add(filing)
+
+
+class StreamParser(object):
+    """
+    Parses data files straight from a download as the bytes arrive,
+    without saving them to the source directory first. FEC Scraper uses
+    this when its streamparse flag is set.
+
+    parse() can be called from several download threads at once. Each
+    thread writes to its own shard files, and each file's rows are
+    copied to the timestamped output files as soon as it is finished.
+    If archive is True, the raw data file is saved to the processed or
+    review directory as it is read, just as if it had been downloaded
+    and then parsed. If statsflag is 1, statistics for the files parsed
+    are saved when the parser is closed.
+    """
+
+    def __init__(self, archive=True):
+        global manifest
+        if manifest is None:
+            manifest = Manifest(manifestfile)
+
+        self.archive = archive
+        self.timestamp = time.strftime('%Y_%m_%d_%H_%M_%S')
+        self.sharddir = os.path.join(outputdir, 'Shards_' + self.timestamp)
+        os.mkdir(self.sharddir)
+        self.outputs = open_merged_outputs(self.timestamp)
+        self.readers = {}
+        self.loader = open_loader()
+        self.shards = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats = None
+        if statsflag == 1:
+            self.stats = FECStats.Stats()
+
+    def parse(self, stream, filename):
+        """
+        Parse a data file read from stream. Returns True if the file was
+        parsed and False if it belongs in review. If reading or parsing
+        fails, the file's rows are dropped and the error is raised. Its
+        header may already be in the database by then, so the file is
+        listed in the manifest to have that header accepted when it is
+        parsed again.
+        """
+        print 'Processing: ' + filename
+
+        if not hasattr(self.local, 'shards'):
+            self.lock.acquire()
+            try:
+                self.local.shards = open_shards(self.sharddir, str(len(self.shards)))
+                self.shards.append(self.local.shards)
+            finally:
+                self.lock.release()
+        shards = self.local.shards
+
+        archive = None
+        if self.archive:
+            partname = destdir + filename + '.part'
+            archive = open(partname, 'wb')
+
+        filing = None
+        if self.stats is not None:
+            filing = self.stats.filing(filename)
+
+        starts = shard_starts(shards)
+        try:
+            lines = read_lines(stream, archive, stats=filing)
+            reviewname = parse_lines(lines, filename, shards, False, filing)
+
+            # Read the rest of a file that was rejected, so the archive
+            # is complete and the connection can be reused
+            for line in lines:
+                pass
+        except:
+            shard_rollback(shards, starts)
+            if usedatabaseflag == 1:
+                manifest.add_header(fileid_from_name(filename))
+            if archive is not None:
+                archive.close()
+                os.remove(partname)
+            if filing is not None:
+                filing.finish('error')
+                self.lock.acquire()
+                try:
+                    self.stats.add(filing)
+                finally:
+                    self.lock.release()
+            raise
+
+        if filing is not None:
+            filing.finish(reviewname is None and 'parsed' or 'review', reviewname)
+        ranges = shard_ranges(shards, starts)
+        self.lock.acquire()
+        try:
+            merge_ranges(ranges, self.outputs, self.readers, self.loader)
+            if self.loader is not None:
+                self.loader.finish(filename)
+            if filing is not None:
+                self.stats.add(filing)
+        finally:
+            self.lock.release()
+
+        if reviewname is None:
+            destination, state = destdir + filename, PARSED
+        else:
+            destination, state = reviewdir + reviewname, REVIEW
+        if archive is not None:
+            archive.close()
+            shutil.move(partname, destination)
+        else:
+            destination = None
+        manifest.update(fileid_from_name(filename), state, destination)
+        return reviewname is None
+
+    def close(self):
+        for shards in self.shards:
+            close_outputs(shards)
+        close_outputs(self.readers)
+        close_outputs(self.outputs)
+        close_loader(self.loader)
+        shutil.rmtree(self.sharddir)
+        update_active(self.timestamp)
+        save_stats(self.stats, self.timestamp)
+
+
+def open_journal(timestamp):
+    """
+    Open the journal for a batch run. If an unfinished run is found, its
+    journal is returned instead, once the files it had finished have
+    been moved and its output files cut back to the last finished file.
+    """
+    path = find_journal(outputdir)
+    if path is not None:
+        journal = Journal(path)
+        if journal.timestamp is not None:
+            return resume_journal(journal)
+
+        # The run crashed before it started writing
+        journal.finish()
+    return Journal(outputdir + 'Journal_' + timestamp + '.txt')
+
+
+def resume_journal(journal):
+    """
+    Pick up an unfinished batch run from its journal (see FECJournal.py).
+    """
+    print 'Resuming the batch run started ' + journal.timestamp + ' after ' + str(len(journal.filings)) + \
+          ' files.\n'
+    try:
+        journal.truncate(output_names().keys())
+    except JournalError, e:
+        journal.close()
+        sys.exit(str(e))
+    for entry in journal.filings:
+        # Members of archives are recorded with the archive's name, and
+        # are filed away for as long as the archive is there
+        datafile = sourcedir + entry['filename']
+        if os.path.exists(split_member(datafile)[0]):
+            file_away(datafile, entry['destination'], entry['state'])
+
+    # Files that were being parsed may already have their headers in the
+    # database, added by the crashed run
+    for filename in journal.started:
+        resumedheaders.add(fileid_from_name(source_name(sourcedir + filename)))
+
+    # The crashed run's shard files are no longer needed
+    sharddir = os.path.join(outputdir, 'Shards_' + journal.timestamp)
+    if os.path.isdir(sharddir):
+        shutil.rmtree(sharddir)
+    return journal
+
+
+def archive_files(archives):
+    """
+    Return the members of archives that haven't been parsed or sent to
+    review yet (see FECArchive.py).
+    """
+    global manifest
+    if manifest is None:
+        manifest = Manifest(manifestfile)
+    finished = finished_fileids(manifest)
+    files = []
+    for archive in archives:
+        files.extend(pending_members(archive, finished))
+
+    # Worker processes open the archives for themselves
+    close_archives()
+    return files
+
+
+def file_archives(archives):
+    """
+    Move each archive whose members have all been parsed or sent to
+    review to the processed directory.
+    """
+    global manifest
+    if not archives:
+        return
+    if manifest is None:
+        manifest = Manifest(manifestfile)
+    finished = finished_fileids(manifest)
+    done = [archive for archive in archives if not pending_members(archive, finished)]
+    close_archives()
+    for archive in done:
+        shutil.move(archive, destdir + os.path.basename(archive))
+
+
+def main(argv=None):
+    global workers, outputformat, outputcompression, rotatemb, rotaterows, splitsize, statsflag, batchflag, \
+        deltaflag
+
+    parser = argparse.ArgumentParser(description='Parse FEC Form 3 data files.')
+    parser.add_argument('--workers', type=int, default=workers,
+                        help='number of files to parse at once (default: %(default)s)')
+    parser.add_argument('--format', choices=('tsv', 'columnar'), default=outputformat,
+                        help='format of the schedule output files (default: %(default)s)')
+    parser.add_argument('--compress', choices=('none', 'gzip', 'zstd'), default=outputcompression,
+                        help='compression of tab-delimited schedule output files (default: %(default)s)')
+    parser.add_argument('--rotate-mb', type=int, default=rotatemb, metavar='MB',
+                        help='start a new part of a schedule output file after this many megabytes; '
+                             '0 for no limit (default: %(default)s)')
+    parser.add_argument('--rotate-rows', type=int, default=rotaterows, metavar='ROWS',
+                        help='start a new part of a schedule output file after this many rows; '
+                             '0 for no limit (default: %(default)s)')
+    parser.add_argument('--split-size', type=int, default=splitsize, metavar='MB',
+                        help='split files of at least this many megabytes among worker processes; '
+                             '0 to never split (default: %(default)s)')
+    parser.add_argument('--stats', action='store_true',
+                        help='save parsing statistics for each file (see FECStats.py)')
+    parser.add_argument('--profile', action='store_true',
+                        help='also profile the row loop with cProfile; needs --workers 1')
+    parser.add_argument('--batch', action='store_true',
+                        help='run without waiting for Enter and resume an unfinished batch run '
+                             '(see FECJournal.py)')
+    parser.add_argument('--delta', action='store_true',
+                        help='write only the rows of amendments that have changed (see FECDelta.py)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and parse files as they arrive in the import directory '
+                             '(see FECWatch.py)')
+    parser.add_argument('--idle', type=int, default=watchidle, metavar='SECONDS',
+                        help='with --watch, stop after this many seconds without a new file; '
+                             '0 to watch until Ctrl+C is pressed (default: %(default)s)')
+    args = parser.parse_args(argv)
+    workers = max(args.workers, 1)
+    outputformat = args.format
+    outputcompression = args.compress
+    rotatemb = args.rotate_mb
+    rotaterows = args.rotate_rows
+    try:
+        FECOutputs.check_compression(outputcompression)
+    except ValueError, e:
+        parser.error(str(e))
+    splitsize = args.split_size
+    if args.stats or args.profile:
+        statsflag = 1
+    if args.profile and workers > 1:
+        parser.error('--profile can only be used with --workers 1')
+    if args.batch:
+        batchflag = 1
+    if batchflag == 1 and (outputformat != 'tsv' or outputcompression != 'none' or rotatemb or rotaterows or
+                           bulkloadflag == 1):
+        parser.error('batch mode needs uncompressed tab-delimited output files that are not rotated, '
+                     'and no bulk loading')
+
+    if args.delta:
+        deltaflag = 1
+    if deltaflag == 1 and amendmentsflag != 1:
+        parser.error('delta mode needs amendmentsflag set to 1')
+    if deltaflag == 1 and rollupflag == 1:
+        parser.error('rollups need every row of each filing, so rollupflag must be 0 in delta mode')
+    if deltaflag == 1 and searchflag == 1:
+        parser.error('the search index needs every row of each filing, so searchflag must be 0 in delta mode')
+
+    # The profiler sees only this process, so don't split files
+    if args.profile:
+        splitsize = 0
+
+    timestamp = time.strftime('%Y_%m_%d_%H_%M_%S')
+    stats = None
+    if statsflag == 1:
+        stats = FECStats.Stats(timing=not args.profile, profile=args.profile)
+
+    # In batch mode, resume the last run if it didn't finish
+    journal = None
+    if batchflag == 1:
+        journal = open_journal(timestamp)
+        timestamp = journal.timestamp or timestamp
+    elif find_journal(outputdir):
+        print 'An unfinished batch run was found in ' + find_journal(outputdir) + '. ' \
+              'Run FEC Parser with --batch to resume it.\n'
+
+    # Iterate through all files in the source directory
+    # and process those with .fec extension, and the members of ZIP
+    # archives, or those that arrive there in watch mode
+    archives = []
+    if args.watch:
+        files = Watcher(sourcedir, watchqueue, watchinterval, args.idle)
+        print 'Watching ' + sourcedir + ' for new files. Press Ctrl+C to stop.\n'
+    else:
+        files = glob.glob(os.path.join(sourcedir, '*.fec'))
+        archives = glob.glob(os.path.join(sourcedir, '*.zip'))
+        files.extend(archive_files(archives))
+    if workers == 1:
+        parse_serial(files, timestamp, stats, journal)
+    else:
+        parse_parallel(files, timestamp, workers, stats, journal)
+    update_active(timestamp)
+    save_stats(stats, timestamp)
+    if journal is not None:
+        journal.finish()
+    file_archives(archives)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+# FEC Records
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module does the work of parsing a filing, one row at a time, with
+no settings, output files or database connections of its own. FEC
+Parser is built on it, and you can use it from your own scripts or from
+a long-running program to parse filings without starting FEC Parser:
+
+    import FECRecords
+    for record in FECRecords.iter_records('Import\\421841.fec'):
+        if record.kind == 'SA':
+            print record.values()['ContAmount']
+
+iter_records() accepts the path of a data file, an open file, a download
+in progress (anything with a read() method) or a list of lines. It is a
+generator: rows are read, cleaned and handed over one at a time, so
+memory use stays the same no matter how large the filing is.
+
+The header row comes first, followed by the child rows in file order.
+Each record has:
+ * kind: The output the row belongs in: 'F3', 'F3P' or 'F3X' for the
+header row, a schedule prefix such as 'SA' or 'SC/' (see FECSchedules.py),
+or 'review' for a child row with an unknown record type or data in
+excess columns.
+ * fields: The cleaned values, exactly as FEC Parser writes them to its
+output files. In the header row, empty values are written as NULL and
+single quotation marks are doubled.
+ * columns: The column names, or None for review rows.
+ * line(): The record as a tab-delimited line.
+ * values(): A dictionary mapping column names to values converted to
+Python types: amounts to Decimal, dates to datetime.date and the
+ImageID to an integer, using the column types in FECColumnar.py. Empty
+values are None, and values that can't be converted are left as text.
+Review rows have no column names, so values() returns None.
+
+A filing that can't be parsed at all raises FilingError before its first
+record. Its reviewname attribute holds the name FEC Parser gives the
+file in the review directory, which says why, and its notice attribute
+holds a message for the user, if there is one.
+
+For more control, create a Filing from the file's lines. It reads and
+checks the header rows right away, and its rows() method yields
+(kind, fields) pairs without creating record objects.
+"""
+
+# Import needed libraries
+import os, itertools, datetime, decimal
+from FECNormalizer import normalize_row, whitespace
+from FECSchedules import schedules, forms, formtypes, lookup, conform
+from FECColumnar import column_type, to_cents, to_days, to_int, epoch
+from FECVersions import versions, Plan, apply_steps
+
+# Script variables
+delimiter = chr(28)
+
+# Characters ignored when checking whether a row is blank, and when
+# reading a row's record type
+blankchars = whitespace + '"' + "'" + delimiter
+typechars = '"' + "'" + delimiter
+
+
+class FilingError(Exception):
+    """
+    Raised when a filing can't be parsed. reviewname is the name the
+    file should be given in the review directory.
+    """
+
+    def __init__(self, reviewname, notice=None):
+        Exception.__init__(self, notice or reviewname)
+        self.reviewname = reviewname
+        self.notice = notice
+
+
+class Filing(object):
+    """
+    A single filing. Creating one reads the two header rows from lines
+    and checks them, raising FilingError if the filing can't be parsed.
+    lines can be any iterable of raw lines.
+    """
+
+    def __init__(self, lines, filename):
+        self.filename = filename
+
+        # Store file ID in variable
+        self.imageid = filename.replace('.fec','')
+
+        # Grab first two lines
+        self.lines = iter(lines)
+        hdr1 = next(self.lines, '')
+        hdr1list = hdr1.split(delimiter)
+        hdr2 = next(self.lines, '')
+        hdr2list = hdr2.split(delimiter)
+
+        # Check header version
+        if hdr1list[0].strip('"') == 'HDR':
+            headerversion = hdr1list[2].strip('"').strip()
+        else:
+            raise FilingError(filename.replace('.fec','_INV_HDR.fec'))
+
+        if headerversion not in versions:
+            raise FilingError(filename.replace('.fec','_HDR_' + headerversion + '.fec'))
+
+        # Header 1 is valid, so now let's parse line 2.
+        # First, retrieve form type
+        formtype = hdr2list[0].strip('"')
+
+        # Make sure form type is valid (see FECSchedules.py)
+        # Supported:
+        #   F3: F3A, F3N
+        #   F3P: F3PA, F3PN
+        #   F3X: F3XA, F3XN
+        if formtype not in formtypes:
+            raise FilingError(filename.replace('.fec','_INV_FORMTYPE_' + formtype + '.fec'))
+
+        # At this point, the header is valid.
+        # Make the header and child rows conform to the current version
+        # (see FECVersions.py). Child rows have the form type and ImageID
+        # added to the front before the plan is applied.
+        self.form = formtypes[formtype]
+        self.plan = Plan(headerversion, self.form['key'], 2)
+        if self.plan.headersteps:
+            cols = hdr2.split(delimiter)
+            self.plan.header(cols)
+            hdr2 = delimiter.join(cols)
+
+        self.hdr1 = hdr1
+        self.hdr2 = hdr2
+        self.headerversion = headerversion
+        self.formtype = formtype
+
+        # Set by FEC Parser in delta mode (see FECDelta.py)
+        self.delta = None
+
+    def cleaned_header(self, database):
+        """
+        Return the second header row with each value in single
+        quotation marks and empty values as NULL, separated by commas
+        for a stored procedure call if database is True, otherwise by
+        tabs.
+        """
+        # Change tabs and newlines to spaces, and remove extra spaces
+        # and quotation marks (see FECNormalizer.py)
+        lineclean = normalize_row(self.hdr2)
+        # Change all instances of ' to ''
+        lineclean = lineclean.replace("'", "''")
+        # Insert NULL between delimiters
+        while delimiter + delimiter in lineclean:
+            lineclean = lineclean.replace(delimiter + delimiter, delimiter + 'NULL' + delimiter)
+        # Add image id
+        lineclean = "'" + self.imageid + delimiter + lineclean
+        # Replace delimiters with single quotations and commas
+        if database:
+            lineclean = lineclean.replace(delimiter, "','")
+            if lineclean.endswith(",'"):
+                lineclean = lineclean[:-2]
+        else:
+            lineclean = lineclean.replace(delimiter, "'\t'")
+            if lineclean.endswith("\t'"):
+                lineclean = lineclean[:-2]
+        # Remove ' from around NULL
+        lineclean = lineclean.replace(",'NULL'",',NULL').replace("\t'NULL'",'\tNULL')
+        # Make sure last field has closing '
+        if not lineclean.endswith("'") and not lineclean.endswith('NULL'):
+            lineclean += "'"
+        return lineclean
+
+    def report_key(self):
+        """
+        Return the committee ID, report code and coverage dates from the
+        second header row, which a filing shares with its amendments, or
+        None if any of them is empty.
+        """
+        fields = normalize_row(self.hdr2).split(delimiter)
+        columns = self.form['columns']
+        key = []
+        for name in self.form['reportcolumns']:
+            # The header columns start with the ImageID, which the
+            # header row itself doesn't have
+            i = columns.index(name) - 1
+            value = i < len(fields) and fields[i].strip().upper() or ''
+            if not value:
+                return None
+            key.append(value)
+        return tuple(key)
+
+    def header_sql(self):
+        """
+        Return the SQL Server stored procedure call that adds the header
+        to the database.
+        """
+        return 'EXEC ' + self.form['procedure'] + ' ' + self.cleaned_header(True) + '\n'
+
+    def header_record(self):
+        """
+        Return the header row as a Record, padded or trimmed to its
+        form's width. Raises FilingError if it has too many values.
+        """
+        lineclean = self.cleaned_header(False)
+        if lineclean.startswith("'"):
+            lineclean = lineclean[1:]
+        if lineclean.endswith("'"):
+            lineclean = lineclean[:-1]
+        lineclean += '\n'
+        lineclean = lineclean.replace("'\t","\t").replace("\t'","\t")
+        width = self.form['width']
+        colct = len(lineclean.split('\t'))
+        while colct < width:
+            lineclean = lineclean.replace('\n', '\t\n')
+            colct = len(lineclean.split('\t'))
+        while colct > width and lineclean.endswith('\t\n'):
+            lineclean = lineclean[:-2] + '\n'
+            colct = len(lineclean.split('\t'))
+        if colct != width:
+            raise FilingError(self.filename,
+                              'The header row for ' + self.filename + ' does not have '
+                              'the correct number of columns. This file will be '
+                              'moved to the review directory and will not '
+                              'be imported.\n')
+        return Record(self.form['key'], lineclean[:-1].split('\t'))
+
+    def rows(self, stats=None):
+        """
+        Yield a (kind, fields) pair for each child row. If stats is a
+        FECStats.FilingStats, the time spent cleaning up rows and
+        fitting them to their schedules is recorded in it.
+        """
+        prefix = self.formtype + delimiter + str(self.imageid) + delimiter
+        plan = self.plan
+        transform = bool(plan.rowsteps)
+        typelength = max([len(entry[0]) for entry in plan.rowsteps] + [3])
+        clean, find, fit = normalize_row, lookup, conform
+        if stats is not None:
+            clean = stats.timed('cleanup', normalize_row)
+            find = stats.timed('conform', lookup)
+            fit = stats.timed('conform', conform)
+
+        # The two header lines are read again here and skipped below.
+        for line in itertools.chain((self.hdr1, self.hdr2), self.lines):
+
+            # If the row is just white space, skip it. The text /n is
+            # ignored too, so rows with a slash are checked again without it.
+            rest = line.translate(None, blankchars)
+            if not rest or ('/' in rest and line.replace('/n','').translate(None, blankchars) == ''):
+                continue
+
+            # Read the start of the record type, ignoring quotation marks
+            # and delimiters, and skip this row if it's a header line
+            rowtype = line[:typelength + 8].translate(None, typechars)
+            if len(rowtype) < typelength:
+                rowtype = line.translate(None, typechars)
+            rowtype = rowtype[:typelength].upper()
+            if rowtype.startswith('HDR') or rowtype.startswith('F3'):
+                continue
+
+            # Find the changes needed to make the row conform to the
+            # current version (see FECVersions.py). A row too short to
+            # reach the fields being changed is changed before cleanup,
+            # the others after it.
+            entry = None
+            if transform:
+                entry = plan.match(rowtype)
+                if entry is not None and line.count(delimiter) < entry[3]:
+                    cols = line.split(delimiter)
+                    apply_steps(entry[1], cols)
+                    line = delimiter.join(cols)
+                    entry = None
+
+            # Add header type and ID, and clean up the line (see
+            # FECNormalizer.py)
+            fields = clean(prefix + line).split(delimiter)
+            if entry is not None:
+                apply_steps(entry[2], fields)
+
+            # Pad or trim the row to its schedule's width (see
+            # FECSchedules.py). Rows with data in excess columns or an
+            # unknown record type go to review.
+            end = line.find(delimiter)
+            if end < 0:
+                end = len(line)
+            schedule = find(line[:end].strip('"'))
+            if schedule is not None and fit(fields, schedule['width']):
+                yield schedule['prefix'], fields
+            else:
+                yield 'review', fields
+
+
+# Column types for each kind of record, filled in as they're needed
+columntypes = {}
+
+
+def convert_value(kind, value):
+    """
+    Convert a value to the Python type for a column type, returning the
+    value unchanged if it can't be converted.
+    """
+    if value == '':
+        return None
+    try:
+        if kind == 'decimal':
+            return decimal.Decimal(to_cents(value)).scaleb(-2)
+        if kind == 'date':
+            return datetime.date.fromordinal(to_days(value) + epoch)
+        if kind == 'int64':
+            return to_int(value)
+    except ValueError:
+        pass
+    return value
+
+
+class Record(object):
+    """
+    A single row of a filing. See the notes at the top of this module.
+    """
+
+    __slots__ = ('kind', 'fields')
+
+    def __init__(self, kind, fields):
+        self.kind = kind
+        self.fields = fields
+
+    def __repr__(self):
+        return 'Record(%r, %r)' % (self.kind, self.fields)
+
+    @property
+    def columns(self):
+        registry = schedules.get(self.kind) or forms.get(self.kind)
+        return registry and registry['columns']
+
+    def line(self):
+        return '\t'.join(self.fields) + '\n'
+
+    def values(self):
+        columns = self.columns
+        if columns is None:
+            return None
+        if self.kind not in columntypes:
+            columntypes[self.kind] = [column_type(name) for name in columns]
+        fields = self.fields
+        if self.kind in forms:
+            fields = [field != 'NULL' and field.replace("''", "'") or '' for field in fields]
+        return dict(zip(columns, map(convert_value, columntypes[self.kind], fields)))
+
+
+def read_lines(stream, archive=None, blocksize=65536, stats=None):
+    """
+    Yield the lines of a stream, such as an HTTP response, as they
+    arrive. If archive is an open file, every block read from the
+    stream is also written to it. If stats is a FECStats.FilingStats,
+    the bytes read are added to it.
+    """
+    pending = ''
+    while True:
+        block = stream.read(blocksize)
+        if not block:
+            break
+        if archive is not None:
+            archive.write(block)
+        if stats is not None:
+            stats.bytes += len(block)
+        lines = (pending + block).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if pending:
+        yield pending
+
+
+def iter_records(source, filename=None):
+    """
+    Yield a Record for the header row and each child row of a filing.
+    source is the path of a data file, an open file or stream, or an
+    iterable of lines. filename is the data file's name, such as
+    421841.fec; it is taken from source if source is a path or an open
+    file. Raises FilingError if the filing can't be parsed.
+    """
+    datafile = None
+    if isinstance(source, basestring):
+        datafile = source = open(source, 'rb')
+    if filename is None:
+        filename = os.path.basename(getattr(source, 'name', ''))
+        if not filename:
+            raise ValueError('A file name is needed to parse a stream')
+    try:
+        lines = source
+        if hasattr(source, 'read'):
+            lines = read_lines(source)
+        filing = Filing(lines, filename)
+        yield filing.header_record()
+        for kind, fields in filing.rows():
+            yield Record(kind, fields)
+    finally:
+        if datafile is not None:
+            datafile.close()
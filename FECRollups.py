@@ -0,0 +1,308 @@
+# FEC Rollups
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module adds up schedule rows into summary tables, or rollups, as
+FEC Parser writes them, so totals such as receipts by state or top
+donors per committee don't have to wait for the rows to be loaded into
+a database. FEC Parser uses it when the rollupflag user variable is set
+to 1.
+
+Each rollup is defined in FEC Parser's rollups user variable by a name,
+a schedule prefix (see FECSchedules.py), the columns to group by and an
+amount column to add up. For every group, a rollup counts the rows and
+adds up the amounts in cents; amounts that aren't valid numbers are
+counted but not added. Rows marked as memo entries (MemoCode X) are left
+out, as they are in the FEC's own totals.
+
+Rollups are kept in a small SQLite database, Rollups.db in the main
+directory:
+ * partials: Each filing's own count and total for every group it
+touches, saved as the filing is finished.
+ * totals: The running count and total for every group, counting only
+filings that haven't been superseded by an amendment.
+When a filing is finished, its partials are added to the totals and the
+partials of any filings it supersedes (see FECAmendments.py) are taken
+away, so each new filing updates only the groups it touches and the
+rows of earlier filings are never read again. Finishing the same filing
+a second time, such as when a batch run is resumed, replaces its
+partials rather than counting them twice. A rollup added to the list
+later covers only the filings parsed after it was added. Because an
+amendment's partials replace those of the filing it amends, rollups
+need every row of each filing and can't be built in delta mode (see
+FECDelta.py).
+
+To list the rollups, print one, or show the largest groups for each
+value of its first column (the top donors to each committee, say), run:
+    python FECRollups.py
+    python FECRollups.py ReceiptsByState
+    python FECRollups.py TopDonors --top 10
+    python FECRollups.py --clear
+"""
+
+# Import needed libraries
+import sqlite3, threading, decimal
+from FECSchedules import schedules
+from FECManifest import fileid_from_name
+from FECColumnar import to_cents
+
+
+class Aggregator(object):
+    """
+    Builds rollups from the rows FEC Parser writes. It takes rows the
+    same way FECLoader.Loader does: feed() them as they are written and
+    finish() each filing. rollups is a list of (name, prefix, columns,
+    amount) tuples. If amendmentsfile is given, filings superseded by
+    amendments recorded there are taken out of the totals.
+    """
+
+    def __init__(self, path, rollups, amendmentsfile=None):
+        self.path = path
+
+        # Position of the group and amount columns for each schedule's
+        # rollups
+        self.rollups = {}
+        for name, prefix, columns, amount in rollups:
+            names = schedules[prefix]['columns']
+            self.rollups.setdefault(prefix, []).append(
+                (name, [names.index(column) for column in columns], names.index(amount)))
+        self.memocolumns = {}
+        for prefix in self.rollups:
+            self.memocolumns[prefix] = schedules[prefix]['columns'].index('MemoCode')
+
+        self.resolver = None
+        if amendmentsfile is not None:
+            from FECAmendments import Resolver
+            self.resolver = Resolver(amendmentsfile)
+
+        # FEC Scraper can feed rows from several download threads, so
+        # share one connection behind a lock, as FECManifest.py does
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        # Group keys are stored as the bytes they were parsed from, which
+        # aren't always ASCII
+        self.conn.text_factory = str
+        self.conn.execute('CREATE TABLE IF NOT EXISTS filings ('
+                          'imageid INTEGER PRIMARY KEY, '
+                          'counted INTEGER NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS partials ('
+                          'imageid INTEGER NOT NULL, '
+                          'rollup TEXT NOT NULL, '
+                          'groupkey TEXT NOT NULL, '
+                          'rowcount INTEGER NOT NULL, '
+                          'cents INTEGER NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS filingpartials ON partials (imageid)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS totals ('
+                          'rollup TEXT NOT NULL, '
+                          'groupkey TEXT NOT NULL, '
+                          'rowcount INTEGER NOT NULL, '
+                          'cents INTEGER NOT NULL, '
+                          'PRIMARY KEY (rollup, groupkey))')
+        self.conn.commit()
+
+        # The current filing's groups, mapping (rollup, groupkey) to a
+        # [rowcount, cents] pair, and any partial line at the end of the
+        # data passed to feed() for each schedule
+        self.groups = {}
+        self.partial = {}
+
+        # Totals for report()
+        self.filings = 0
+        self.rows = 0
+
+    def feed(self, prefix, data):
+        """
+        Add tab-delimited output rows for a schedule. data can hold any
+        number of rows, and a row can be split across calls.
+        """
+        if prefix not in self.rollups:
+            return
+        lines = (self.partial.pop(prefix, '') + data).split('\n')
+        tail = lines.pop()
+        if tail:
+            self.partial[prefix] = tail
+        rollups = self.rollups[prefix]
+        memocolumn = self.memocolumns[prefix]
+        groups = self.groups
+        for line in lines:
+            fields = line.split('\t')
+            if len(fields) <= memocolumn or fields[memocolumn] == 'X':
+                continue
+            self.rows += 1
+            for name, columns, amount in rollups:
+                key = (name, '\t'.join([fields[i] for i in columns]))
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [0, 0]
+                group[0] += 1
+                try:
+                    group[1] += to_cents(fields[amount])
+                except ValueError:
+                    pass
+
+    def adjust(self, imageid, sign):
+        """
+        Add a filing's partials to the totals, or take them away if sign
+        is -1.
+        """
+        for rollup, groupkey, rowcount, cents in self.conn.execute(
+                'SELECT rollup, groupkey, rowcount, cents FROM partials WHERE imageid = ?', (imageid,)).fetchall():
+            self.conn.execute('INSERT OR IGNORE INTO totals (rollup, groupkey, rowcount, cents) VALUES (?, ?, 0, 0)',
+                              (rollup, groupkey))
+            self.conn.execute('UPDATE totals SET rowcount = rowcount + ?, cents = cents + ? '
+                              'WHERE rollup = ? AND groupkey = ?', (sign * rowcount, sign * cents, rollup, groupkey))
+        self.conn.execute('DELETE FROM totals WHERE rowcount = 0')
+
+    def finish(self, filename):
+        """
+        Save the partials for a filing and bring the totals up to date.
+        Returns True if the filing was recorded.
+        """
+        for prefix in list(self.partial):
+            self.feed(prefix, '\n')
+        groups = self.groups
+        self.groups = {}
+        fileid = fileid_from_name(filename)
+        if fileid is None:
+            return False
+        imageid = int(fileid)
+
+        # Filings this one supersedes come out of the totals, and it
+        # goes in only if it hasn't been superseded itself
+        superseded = []
+        counted = 1
+        if self.resolver is not None:
+            superseded = self.resolver.superseded(imageid)
+            counted = self.resolver.active(imageid) is not False and 1 or 0
+
+        self.lock.acquire()
+        try:
+            try:
+                row = self.conn.execute('SELECT counted FROM filings WHERE imageid = ?', (imageid,)).fetchone()
+                if row is not None and row[0]:
+                    self.adjust(imageid, -1)
+                self.conn.execute('DELETE FROM partials WHERE imageid = ?', (imageid,))
+                self.conn.executemany('INSERT INTO partials (imageid, rollup, groupkey, rowcount, cents) '
+                                      'VALUES (?, ?, ?, ?, ?)',
+                                      [(imageid, rollup, groupkey, group[0], group[1])
+                                       for (rollup, groupkey), group in groups.iteritems()])
+                self.conn.execute('INSERT OR REPLACE INTO filings (imageid, counted) VALUES (?, ?)',
+                                  (imageid, counted))
+                if counted:
+                    self.adjust(imageid, 1)
+                for old in superseded:
+                    row = self.conn.execute('SELECT counted FROM filings WHERE imageid = ?', (old,)).fetchone()
+                    if row is not None and row[0]:
+                        self.adjust(old, -1)
+                        self.conn.execute('UPDATE filings SET counted = 0 WHERE imageid = ?', (old,))
+                self.conn.commit()
+            except:
+                self.conn.rollback()
+                raise
+        finally:
+            self.lock.release()
+        self.filings += 1
+        return True
+
+    def rollback(self):
+        """
+        Throw away the current filing's rows.
+        """
+        self.groups = {}
+        self.partial = {}
+
+    def totals(self, rollup):
+        """
+        Return a list of (groupkey, rowcount, amount) tuples for a rollup,
+        with the group key split into its columns and the amount as a
+        decimal.Decimal.
+        """
+        self.lock.acquire()
+        try:
+            rows = self.conn.execute('SELECT groupkey, rowcount, cents FROM totals WHERE rollup = ? '
+                                     'ORDER BY groupkey', (rollup,)).fetchall()
+        finally:
+            self.lock.release()
+        return [(tuple(groupkey.split('\t')), rowcount, decimal.Decimal(cents).scaleb(-2))
+                for groupkey, rowcount, cents in rows]
+
+    def names(self):
+        """
+        Return a list of (rollup, groups) pairs for the rollups in the
+        database.
+        """
+        self.lock.acquire()
+        try:
+            return self.conn.execute('SELECT rollup, COUNT(*) FROM totals GROUP BY rollup '
+                                     'ORDER BY rollup').fetchall()
+        finally:
+            self.lock.release()
+
+    def report(self):
+        """
+        Return a one-line summary of what has been rolled up.
+        """
+        return 'Rolled up ' + str(self.rows) + ' rows from ' + str(self.filings) + ' filings into ' + \
+               self.path + '.'
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            for table in ('filings', 'partials', 'totals'):
+                self.conn.execute('DELETE FROM ' + table)
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.conn.close()
+        if self.resolver is not None:
+            self.resolver.close()
+
+
+def top_groups(totals, count):
+    """
+    Return the count largest groups by amount for each value of the
+    first column of a rollup's totals.
+    """
+    ranked = {}
+    for entry in totals:
+        ranked.setdefault(entry[0][0], []).append(entry)
+    result = []
+    for first in sorted(ranked):
+        result.extend(sorted(ranked[first], key=lambda entry: -entry[2])[:count])
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+
+    # Use the same settings as FEC Parser
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    rollupfile = maindir + 'Rollups.db'
+
+    parser = argparse.ArgumentParser(description='Print the rollups FEC Parser has built.')
+    parser.add_argument('rollup', nargs='?', help='rollup to print')
+    parser.add_argument('--top', type=int, metavar='N',
+                        help='print only the N largest groups for each value of the first column')
+    parser.add_argument('--clear', action='store_true', help='empty the rollup database')
+    args = parser.parse_args()
+
+    aggregator = Aggregator(rollupfile, ())
+    if args.clear:
+        aggregator.clear()
+        print 'Cleared the rollup database.'
+    elif args.rollup:
+        totals = aggregator.totals(args.rollup)
+        if args.top:
+            totals = top_groups(totals, args.top)
+        for groupkey, rowcount, amount in totals:
+            print '\t'.join(groupkey) + '\t' + str(rowcount) + '\t' + str(amount)
+    else:
+        for rollup, groups in aggregator.names():
+            print rollup + ': ' + str(groups) + ' groups'
+    aggregator.close()
@@ -0,0 +1,222 @@
+# FEC Scheduler
+# Companion module for FEC Scraper
+# Developed with Python 2.7.2
+
+"""
+This module decides the order in which FEC Scraper downloads new
+filings and when a run has downloaded enough.
+
+Right after a filing deadline, hundreds of new filings can show up at
+once. Rather than downloading them in filing-number order, the queue is
+sorted so the filings you care about most come first:
+ * Filings by committees on your priority list, in the order listed.
+ * Then the most recently filed, going by the filing date shown on the
+committee's index page, or the filing number if it isn't shown.
+ * Then the largest, going by the Content-Length the website sends in
+answer to a HEAD request, if sizes are checked.
+
+A run can be given a budget: the most bytes (maxbytes) or seconds
+(maxseconds) to spend downloading. Once the budget is used up, no more
+downloads are started, although those already under way are finished.
+A filing whose size is known is not started if it would go over the
+byte budget, but smaller filings after it can be.
+
+The queue is kept in a small SQLite database, Queue.db in the main
+directory. Filings that aren't downloaded, because the budget ran out or
+the download failed, stay in the queue and take their place in the
+order again on the next run, even if their committee's index page can't
+be searched that time. To see what is waiting, or to empty the queue,
+run:
+    python FECScheduler.py
+    python FECScheduler.py --clear
+"""
+
+# Import needed libraries
+import sqlite3, threading, time
+
+
+class Scheduler(object):
+
+    def __init__(self, path, maxbytes=0, maxseconds=0, priority=()):
+        self.path = path
+        self.maxbytes = maxbytes
+        self.maxseconds = maxseconds
+        self.priority = dict((commid, rank) for rank, commid in enumerate(priority))
+
+        # Downloads are started and finished from several download
+        # threads, so share one connection behind a lock, as
+        # FECManifest.py does
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS queue ('
+                          'fileid TEXT PRIMARY KEY, '
+                          'commid TEXT, '
+                          'filed TEXT, '
+                          'size INTEGER, '
+                          'added REAL NOT NULL)')
+        self.conn.commit()
+
+        # Budget used so far, including the expected size of downloads
+        # under way
+        self.started = None
+        self.used = 0
+        self.reserved = {}
+        self.counts = {'downloaded': 0, 'deferred': 0}
+
+    def __len__(self):
+        self.lock.acquire()
+        try:
+            return self.conn.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+        finally:
+            self.lock.release()
+
+    def add(self, fileid, commid=None, filed=None):
+        """
+        Add a filing to the queue. A filing already queued keeps its
+        place, but the committee and filing date are filled in if they
+        weren't known.
+        """
+        self.add_many([(fileid, commid, filed)])
+
+    def add_many(self, filings):
+        """
+        Add several filings at once from a list of (fileid, commid,
+        filed) tuples.
+        """
+        now = time.time()
+        self.lock.acquire()
+        try:
+            self.conn.executemany('INSERT OR IGNORE INTO queue (fileid, commid, filed, added) VALUES (?, ?, ?, ?)',
+                                  [(str(f), c, d, now) for f, c, d in filings])
+            self.conn.executemany('UPDATE queue SET commid = COALESCE(commid, ?), filed = COALESCE(filed, ?) '
+                                  'WHERE fileid = ?', [(c, d, str(f)) for f, c, d in filings])
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def remove(self, fileids):
+        """
+        Take filings out of the queue without downloading them.
+        """
+        self.lock.acquire()
+        try:
+            self.conn.executemany('DELETE FROM queue WHERE fileid = ?', [(str(f),) for f in fileids])
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def entries(self):
+        """
+        Return a list of (fileid, commid, filed, size) tuples for the
+        filings in the queue.
+        """
+        self.lock.acquire()
+        try:
+            return self.conn.execute('SELECT fileid, commid, filed, size FROM queue').fetchall()
+        finally:
+            self.lock.release()
+
+    def unsized(self):
+        """
+        Return the filing IDs in the queue whose size isn't known.
+        """
+        return [entry[0] for entry in self.entries() if entry[3] is None]
+
+    def set_size(self, fileid, size):
+        self.lock.acquire()
+        try:
+            self.conn.execute('UPDATE queue SET size = ? WHERE fileid = ?', (size, str(fileid)))
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def order(self):
+        """
+        Return the filing IDs in the queue in the order they should be
+        downloaded.
+        """
+        last = len(self.priority)
+
+        def key(entry):
+            fileid, commid, filed, size = entry
+            return (self.priority.get(commid, last), -int(filed or 0), -(size or 0), -int(fileid))
+
+        return [entry[0] for entry in sorted(self.entries(), key=key)]
+
+    def start(self, fileid):
+        """
+        Return True if a filing can be downloaded within the budget, and
+        count its expected size against the budget until it finishes.
+        Returns False if the budget has been used up.
+        """
+        self.lock.acquire()
+        try:
+            if self.started is None:
+                self.started = time.time()
+            row = self.conn.execute('SELECT size FROM queue WHERE fileid = ?', (str(fileid),)).fetchone()
+            size = row and row[0] or 0
+            used = self.used + sum(self.reserved.values())
+            if (self.maxseconds and time.time() - self.started >= self.maxseconds) or \
+               (self.maxbytes and (used >= self.maxbytes or (used and used + size > self.maxbytes))):
+                self.counts['deferred'] += 1
+                return False
+            self.reserved[fileid] = size
+            return True
+        finally:
+            self.lock.release()
+
+    def finish(self, fileid, size=None):
+        """
+        Record that a download is over. If it succeeded, size is the
+        number of bytes downloaded and the filing leaves the queue;
+        otherwise size is None and the filing stays for the next run.
+        """
+        self.lock.acquire()
+        try:
+            self.reserved.pop(fileid, None)
+            if size is not None:
+                self.used += size
+                self.counts['downloaded'] += 1
+                self.conn.execute('DELETE FROM queue WHERE fileid = ?', (str(fileid),))
+                self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute('DELETE FROM queue')
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def report(self):
+        """
+        Return a one-line summary of the run's downloads.
+        """
+        return 'Downloaded ' + str(self.counts['downloaded']) + ' filings (' + \
+               str(round(self.used / 1048576.0, 1)) + ' MB); ' + str(self.counts['deferred']) + \
+               ' put off by the budget; ' + str(len(self)) + ' left in the queue.'
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    # Use the same settings as FEC Scraper
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    queuefile = maindir + 'Queue.db'
+
+    scheduler = Scheduler(queuefile)
+    if '--clear' in sys.argv[1:]:
+        scheduler.clear()
+        print 'Cleared the download queue.'
+    for fileid in scheduler.order():
+        print fileid
+    print 'Queued filings: ' + str(len(scheduler))
+    scheduler.close()
@@ -0,0 +1,367 @@
+# FEC Schedules
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module describes the child rows FEC Parser writes to its schedule
+output files: Schedules A, B, C, C1, C2, D and E and long-text records.
+It also describes the Form F3, F3P and F3X header rows.
+
+Each schedule is registered under the record type prefix that appears
+in the first (FormType) column of a child row, along with the name of
+its output file and its column names. The number of columns in the
+output file is taken from the column names, so the column headers below
+are the only place a schedule's width is defined.
+
+Use lookup() to find the schedule for a record type and conform() to
+pad or trim a row's fields to that schedule's width.
+"""
+
+# Column headers
+scheduleaheaderstring = 'ParentType\tImageId\tFormType\tCommID\tTransID\tBackRefTransID\tBackRefSchedName\t' \
+               'EntityType\tContOrgName\tContLastName\tContFirstName\tContMidName\t' \
+               'ContPrefix\tContSuffix\tContAddress1\tContAddress2\tContCity\tContState\t' \
+               'ContZip\tElecCode\tElecOtherDesc\tstrContDate\tContAmount\tContAggregate\t' \
+               'ContPurposeCode\tContPurposeDesc\tContEmployer\tContOccupation\t' \
+               'DonorCommFECID\tDonorCommName\tDonorCandFECID\tDonorCandLastName\t' \
+               'DonorCandFirstName\tDonorCandMidName\tDonorCandPrefix\tDonorCandSuffix\t' \
+               'DonorCandOffice\tDonorCandState\tDonorCandDist\tConduitName\t' \
+               'ConduitAddress1\tConduitAddress2\tConduitCity\tConduitState\tConduitZip\t' \
+               'MemoCode\tMemoText\n'
+schedulebheaderstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\tBackRefSchedName\t' \
+                'EntityType\tPayeeOrgName\tPayeeLastName\tPayeeFirstName\tPayeeMidName\t' \
+                'PayeePrefix\tPayeeSuffix\tPayeeAddress1\tPayeeAddress2\tPayeeCity\t' \
+                'PayeeState\tPayeeZip\tElecCode\tElecOtherDesc\tstrExpDate\tExpAmount\t' \
+                'SemiAnnRefundedBundledAmt\tExpPurpCode\tExpPurpDesc\tCatCode\tBenCommFECID\t' \
+                'BenCommName\tBenCandFECID\tBenCandLastName\tBenCandFirstName\tBenCandMidName\t' \
+                'BenCandPrefix\tBenCandSuffix\tBenCandOffice\tBenCandState\tBenCandDist\t' \
+                'ConduitName\tConduitAddress1\tConduitAddress2\tConduitCity\tConduitState\t' \
+                'ConduitZip\tMemoCode\tMemoText\n'
+schedulecheaderstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tRectLineNbr\tEntityType\t' \
+                'LenderOrgName\tLenderLastName\tLenderFirstName\tLenderMidName\t' \
+                'LenderPrefix\tLenderSuffix\tLenderAddress1\tLenderAddress2\t' \
+                'LenderCity\tLenterState\tLenderZip\tElecCod\tElecOtherDesc\t' \
+                'LoanAmt\tLoanPymtToDate\tLoanBal\tstrLoanIncurredDate\t' \
+                'strLoanDueDate\tLoanIntRate\tLoanSecuredFlag\tLoanPersFundsFlag\t' \
+                'LenderCommID\tLenderCandID\tLenderCandLastName\tLenderCandFirstName\t' \
+                'LenderCandMidName\tLenderCandPrefix\tLenderCandSuffix\tLenderCandOffice\t' \
+                'LenderCandState\tLenderCandDist\tMemoCode\tMemoText\n'
+schedulec1headerstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\t' \
+                'LenderOrgName\tLenderAddress1\tLenderAddress2\tLenderCity\t' \
+                'LenderState\tLenderZip\tLoanAmt\tLoanIntRate\tstrLoanIncurredDate\t' \
+                'strLoanDueDate\tA1_LoanRestructuredFlag\tA2_strOrigLoanIncurredDate\t' \
+                'B1_CreditAmtThisDraw\tB2_TotBalance\tC_OthersLiableFlag\t' \
+                'D_CollateralFlag\tD1_CollateralDescription\tD2_CollateralValue\t' \
+                'D3_PerfectedInterestFlag\tE1_FutureIncomeFlag\tE2_FutureIncomeDesc\t' \
+                'E3_EstimatedValue\tE4_strDepositoryAcctEstablishedDate\tE5_AcctLocName\t' \
+                'E6_AcctAddress1\tE7_AcctAddress1\tE8_AcctCity\tE9_State\tE10_Zip\t' \
+                'E11_strDepositAcctAuthDate\tF_LoanBasisDesc\tG_TreasLastName\t' \
+                'G_TreasFirstName\tG_TreasMidName\tG_TreasPrefix\tG_TreasSuffix\t' \
+                'G_strDateSigned\tH_AuthorizedLastName\tH_AuthorizedfirstName\t' \
+                'H_AuthorizedMidName\tH_AuthorizedPrefix\tH_AuthorizedSuffix\t' \
+                'H_AuthorizedTitle\tH_strDateSigned\n'
+schedulec2headerstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\t' \
+                'GuarLastName\tGuarFirstName\tGuarMidName\tGuarPrefix\t' \
+                'GuarSuffix\tGuarAddress1\tGuarAddress2\tGuarCity\tGuarState\t' \
+                'GuarZip\tGuarEmployer\tGuarOccupation\tGuarAmt\n'
+scheduledheaderstring = 'ParentType\tImageId\tFormType\tCommID\tTransID\tEntityType\tCredOrgName\t' \
+                'CredLastName\tCredFirstName\tCredMidName\tCredPrefix\t' \
+                'CredSuffix\tCredAddress1\tCredAddress2\tCredCity\tCredState\t' \
+                'CredZip\tDebtPurpose\tBegBal_Prd\tIncurredAmt_Prd\tPaymtAmt_Prd\t' \
+                'BalanceAtClose_Prd\n'
+scheduleeheaderstring = 'ParentType\tImageId\tFormType\tFilerCommID\tTransID\tBackRefTransID\t' \
+                'BackRefSchedName\tEntityType\tPayeeOrgName\tPayeeLastName\t' \
+                'PayeeFirstName\tPayeeMidName\tPayeePrefix\tPayeeSuffix\t' \
+                'PayeeAddress1\tPayeeAddress2\tPayeeCity\tPayeeState\tPayeeZip\t' \
+                'ElecCode\tElecOtherDesc\tstrExpDate\tExpAmount\tCalYTD\t' \
+                'ExpPurpCode\tExpPurpDesc\tCatCode\tPayeeCommFECID\tSuppOppCode\t' \
+                'SuppOppCandID\tSuppOppCandLastName\tSuppOppCandFirstName\t' \
+                'SuppOppCandMidName\tSuppOppCandPrefix\tSuppOppCandSuffix\t' \
+                'SuppOppCandOffice\tSuppOppCandState\tSuppOppCandDist\t' \
+                'CompLastName\tCompFirstName\tCompMidName\tCompPrefix\tCompSuffix\t' \
+                'strDateSigned\tMemoCode\tMemoText\n'
+textheaderstring = 'ParentType\tImageId\tRecType\tCommID\tTransID\tBackRefTransID\tBackRefFormName\tFullText\n'
+
+# Column headers for the Form 3 header rows
+formf3headerstring = 'ImageID\tFormType\tCommID\tCommName\t' \
+    'AddressChange\tCommAddress1\tCommAddress2\tCommCity\tCommState\t' \
+    'CommZip\tElecState\tElecDist\tReptCode\tElecCode\tstrElecDate\t' \
+    'StateOfElec\tstrCovgFromDate\tstrCovgToDate\tTreasLastName\t' \
+    'TreasFirstName\tTreasMidName\tTreasPrefix\tTreasSuffix\tstrDateSigned\t' \
+    'Line6a_TotalContribs_Prd\tLine6b_TotalContribRefunds_Prd\t' \
+    'Line6c_NetContribs_Prd\tLine7a_TotOpExps_Prd\tLine7b_TotOffsetToOpExps_Prd\t' \
+    'Line7c_NetOpExps_Prd\tLine8_CashOnHandAtClose_Prd\tLine9_DebtsTo_Prd\t' \
+    'Line10_DebtsBy_Prd\tLine11a1_IndivsItemized_Prd\tLine11a2_IndivsUnitemized_Prd\t' \
+    'Line11a3_IndivsContribTotal_Prd\tLine11b_PolPtyComms_Prd\tLine11c_OtherPACs_Prd\t' \
+    'Line11d_Candidate_Prd\tLine11e_TotalContribs_Prd\tLine12_TransfersFrom_Prd\t' \
+    'Line13a_LoansByCand_Prd\tLine13b_OtherLoans_Prd\tLine13c_TotLoans_Prd\t' \
+    'Line14_OffsetsToOpExps_Prd\tLine15_OtherReceipts_Prd\tLine16_TotReceipts_Prd\t' \
+    'Line17_OpExps_Prd\tLine18_TransToOtherComms_Prd\tLine19a_LoanRepaymts_Cand_Prd\t' \
+    'Line19b_LoanRepaymts_Other_Prd\tLine19c_TotLoanRepaymts_Prd\t' \
+    'Loan20a_IndivRefunds_Prd\tLine20b_PolPartyCommRefunds_Prd\t' \
+    'Line20c_OtherPolCommRefunds_Prd\tLine20d_TotContRefunds_Prd\t' \
+    'Line21_OtherDisb_Prd\tLine22_TotDisb_Prd\tLine23_CashBegin_Prd\t' \
+    'Line24_TotReceipts_Prd\tLine25_Subtotal\tLine26_TotDisbThisPrd_Prd\t' \
+    'Line27_CashAtClose_Prd\tLine6a_TotalContribs_Tot\t' \
+    'Line6b_TotalContribRefunds_Tot\tLine6c_NetContribs_Tot\tLine7a_TotOpExps_Tot\t' \
+    'Line7b_TotOffsetToOpExps_Tot\tLine7c_NetOpExps_Tot\t' \
+    'Line11a1_IndivsItemized_Tot\tLine11a2_IndivsUnitemized_Tot\t' \
+    'Line11a3_IndivsContribTotal_Tot\tLine11b_PolPtyComms_Tot\t' \
+    'Line11c_OtherPACs_Tot\tLine11d_Candidate_Tot\tLine11e_TotalContribs_Tot\t' \
+    'Line12_TransfersFrom_Tot\tLine13a_LoansByCand_Tot\tLine13b_OtherLoans_Tot\t' \
+    'Line13c_TotLoans_Tot\tLine14_OffsetsToOpExps_Tot\tLine15_OtherReceipts_Tot\t' \
+    'Line16_TotReceipts_Tot\tLine17_OpExps_Tot\tLine18_TransToOtherComms_Tot\t' \
+    'Line19a_LoanRepaymts_Cand_Tot\tLine19b_LoanRepaymts_Other_Tot\t' \
+    'Line19c_TotLoanRepaymts_Tot\tLoan20a_IndivRefunds_Tot\t' \
+    'Line20b_PolPartyCommRefunds_Tot\tLine20c_OtherPolCommRefunds_Tot\t' \
+    'Line20d_TotContRefunds_Tot\tLine21_OtherDisb_Tot\tLine22_TotDisb_Tot\n'
+formf3pheaderstring = 'ImageID\tFormType\tCommID\tCommName\t' \
+    'AddressChange\tCommAddress1\tCommAddress2\tCommCity\tCommState\t' \
+    'CommZip\tActivityPrim\tActivityGen\tReptCode\tElecCode\t' \
+    'strElecDate\tElecState\tstrFromDate\tstrToDate\tTreasLastName\t' \
+    'TreasFirstName\tTreasMidName\tTreasPrefix\tTreasSuffix\t' \
+    'strDateSigned\tLine6_CashBegin\tLine7_TotReceipts\t' \
+    'Line8_Subtotal\tLine9_TotalDisb\tLine10_CashClose\t' \
+    'Line11_DebtsTo\tLine12_DebtsBy\tLine13_ExpendsSubToLimits\t' \
+    'Line14_NetContribs\tLine15_NetOpExps\tLine16_FedFunds_Prd\t' \
+    'Line17a1_IndivsItemzd_Prd\tLine17a2_IndivsUnItemzd_Prd\t' \
+    'Line17a3_IndContTot_Prd\tLine17b_PolPartyComms_Prd\t' \
+    'Line17c_OtherPACs_Prd\tLine17d_Candidate_Prd\t' \
+    'Line17e_TotContribs_Prd\tLine18_TransfersFrom_Prd\t' \
+    'Line19a_CandLoans_Prd\tLine19b_OtherLoans_Prd\t' \
+    'Line19c_TotLoans_Prd\tLine20a_Operating_Prd\t' \
+    'Line20b_Fundraising_Prd\tLine20c_LegalAcctg_Prd\t' \
+    'Line20d_TotExpOffsets_Prd\tLine21_OtherReceipts_Prd\t' \
+    'Line22_TotReceipts_Prd\tLine23_OpExpends_Prd\t' \
+    'Line24_TransToOtherComms_Prd\tLine25_FundraisingDisbursed_Prd\t' \
+    'Line26_ExemptLegalAcctgDisb_Prd\tLine27a_CandRepymts_Prd\t' \
+    'Line27b_OtherRepymts_Prd\tLine27c_TotLoanRepymts_Prd\t' \
+    'Line28a_IndivRefunds_Prd\tLine28b_PolPartyCommRefunds_Prd\t' \
+    'Line28c_OtherPolCommRefunds_Prd\tLine28d_TotalContRefunds_Prd\t' \
+    'Line29_OtherDisb_Prd\tLine30_TotDisb_Prd\t' \
+    'Line31_ItemsToLiq_Prd\tAllocAlabama_Prd\tAllocAlaska_Prd\t' \
+    'AllocArizona_Prd\tAllocArkansas_Prd\tAllocCalifornia_Prd\t' \
+    'AllocColorado_Prd\tAllocConnecticut_Prd\tAllocDelaware_Prd\t' \
+    'AllocDistCol_Prd\tAllocFlorida_Prd\tAllocGeorgia_Prd\t' \
+    'AllocHawaii_Prd\tAllocIdaho_Prd\tAllocIllinois_Prd\t' \
+    'AllocIndiana_Prd\tAllocIowa_Prd\tAllocKansas_Prd\t' \
+    'AllocKentucky_Prd\tAllocLouisiana_Prd\tAllocMaine_Prd\t' \
+    'AllocMaryland_Prd\tAllocMassachusetts_Prd\tAllocMichigan_Prd\t' \
+    'AllocMinnesota_Prd\tAllocMississippi_Prd\tAllocMissouri_Prd\t' \
+    'AllocMontana_Prd\tAllocNebraska_Prd\tAllocNevada_Prd\t' \
+    'AllocNewHampshire_Prd\tAllocNewJersey_Prd\tAllocNewMexico_Prd\t' \
+    'AllocNewYork_Prd\tAllocNorthCarolina_Prd\t' \
+    'AllocNorthDakota_Prd\tAllocOhio_Prd\tAllocOklahoma_Prd\t' \
+    'AllocOregon_Prd\tAllocPennsylvania_Prd\tAllocRhodeIsland_Prd\t' \
+    'AllocSouthCarolina_Prd\tAllocSouthDakota_Prd\t' \
+    'AllocTennessee_Prd\tAllocTexas_Prd\tAllocUtah_Prd\t' \
+    'AllocVermont_Prd\tAllocVirginia_Prd\tAllocWashington_Prd\t' \
+    'AllocWestVirginia_Prd\tAllocWisconsin_Prd\tAllocWyoming_Prd\t' \
+    'AllocPuertoRico_Prd\tAllocGuam_Prd\tAllocVirginIslands_Prd\t' \
+    'AllocStatesTotal_Prd\tLine16_FedFunds_Tot\t' \
+    'Line17a1_IndivsItemzd_Tot\tLine17a2_IndivsUnItemzd_Tot\t' \
+    'Line17a3_IndContTot_Tot\tLine17b_PolPartyComms_Tot\t' \
+    'Line17c_OtherPACs_Tot\tLine17d_Candidate_Tot\t' \
+    'Line17e_TotContribs_Tot\tLine18_TransfersFrom_Tot\t' \
+    'Line19a_CandLoans_Tot\tLine19b_OtherLoans_Tot\t' \
+    'Line19c_TotLoans_Tot\tLine20a_Operating_Tot\t' \
+    'Line20b_Fundraising_Tot\tLine20c_LegalAcctg_Tot\t' \
+    'Line20d_TotExpOffsets_Tot\tLine21_OtherReceipts_Tot\t' \
+    'Line22_TotReceipts_Tot\tLine23_OpExpends_Tot\t' \
+    'Line24_TransToOtherComms_Tot\tLine25_FundraisingDisbursed_Tot\t' \
+    'Line26_ExemptLegalAcctgDisb_Tot\tLine27a_CandRepymts_Tot\t' \
+    'Line27b_OtherRepymts_Tot\tLine27c_TotLoanRepymts_Tot\t' \
+    'Line28a_IndivRefunds_Tot\tLine28b_PolPartyCommRefunds_Tot\t' \
+    'Line28c_OtherPolCommRefunds_Tot\t' \
+    'Line28d_TotalContRefunds_Tot\tLine29_OtherDisb_Tot\t' \
+    'Line30_TotDisb_Tot\tAllocAlabama_Tot\tAllocAlaska_Tot\t' \
+    'AllocArizona_Tot\tAllocArkansas_Tot\tAllocCalifornia_Tot\t' \
+    'AllocColorado_Tot\tAllocConnecticut_Tot\tAllocDelaware_Tot\t' \
+    'AllocDistCol_Tot\tAllocFlorida_Tot\tAllocGeorgia_Tot\t' \
+    'AllocHawaii_Tot\tAllocIdaho_Tot\tAllocIllinois_Tot\t' \
+    'AllocIndiana_Tot\tAllocIowa_Tot\tAllocKansas_Tot\t' \
+    'AllocKentucky_Tot\tAllocLouisiana_Tot\tAllocMaine_Tot\t' \
+    'AllocMaryland_Tot\tAllocMassachusetts_Tot\t' \
+    'AllocMichigan_Tot\tAllocMinnesota_Tot\tAllocMississippi_Tot\t' \
+    'AllocMissouri_Tot\tAllocMontana_Tot\tAllocNebraska_Tot\t' \
+    'AllocNevada_Tot\tAllocNewHampshire_Tot\tAllocNewJersey_Tot\t' \
+    'AllocNewMexico_Tot\tAllocNewYork_Tot\tAllocNorthCarolina_Tot\t' \
+    'AllocNorthDakota_Tot\tAllocOhio_Tot\tAllocOklahoma_Tot\t' \
+    'AllocOregon_Tot\tAllocPennsylvania_Tot\tAllocRhodeIsland_Tot\t' \
+    'AllocSouthCarolina_Tot\tAllocSouthDakota_Tot\t' \
+    'AllocTennessee_Tot\tAllocTexas_Tot\tAllocUtah_Tot\t' \
+    'AllocVermont_Tot\tAllocVirginia_Tot\tAllocWashington_Tot\t' \
+    'AllocWestVirginia_Tot\tAllocWisconsin_Tot\tAllocWyoming_Tot\t' \
+    'AllocPuertoRico_Tot\tAllocGuam_Tot\tAllocVirginIslands_Tot\t' \
+    'AllocStatesTotal_Tot\n'
+formf3xheaderstring = 'ImageID\tFormType\tCommID\t' \
+    'CommName\tAddressChange\tCommAddress1\tCommAddress2\t' \
+    'CommCity\tCommState\tCommZip\tReptCode\tElecCode\t' \
+    'strElecDate\tElecState\tstrFromDate\tstrToDate\t' \
+    'flgQualifiedComm\tTreasLastName\tTreasFirstName\t' \
+    'TreasMidName\tTreasPrefix\tTreasSuffix\tstrDateSigned\t' \
+    'Line6b_CashBegin_Prd\tLine6c_TotalRects_Prd\t' \
+    'Line6d_CashBeginSubtotal_Prd\tLine7_TotDisbmts_Prd\t' \
+    'Line8_CashOnHandAtClose_Prd\tLine9_DebtsTo_Prd\t' \
+    'Line10_DebtsBy_Prd\tLine11a1_Itemized_Prd\t' \
+    'Line11a2_Unitemized_Prd\tLine11a3_Total_Prd\t' \
+    'Line11b_PolPtyComms_Prd\tLine11c_OtherPACs_Prd\t' \
+    'Line11d_TotalContribs_Prd\tLine12_TransfersFrom_Prd\t' \
+    'Line13_AllLoansRcvd_Prd\tLine14_LoanRepymtsRecv_Prd\t' \
+    'Line15_OffsetsToOpExps_Refunds_Prd\t' \
+    'Line16_RefundsOfFedContribs_Prd\t' \
+    'Line17_OtherFedRects_Divds_Prd\t' \
+    'Line18a_TransfersFromNonFedAcct_H3_Prd\t' \
+    'Line18b_TransfersFromNonFed_LevinH5_Prd\t' \
+    'Line18c_TotalNonFedTransfers_Prd\t' \
+    'Line19_TotalReceipts_Prd\tLine20_TotalFedReceipts_Prd\t' \
+    'Line21a1_FedShare_Prd\tLine21a2_NonFedShare_Prd\t' \
+    'Line21b_OtherFedOpExps_Prd\tLine21c_TotOpExps_Prd\t' \
+    'Line22_TransToOtherComms_Prd\t' \
+    'Line23_ContribsToFedCandsOrComms_Prd\t' \
+    'Line24_IndptExps_Prd\tLine25_CoordtdExpByPrtyComms_Prd\t' \
+    'Line26_LoanRepayments_Prd\tLine27_LoansMade_Prd\t' \
+    'Line28a_IndivRefunds_Prd\t' \
+    'Line28b_PolPartyCommRefunds_Prd\t' \
+    'Line28c_OtherPolCommRefunds_Prd\t' \
+    'Line28d_TotalContRefunds_Prd\tLine29_OtherDisb_Prd\t' \
+    'Line30a1_SharedFedActH6FedShare_Prd\t' \
+    'Line30a2_SharedFedActH6NonFed_Prd\t' \
+    'Line30b_NonAlloc100PctFedElecActivity_Prd\t' \
+    'Line30c_TotFedElecActivity_Prd\tLine31_TotDisbmts_Prd\t' \
+    'Line32_TotFedDisbmts_Prd\tLine33_TotContribs_Prd\t' \
+    'Line34_TotContribRefunds_Prd\tLine35_NetContribs_Prd\t' \
+    'Line36_TotFedOpExps_Prd\tLine37_OffsetsToOpExps_Prd\t' \
+    'Line38_NetOpExps_Prd\tLine6b_CashBegin_Tot\tLine6b_Year\t' \
+    'Line6c_TotalRects_Tot\tLine6d_CashBeginSubtotal_Tot\t' \
+    'Line7_TotDisbmts_Tot\tLine8_CashOnHandAtClose_Tot\t' \
+    'Line11a1_Itemized_Tot\tLine11a2_Unitemized_Tot\t' \
+    'Line11a3_Total_Tot\tLine11b_PolPtyComms_Tot\t' \
+    'Line11c_OtherPACs_Tot\tLine11d_TotalContribs_Tot\t' \
+    'Line12_TransfersFrom_Tot\tLine13_AllLoansRcvd_Tot\t' \
+    'Line14_LoanRepymtsRecv_Tot\t' \
+    'Line15_OffsetsToOpExps_Refunds_Tot\t' \
+    'Line16_RefundsOfFedContribs_Tot\t' \
+    'Line17_OtherFedRects_Divds_Tot\t' \
+    'Line18a_TransfersFromNonFedAcct_H3_Tot\t' \
+    'Line18b_TransfersFromNonFed_LevinH5_Tot\t' \
+    'Line18c_TotalNonFedTransfers_Tot\t' \
+    'Line19_TotalReceipts_Tot\tLine20_TotalFedReceipts_Tot\t' \
+    'Line21a1_FedShare_Tot\tLine21a2_NonFedShare_Tot\t' \
+    'Line21b_OtherFedOpExps_Tot\tLine21c_TotOpExps_Tot\t' \
+    'Line22_TransToOtherComms_Tot\t' \
+    'Line23_ContribsToFedCandsOrComms_Tot\t' \
+    'Line24_IndptExps_Tot\tLine25_CoordtdExpByPrtyComms_Tot\t' \
+    'Line26_LoanRepayments_Tot\tLine27_LoansMade_Tot\t' \
+    'Line28a_IndivRefunds_Tot\t' \
+    'Line28b_PolPartyCommRefunds_Tot\t' \
+    'Line28c_OtherPolCommRefunds_Tot\t' \
+    'Line28d_TotalContRefunds_Tot\tLine29_OtherDisb_Tot\t' \
+    'Line30a1_SharedFedActH6FedShare_Tot\t' \
+    'Line30a2_SharedFedActH6NonFed_Tot\t' \
+    'Line30b_NonAlloc100PctFedElecActivity_Tot\t' \
+    'Line30c_TotFedElecActivity_Tot\tLine31_TotDisbmts_Tot\t' \
+    'Line32_TotFedDisbmts_Tot\tLine33_TotContribs_Tot\t' \
+    'Line34_TotContribRefunds_Tot\tLine35_NetContribs_Tot\t' \
+    'Line36_TotFedOpExps_Tot\tLine37_OffsetsToOpExps_Tot\t' \
+    'Line38_NetOpExps_Tot\n'
+
+
+# Schedule registry
+# Prefixes are listed in the order they are tested against a record
+# type. Each entry holds the output file prefix, the database table the
+# rows belong in (see FECScraper.sql) and column headers.
+prefixes = ('SA', 'SB', 'SC/', 'SC1/', 'SC2/', 'SD', 'SE', 'TEXT')
+
+schedules = {}
+for prefix, filename, table, headerstring in (
+        ('SA', 'ScheduleAImport_', 'Contribs_SchedA', scheduleaheaderstring),
+        ('SB', 'ScheduleBImport_', 'Contribs_SchedB', schedulebheaderstring),
+        ('SC/', 'ScheduleCImport_', 'Contribs_SchedC', schedulecheaderstring),
+        ('SC1/', 'ScheduleC1Import_', 'Contribs_SchedC1', schedulec1headerstring),
+        ('SC2/', 'ScheduleC2Import_', 'Contribs_SchedC2', schedulec2headerstring),
+        ('SD', 'ScheduleDImport_', 'Contribs_SchedD', scheduledheaderstring),
+        ('SE', 'ScheduleEImport_', 'Contribs_SchedE', scheduleeheaderstring),
+        ('TEXT', 'TextImport_', 'Contribs_Text', textheaderstring)):
+    columns = headerstring.rstrip('\n').split('\t')
+    schedules[prefix] = {'prefix': prefix,
+                         'filename': filename,
+                         'table': table,
+                         'headerstring': headerstring,
+                         'columns': columns,
+                         'width': len(columns)}
+
+# Form registry
+# The second header row of a filing holds the report itself. Each form is
+# registered under the key FEC Parser uses for its header output file,
+# with the form types it accepts, the output file prefix, the database
+# table and the stored procedure that adds the header to it (see
+# FECScraper.sql), column headers and the columns that identify the
+# report, so an amendment can be matched with the filing it replaces
+# (see FECAmendments.py).
+forms = {}
+formtypes = {}
+for key, types, filename, table, procedure, headerstring, datecolumns in (
+        ('F3', ('F3A', 'F3N'), 'FormF3Headers_', 'Contribs_FormF3', 'dbo.usp_AddF3Header',
+         formf3headerstring, ('strCovgFromDate', 'strCovgToDate')),
+        ('F3P', ('F3PA', 'F3PN'), 'FormF3PHeaders_', 'Contribs_FormF3P', 'dbo.usp_AddF3PHeader',
+         formf3pheaderstring, ('strFromDate', 'strToDate')),
+        ('F3X', ('F3XA', 'F3XN'), 'FormF3XHeaders_', 'Contribs_FormF3X', 'dbo.usp_AddF3XHeader',
+         formf3xheaderstring, ('strFromDate', 'strToDate'))):
+    columns = headerstring.rstrip('\n').split('\t')
+    forms[key] = {'key': key,
+                  'formtypes': types,
+                  'filename': filename,
+                  'table': table,
+                  'procedure': procedure,
+                  'headerstring': headerstring,
+                  'columns': columns,
+                  'width': len(columns),
+                  'reportcolumns': ('CommID', 'ReptCode') + datecolumns}
+    for formtype in types:
+        formtypes[formtype] = forms[key]
+
+# Record types seen so far, mapped to their schedule (or None). A filing
+# uses only a handful of distinct record types, so after the first few
+# rows every lookup is a single dictionary hit. The cache is capped so a
+# file full of garbage record types can't grow it without bound.
+rowtypes = {}
+maxrowtypes = 10000
+
+
+def lookup(rowtype):
+    """
+    Return the schedule for a record type such as SA11AI or SC/10, or
+    None if the record type does not belong to any schedule.
+    """
+    try:
+        return rowtypes[rowtype]
+    except KeyError:
+        pass
+
+    schedule = None
+    for prefix in prefixes:
+        if rowtype.startswith(prefix):
+            schedule = schedules[prefix]
+            break
+
+    if len(rowtypes) < maxrowtypes:
+        rowtypes[rowtype] = schedule
+    return schedule
+
+
+def conform(fields, width):
+    """
+    Pad a list of fields with empty fields, or remove empty fields from
+    the end of the list, until it has width fields. The list is changed
+    in place. Returns True if the list now has the correct number of
+    fields and False if data was found in the excess columns.
+    """
+    colct = len(fields)
+    if colct < width:
+        fields.extend([''] * (width - colct))
+    else:
+        while colct > width and fields[-1] == '':
+            fields.pop()
+            colct -= 1
+    return len(fields) == width
@@ -47,18 +47,95 @@ savedir = maindir + 'Import\\'
 reviewdir = maindir + 'Review\\'
 processeddir = maindir + 'Processed\\'
 
+# The manifest records every filing that has been downloaded and where
+# it is now (see FECManifest.py). It is shared with FEC Parser.
+manifestfile = maindir + 'Manifest.db'
+
 # Set this flag to 1 if you want the script to interact with a database.
 # Set it to 0 if the script should run independent of any database.
 # A database is used solely to look for committees and files that
 # previously have been downloaded.
 usedatabaseflag = 1
 
+# Download settings (see FECFetcher.py):
+#  * fecurl: The website to scrape. You can point this at a local web
+# server that serves saved index pages and data files for testing.
+#  * concurrency: Number of pages or files to download at once.
+#  * ratelimit: Maximum number of requests per second to the website.
+# Set to 0 for no limit.
+#  * retries: Number of times to retry a failed request.
+fecurl = 'http://query.nictusa.com'
+concurrency = 4
+ratelimit = 2
+retries = 3
+
+# Set streamparse to 1 to parse each filing with FEC Parser as it is
+# downloaded instead of saving it to savedir for a later parser run.
+# Parsed rows go to a single set of timestamped output files, just as if
+# FEC Parser had been run on the downloaded files. Set archivestreams to
+# 1 to keep a copy of each filing in FEC Parser's processed or review
+# directory, or 0 to keep only the parsed rows.
+streamparse = 0
+archivestreams = 1
+
+# When FEC Parser is watching savedir (its --watch option), set
+# maxwaiting to hold off starting new downloads while this many
+# downloaded files are waiting there to be parsed, so downloading doesn't
+# run far ahead of parsing. Set to 0 for no limit.
+maxwaiting = 0
+
+# Set pagecacheflag to 1 to remember what was found on each committee's
+# index page and ask the website to send the page only if it has changed
+# since the last run (see FECPageCache.py). Set it to 0 to download and
+# search every page in full every time.
+#  * pagecachefile: Where the cache is kept.
+#  * pagecachedays: Download each page in full at least this often.
+#  * pagecachepages: Maximum number of pages to remember.
+pagecacheflag = 1
+pagecachefile = maindir + 'PageCache.db'
+pagecachedays = 30
+pagecachepages = 10000
+
+# Each committee's index page shows the form type, report code and
+# coverage dates of every filing (see FECIndex.py), so filings you don't
+# need can be skipped before they are downloaded:
+#  * skipsuperseded: Set to 1 to skip filings that have been replaced by
+# a later amendment of the same report listed on the same page.
+#  * coveragefrom and coverageto: Skip reports that cover only dates
+# before coveragefrom or after coverageto, given as YYYYMMDD. Leave
+# blank for no limit.
+skipsuperseded = 1
+coveragefrom = ''
+coverageto = ''
+
+# New filings are downloaded in order of priority (see FECScheduler.py):
+# first those by committees listed in commidpriority.txt, then the most
+# recently filed, then the largest. Filings not downloaded in one run
+# are kept in a queue and downloaded in a later run.
+#  * queuefile: Where the queue is kept.
+#  * sizecheck: Set to 1 to ask the website for the size of each queued
+# filing before downloading, so larger filings go first. This takes one
+# extra request per filing.
+#  * budgetmb and budgetminutes: Stop starting downloads once this many
+# megabytes have been downloaded or this many minutes have passed. Set
+# to 0 for no limit.
+queuefile = maindir + 'Queue.db'
+sizecheck = 0
+budgetmb = 0
+budgetminutes = 0
+
 # Import libraries
-import re, urllib, glob, os
+import glob, time
+import FECIndex
+from FECFetcher import Fetcher, FetchError, CountingReader
+from FECManifest import Manifest, DOWNLOADED, PARSED, REVIEW
+from FECPageCache import PageCache
+from FECScheduler import Scheduler
 
 # Create lists to hold committee and file IDs
 commidlist = []
-fileidlist = []
+prioritylist = []
+fileidlist = set()
 
 # Display start message
 print 'Compiling lists of FEC committees and previously downloaded files...'
@@ -79,26 +156,16 @@ if usedatabaseflag == 1:
     # Execute stored procedure and populate list with file IDs
     sql = 'EXEC usp_GetFileIDs'
     for row in cursor.execute(sql):
-        fileidlist += row
+        fileidlist.add(str(row[0]))
 
     # Close database connection
     conn.close()
 
-# Add IDs for files in review directory
-for datafile in glob.glob(os.path.join(reviewdir, '*.fec')):
-    fileidlist.append(datafile.replace(reviewdir, '')[:6])
-
-# Add IDs for files in save directory
-for datafile in glob.glob(os.path.join(savedir, '*.fec')):
-    fileidlist.append(datafile.replace(savedir, '')[:6])
-
-# Add IDs for files in processed directory
-
-for datafile in glob.glob(os.path.join(processeddir, '*.fec')):
-   fileidlist.append(datafile.replace(processeddir, '')[:6])
-
-# Sort the fileid list
-fileidlist.sort()
+# Open the manifest of previously downloaded files. The first time it's
+# used, it is filled in from the files already in the review, save and
+# processed directories. After that, those directories aren't scanned.
+manifest = Manifest(manifestfile)
+manifest.seed([(processeddir, PARSED), (reviewdir, REVIEW), (savedir, DOWNLOADED)])
 
 # If you need to add committee IDs for candidates or PACs for which
 # you've never previously downloaded data, you can do that here like this:
@@ -114,49 +181,183 @@ finally:
     # commidlist.append('C00431171') # Romney for President Inc.
     pass
 
+# Committees listed in commidpriority.txt, one per line like
+# commidappend.txt, have their filings downloaded first
+try:
+    for line in open('commidpriority.txt', 'rb'):
+        if len(line.strip()) == 9 and line.startswith('C'):
+            prioritylist.append(line.strip())
+except IOError:
+    pass
+
 # Begin scrape
 print 'Done!\n'
 print 'Initializing FEC scrape...'
 print 'Fetching data for ' + str(len(commidlist)) + ' committees.\n'
 
-# Set up a list to house all available file IDs
-filing_numbers = []
-
-# Set a regular expression to match six-digit numbers
-regex = re.compile(r'[0-9]{6}')
+# Set up a list to house all available filings and the committees
+# that filed them
+filing_list = []
+
+# Create the download engine
+fetcher = Fetcher(concurrency, ratelimit, retries)
+
+# Open the index page cache
+pagecache = None
+if pagecacheflag == 1:
+    pagecache = PageCache(pagecachefile, pagecachedays, pagecachepages)
+
+# Counts of filings left off the download list, by reason
+skipped = {'superseded': 0, 'coverage': 0}
+
+# Read the filings listed on a page's HTML
+def find_filings(response):
+    return FECIndex.parse_page(response)
+
+# Filing numbers left off the download list
+skippednumbers = set()
+
+# Keep the Form 3 filings that are wanted
+def choose_filings(filings):
+    filings = [filing for filing in filings if filing.form.startswith('F3')]
+    replaced = set()
+    if skipsuperseded == 1:
+        replaced = FECIndex.superseded(filings)
+    chosen = []
+    for filing in filings:
+        if filing.number in replaced:
+            skipped['superseded'] += 1
+            skippednumbers.add(filing.number)
+        elif not FECIndex.in_window(filing, coveragefrom, coverageto):
+            skipped['coverage'] += 1
+            skippednumbers.add(filing.number)
+        else:
+            chosen.append(filing)
+    return chosen
 
 # For each committee id, open the page and read its HTML
-for x in commidlist:
-    print 'Searching files for ' + x + '.'
-    url = "http://query.nictusa.com/cgi-bin/dcdev/forms/" + x + "/"
-    html = urllib.urlopen(url)
-    response = html.read()
-
-    # For each line in the HTML, look for "Form F3" and a six-digit number
-    # and build a list
-    for line in response.splitlines():
-        if re.search("Form F3", line) and re.search(regex, line):
-            filing_numbers += re.findall(regex, line)
-
-filing_numbers.sort()
-
-# Create another list for file IDs to download
-downloadlist = []
-
-# Compile list of file IDs that have not been downloaded previously
-for x in filing_numbers:
-    if fileidlist.count(x) == 0:
-        downloadlist.append(x)
+def search_committee(commid):
+    print 'Searching files for ' + commid + '.'
+    url = fecurl + "/cgi-bin/dcdev/forms/" + commid + "/"
+    try:
+        if pagecache is not None:
+            status, filings = pagecache.fetch(fetcher, url, find_filings)
+        else:
+            status, headers, response = fetcher.get(url)
+            filings = None
+            if status == 200:
+                filings = find_filings(response)
+    except FetchError, e:
+        print 'Could not search files for ' + commid + ': ' + str(e)
+        return []
+    if filings is None:
+        print 'Could not search files for ' + commid + ': HTTP ' + str(status)
+        return []
+    return filings
+
+for commid, filings in zip(commidlist, fetcher.map(search_committee, commidlist)):
+    for filing in choose_filings(filings):
+        filing_list.append((filing.number, commid, filing.filed))
+
+if pagecache is not None:
+    print '\n' + pagecache.report()
+    pagecache.close()
+
+if skipped['superseded'] or skipped['coverage']:
+    print '\nSkipped ' + str(skipped['superseded']) + ' superseded filings and ' + \
+          str(skipped['coverage']) + ' filings outside the coverage dates.'
+
+# Queue the filings that have not been downloaded previously, along with
+# any left in the queue by earlier runs. A filing can be listed more than
+# once, but it is queued only once.
+scheduler = Scheduler(queuefile, budgetmb * 1048576, budgetminutes * 60, prioritylist)
+scheduler.add_many([x for x in filing_list if x[0] not in fileidlist and x[0] not in manifest])
+scheduler.remove([x for x in scheduler.order() if x in skippednumbers or x in fileidlist or x in manifest])
+
+# Ask the website how big each filing is
+def check_size(fileid):
+    url2 = fecurl + "/dcdev/posted/" + fileid + ".fec"
+    try:
+        response = fetcher.open(url2, 'HEAD')
+        response.read()
+    except FetchError:
+        return
+    if response.status == 200 and response.getheader('content-length'):
+        scheduler.set_size(fileid, int(response.getheader('content-length')))
+
+if sizecheck == 1:
+    fetcher.map(check_size, scheduler.unsized())
+
+# Create another list for file IDs to download, in priority order
+downloadlist = scheduler.order()
 
 # File search completed
 print '\nFile search completed. Beginning download...\n'
 
-# For each retrieved filing number, download and save the files.
-for y in downloadlist:
-    filename = y + ".fec"
+# When parsing as files download, FEC Parser records each filing in the
+# manifest itself.
+if streamparse == 1:
+    import FECParser
+    streamer = FECParser.StreamParser(archivestreams == 1)
+
+# Wait while too many downloaded files are waiting for FEC Parser
+def wait_for_parser():
+    while len(glob.glob(savedir + '*.fec')) >= maxwaiting:
+        time.sleep(1)
+
+# For each retrieved filing number, download and save the files. Returns
+# None if the download budget has been used up.
+def download(fileid):
+    if maxwaiting and streamparse != 1:
+        wait_for_parser()
+    if not scheduler.start(fileid):
+        return None
+    filename = fileid + ".fec"
     print 'Downloading ' + filename + '.'
-    url2 = "http://query.nictusa.com/dcdev/posted/" + filename
-    urllib.urlretrieve(url2, savedir + filename)
+    url2 = fecurl + "/dcdev/posted/" + filename
+    if streamparse == 1:
+        size = download_and_parse(filename, url2)
+    else:
+        try:
+            size = fetcher.retrieve(url2, savedir + filename)
+        except FetchError, e:
+            print 'Could not download ' + filename + ': ' + str(e)
+            size = None
+        else:
+            manifest.update(fileid, DOWNLOADED, savedir + filename)
+    scheduler.finish(fileid, size)
+    return size is not None
+
+# Parse a filing as it downloads. A file that fails part way through is
+# left out of the output and tried again next time. Returns the number
+# of bytes read, or None if the download failed.
+def download_and_parse(filename, url2):
+    try:
+        response = fetcher.open(url2)
+        if response.status != 200:
+            response.read()
+            raise FetchError(url2 + ': HTTP ' + str(response.status))
+        reader = CountingReader(response)
+        streamer.parse(reader, filename)
+    except Exception, e:
+        print 'Could not download ' + filename + ': ' + (str(e) or e.__class__.__name__)
+        fetcher.abandon(url2)
+        return None
+    return reader.size
+
+results = fetcher.map(download, downloadlist)
+if results.count(False):
+    print str(results.count(False)) + ' files could not be downloaded. ' \
+          'They will be tried again the next time you run this script.'
+if results.count(None):
+    print str(results.count(None)) + ' files were put off by the download budget. ' \
+          'They will be downloaded the next time you run this script.'
+print scheduler.report()
+
+if streamparse == 1:
+    streamer.close()
+scheduler.close()
+manifest.close()
 
 # Display completion message
 print 'File download complete!'
@@ -12,12 +12,12 @@ SQL Server 2000 and 2005. You can use the schema to create similar objects for o
 database managers.
 
 Once you create a database (Step 1), you should be able to run the rest of this file as a batch to
-create all the tables, stored procedures and triggers at once.
+create all the tables, indexes and stored procedures at once.
 
 Please note:
-None of the tables in this batch is indexed. If you decide to use these tables as the final
-resting place for your data rather than as repositories, you probably should create indexes
-and keys.
+Only the header tables are indexed, so amended reports can be found quickly (see Step 5). If you
+decide to use these tables as the final resting place for your data rather than as repositories,
+you probably should create indexes and keys on the child tables, too.
 
 The tables house all fields contained in the FEC data and add two fields:
  * ImageID is the six digit ID number assigned by the FEC for a particular data file. So, for
@@ -26,9 +26,9 @@ will be housed in the ImageID field in this table.
  * Active is a bit field to indicate whether the file is the current file. The default value is 1.
 If a report is amended, this field will be set to 0 for all amended reports.
 
-Database triggers (scripted below) control the Active field for you. If you use a different database
-manager, you'll have to come up with logic to handle this field, set it manually or delete data that
-has been amended.
+A stored procedure (scripted below), which FEC Parser runs at the end of each batch, controls the
+Active field for you. If you use a different database manager, you can use the supersede map FEC
+Parser writes to the output directory to set this field, or delete data that has been amended.
 
 */
 
@@ -879,80 +879,96 @@ SET ANSI_PADDING OFF
 GO
 
 
--- Step 5: Create triggers
--- Triggers are used to track when a report is amended. The active field is set to 1 for the current
--- report and 0 for amended reports.
-CREATE TRIGGER [dbo].[UpdateF3Active] ON [dbo].[Contribs_FormF3]
-AFTER INSERT
+-- Step 5: Create indexes and the amendment procedure
+-- When a report is amended, the Active field is set to 1 for the current report and 0 for amended
+-- reports. A report is amended when the same committee files another report with the same report
+-- code and coverage dates and a higher ImageID.
+-- Earlier versions of this file did this with triggers that joined each header table to itself
+-- after every insert. If you created your database with one of those versions, this drops them.
+IF OBJECT_ID('dbo.UpdateF3Active', 'TR') IS NOT NULL
+	DROP TRIGGER [dbo].[UpdateF3Active];
+IF OBJECT_ID('dbo.UpdateF3PActive', 'TR') IS NOT NULL
+	DROP TRIGGER [dbo].[UpdateF3PActive];
+IF OBJECT_ID('dbo.UpdateF3XActive', 'TR') IS NOT NULL
+	DROP TRIGGER [dbo].[UpdateF3XActive];
+GO
 
-AS
+-- These indexes let the stored procedures below find a filing by its ImageID and find the other
+-- filings of the same report without reading the whole table.
+CREATE NONCLUSTERED INDEX [IX_Contribs_FormF3_ImageID] ON [dbo].[Contribs_FormF3] ([ImageID])
+GO
 
-BEGIN
-	SET NOCOUNT ON;
-
-	UPDATE a
-	SET a.Active = 0
-	FROM Contribs_FormF3 a
-	INNER JOIN Contribs_FormF3 b
-		ON a.CommID = b.CommID
-			AND a.ImageID < b.ImageID
-			AND a.Active = 1
-			AND b.Active = 1
-			AND a.ReptCode = b.ReptCode
-			AND a.strCovgFromDate = b.strCovgFromDate
-			AND a.strCovgToDate = b.strCovgToDate;
-
-END
+CREATE NONCLUSTERED INDEX [IX_Contribs_FormF3_Report] ON [dbo].[Contribs_FormF3]
+	([CommID], [ReptCode], [strCovgFromDate], [strCovgToDate], [ImageID])
 GO
 
+CREATE NONCLUSTERED INDEX [IX_Contribs_FormF3P_ImageID] ON [dbo].[Contribs_FormF3P] ([ImageID])
+GO
 
+CREATE NONCLUSTERED INDEX [IX_Contribs_FormF3P_Report] ON [dbo].[Contribs_FormF3P]
+	([CommID], [ReptCode], [strFromDate], [strToDate], [ImageID])
+GO
 
-CREATE TRIGGER [dbo].[UpdateF3PActive] ON [dbo].[Contribs_FormF3P]
-AFTER INSERT
+CREATE NONCLUSTERED INDEX [IX_Contribs_FormF3X_ImageID] ON [dbo].[Contribs_FormF3X] ([ImageID])
+GO
 
-AS
+CREATE NONCLUSTERED INDEX [IX_Contribs_FormF3X_Report] ON [dbo].[Contribs_FormF3X]
+	([CommID], [ReptCode], [strFromDate], [strToDate], [ImageID])
+GO
 
-BEGIN
-	SET NOCOUNT ON;
-
-	UPDATE a
-	SET a.Active = 0
-	FROM Contribs_FormF3P a
-	INNER JOIN Contribs_FormF3P b
-		ON a.CommID = b.CommID
-			AND a.ImageID < b.ImageID
-			AND a.Active = 1
-			AND b.Active = 1
-			AND a.ReptCode = b.ReptCode
-			AND a.strFromDate = b.strFromDate
-			AND a.strToDate = b.strToDate;
-
-END
+SET ANSI_NULLS ON
 GO
 
+SET QUOTED_IDENTIFIER ON
+GO
 
+-- This stored procedure sets the Active field to 0 for a filing that has been superseded by an
+-- amendment. FEC Parser works out which filings each amendment supersedes as it parses the headers
+-- (see FECAmendments.py) and calls it once for each (ImageID, SupersededBy) pair in a run's
+-- supersede map after the run's headers have been added, so only those filings are looked up, by
+-- ImageID. A filing is left active until the amendment that supersedes it is in the database.
+-- Earlier versions of this procedure took no parameters and compared every active filing with
+-- the rest of its table. If you created your database with one of those versions, this drops it.
+IF OBJECT_ID('dbo.usp_UpdateActive', 'P') IS NOT NULL
+	DROP PROC [dbo].[usp_UpdateActive];
+GO
 
-CREATE TRIGGER [dbo].[UpdateF3XActive] ON [dbo].[Contribs_FormF3X]
-AFTER INSERT
+CREATE PROC [dbo].[usp_UpdateActive] (@ImageID varchar (9), @SupersededBy varchar (9))
 
 AS
 
-BEGIN
-	SET NOCOUNT ON;
-
-	UPDATE a
-	SET a.Active = 0
-	FROM Contribs_FormF3X a
-	INNER JOIN Contribs_FormF3X b
-		ON a.CommID = b.CommID
-			AND a.ImageID < b.ImageID
-			AND a.Active = 1
-			AND b.Active = 1
-			AND a.ReptCode = b.ReptCode
-			AND a.strFromDate = b.strFromDate
-			AND a.strToDate = b.strToDate;
-
-END
+SET NOCOUNT ON
+
+UPDATE Contribs_FormF3
+SET Active = 0
+WHERE ImageID = @ImageID
+	AND Active = 1
+	AND EXISTS
+		(SELECT ImageID
+		FROM Contribs_FormF3
+		WHERE ImageID = @SupersededBy);
+
+UPDATE Contribs_FormF3P
+SET Active = 0
+WHERE ImageID = @ImageID
+	AND Active = 1
+	AND EXISTS
+		(SELECT ImageID
+		FROM Contribs_FormF3P
+		WHERE ImageID = @SupersededBy);
+
+UPDATE Contribs_FormF3X
+SET Active = 0
+WHERE ImageID = @ImageID
+	AND Active = 1
+	AND EXISTS
+		(SELECT ImageID
+		FROM Contribs_FormF3X
+		WHERE ImageID = @SupersededBy);
+
+RETURN 0;
+
+SET NOCOUNT OFF
 GO
 
 
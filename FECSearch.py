@@ -0,0 +1,354 @@
+# FEC Search
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module keeps a search index of the contributors, payees and
+committees named in Schedule A, B and E rows, so every contribution from
+a donor can be found without reading through the schedule output files
+or scanning Contribs_SchedA. FEC Parser adds each filing to the index as
+it is parsed when the searchflag user variable is set to 1.
+
+Each row is indexed under up to five keys, each pointing back to the
+row's ImageID, table and TransID:
+ * name: The contributor's or payee's last and first names, such as
+SMITH JOHN, and the organization name, if there is one.
+ * zip: The first five digits of the ZIP code.
+ * employer: The contributor's employer (Schedule A only).
+ * committee: The ID of the committee that filed the row.
+Names and employers are stored in capitals, with apostrophes and periods
+removed and any other punctuation treated as a space, so O'Brien, Obrien
+and OBRIEN all match. Search terms are cleaned up the same way.
+
+The index is a small SQLite database, Search.db in the main directory,
+with its keys kept in sorted order, so an exact or prefix lookup reads
+only the keys that match no matter how many filings have been indexed.
+Each filing's keys are sorted and added in a single transaction when the
+filing is finished, which merges them into the index without touching
+the keys of other filings. Finishing the same filing again, such as when
+a batch run is resumed, replaces its keys. If amendmentsfile is given,
+the keys of filings superseded by an amendment (see FECAmendments.py)
+are dropped, so each row is found once. For that reason the index needs
+every row of each filing and can't be built in delta mode (see
+FECDelta.py).
+
+To find rows, give one or more terms; a row must match all of them. With
+--prefix, each term matches any key that starts with it:
+    python FECSearch.py --name "smith john" --zip 20001
+    python FECSearch.py --name smith --employer acme --prefix
+    python FECSearch.py --committee C00431445 --zip 606 --prefix
+Matches are printed with the columns ImageID, Table and TransID. Run it
+with no terms to see how big the index is, or with --clear to empty it.
+"""
+
+# Import needed libraries
+import string, sqlite3, threading
+from FECSchedules import schedules
+from FECManifest import fileid_from_name
+
+# Column headers for search results
+searchheaderstring = 'ImageID\tTable\tTransID\n'
+
+# Keys indexed for each schedule, as (key, columns) pairs. The values of
+# the columns are joined with spaces to make the key.
+searchcolumns = {
+    'SA': (('name', ('ContLastName', 'ContFirstName')),
+           ('name', ('ContOrgName',)),
+           ('zip', ('ContZip',)),
+           ('employer', ('ContEmployer',)),
+           ('committee', ('CommID',))),
+    'SB': (('name', ('PayeeLastName', 'PayeeFirstName')),
+           ('name', ('PayeeOrgName',)),
+           ('zip', ('PayeeZip',)),
+           ('committee', ('FilerCommID',))),
+    'SE': (('name', ('PayeeLastName', 'PayeeFirstName')),
+           ('name', ('PayeeOrgName',)),
+           ('zip', ('PayeeZip',)),
+           ('committee', ('FilerCommID',)))}
+
+# Keys that can be searched
+searchfields = ('name', 'zip', 'employer', 'committee')
+
+# Translation table to capitalize letters and change everything but
+# letters and digits to spaces. Apostrophes and periods are deleted
+# instead.
+keeps = string.ascii_letters + string.digits
+keytable = ''.join([chr(i) in keeps and chr(i).upper() or ' ' for i in xrange(256)])
+keydeletes = "'."
+
+
+def search_key(field, value):
+    """
+    Clean up a value for the index, or a search term, and return it. An
+    empty string means there is nothing to index.
+    """
+    value = ' '.join(value.translate(keytable, keydeletes).split())
+    if field == 'zip':
+        value = value.replace(' ', '')[:5]
+        if not value.isdigit():
+            return ''
+    return value
+
+
+def next_key(key):
+    """
+    Return the first key that sorts after every key starting with key.
+    Keys only hold capitals, digits and spaces.
+    """
+    return key[:-1] + chr(ord(key[-1]) + 1)
+
+
+class SearchIndex(object):
+    """
+    Adds the rows FEC Parser writes to the search index. It takes rows
+    the same way FECLoader.Loader does: feed() them as they are written
+    and finish() each filing.
+    """
+
+    def __init__(self, path, amendmentsfile=None):
+        self.path = path
+
+        # Position of the TransID and key columns for each schedule
+        self.columns = {}
+        for prefix in searchcolumns:
+            names = schedules[prefix]['columns']
+            self.columns[prefix] = (names.index('TransID'),
+                                    [(field, [names.index(column) for column in columns])
+                                     for field, columns in searchcolumns[prefix]])
+
+        self.resolver = None
+        if amendmentsfile is not None:
+            from FECAmendments import Resolver
+            self.resolver = Resolver(amendmentsfile)
+
+        # One connection is shared behind a lock, as in FECRollups.py.
+        # TransIDs are stored as the bytes they were parsed from, which
+        # aren't always ASCII.
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.text_factory = str
+        self.conn.execute('CREATE TABLE IF NOT EXISTS filings ('
+                          'imageid INTEGER PRIMARY KEY, '
+                          'rowcount INTEGER NOT NULL, '
+                          'firstentry INTEGER NOT NULL, '
+                          'lastentry INTEGER NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                          'field TEXT NOT NULL, '
+                          'key TEXT NOT NULL, '
+                          'imageid INTEGER NOT NULL, '
+                          'kind TEXT NOT NULL, '
+                          'transid TEXT NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS lookup ON entries (field, key)')
+        self.conn.commit()
+
+        # Keys for the current filing, the keys already worked out for
+        # the values seen in it, and any partial line at the end of the
+        # data passed to feed() for each schedule
+        self.entries = []
+        self.filingrows = 0
+        self.keys = {}
+        self.partial = {}
+
+        # Totals for report()
+        self.filings = 0
+        self.rows = 0
+
+    def feed(self, prefix, data):
+        """
+        Add tab-delimited output rows for a schedule. data can hold any
+        number of rows, and a row can be split across calls.
+        """
+        if prefix not in self.columns:
+            return
+        lines = (self.partial.pop(prefix, '') + data).split('\n')
+        tail = lines.pop()
+        if tail:
+            self.partial[prefix] = tail
+        transidcolumn, keycolumns = self.columns[prefix]
+        entries = self.entries
+        keys = self.keys
+        for line in lines:
+            fields = line.split('\t')
+            if len(fields) <= transidcolumn:
+                continue
+            self.filingrows += 1
+            transid = fields[transidcolumn]
+            rowkeys = []
+            for field, columns in keycolumns:
+                # The same names, ZIP codes and employers turn up again
+                # and again in a filing, so each is cleaned up only once
+                value = (field, ' '.join([fields[i] for i in columns if i < len(fields)]))
+                key = keys.get(value)
+                if key is None:
+                    key = keys[value] = search_key(*value)
+                # A name can turn up as both the person's and the
+                # organization's, but the row is indexed under it once
+                if key and (field, key) not in rowkeys:
+                    rowkeys.append((field, key))
+                    entries.append((field, key, prefix, transid))
+
+    def finish(self, filename):
+        """
+        Add a filing's keys to the index. Returns True if the filing was
+        indexed.
+        """
+        for prefix in list(self.partial):
+            self.feed(prefix, '\n')
+        entries = self.entries
+        filingrows = self.filingrows
+        self.entries = []
+        self.filingrows = 0
+        self.keys = {}
+        fileid = fileid_from_name(filename)
+        if fileid is None:
+            return False
+        imageid = int(fileid)
+
+        # Filings this one supersedes are dropped, and it is left out if
+        # it has been superseded itself
+        dropped = [imageid]
+        if self.resolver is not None:
+            dropped.extend(self.resolver.superseded(imageid))
+            if self.resolver.active(imageid) is False:
+                entries = []
+                filingrows = 0
+
+        # Adding the keys in order keeps the writes to the index together.
+        # A filing's keys are added in one go, so they take up a single
+        # range of row IDs, which is recorded to find them again rather
+        # than indexing the entries on ImageID too.
+        entries.sort()
+        self.lock.acquire()
+        try:
+            try:
+                for old in dropped:
+                    row = self.conn.execute('SELECT firstentry, lastentry FROM filings WHERE imageid = ?',
+                                            (old,)).fetchone()
+                    if row is not None:
+                        self.conn.execute('DELETE FROM entries WHERE rowid BETWEEN ? AND ?', row)
+                        self.conn.execute('DELETE FROM filings WHERE imageid = ?', (old,))
+                if entries:
+                    self.conn.executemany('INSERT INTO entries (field, key, imageid, kind, transid) '
+                                          'VALUES (?, ?, ?, ?, ?)',
+                                          [(field, key, imageid, kind, transid)
+                                           for field, key, kind, transid in entries])
+                    last = self.conn.execute('SELECT MAX(rowid) FROM entries').fetchone()[0]
+                    self.conn.execute('INSERT INTO filings (imageid, rowcount, firstentry, lastentry) '
+                                      'VALUES (?, ?, ?, ?)', (imageid, filingrows, last - len(entries) + 1, last))
+                self.conn.commit()
+            except:
+                self.conn.rollback()
+                raise
+        finally:
+            self.lock.release()
+        self.filings += 1
+        self.rows += filingrows
+        return True
+
+    def rollback(self):
+        """
+        Throw away the current filing's rows.
+        """
+        self.entries = []
+        self.filingrows = 0
+        self.partial = {}
+
+    def search(self, terms, prefix=False):
+        """
+        Return a sorted list of (imageid, table, transid) tuples for the
+        rows that match every term. terms is a list of (field, value)
+        pairs, and with prefix set, a term matches any key that starts
+        with its value.
+        """
+        queries = []
+        parameters = []
+        for field, value in terms:
+            if field not in searchfields:
+                raise ValueError('Unknown search field: ' + str(field))
+            key = search_key(field, value)
+            if not key:
+                return []
+            if prefix:
+                queries.append('SELECT DISTINCT imageid, kind, transid FROM entries '
+                               'WHERE field = ? AND key >= ? AND key < ?')
+                parameters.extend((field, key, next_key(key)))
+            else:
+                queries.append('SELECT DISTINCT imageid, kind, transid FROM entries WHERE field = ? AND key = ?')
+                parameters.extend((field, key))
+        if not queries:
+            return []
+        self.lock.acquire()
+        try:
+            rows = self.conn.execute(' INTERSECT '.join(queries) + ' ORDER BY 1, 2, 3', parameters).fetchall()
+        finally:
+            self.lock.release()
+        return [(imageid, schedules[kind]['table'], transid) for imageid, kind, transid in rows]
+
+    def report(self):
+        """
+        Return a one-line summary of what has been indexed.
+        """
+        return 'Indexed ' + str(self.rows) + ' rows from ' + str(self.filings) + ' filings into ' + \
+               self.path + '.'
+
+    def size(self):
+        """
+        Return the number of filings, rows and keys in the index.
+        """
+        self.lock.acquire()
+        try:
+            filings, rows = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(rowcount), 0) FROM filings').fetchone()
+            keys = self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        finally:
+            self.lock.release()
+        return filings, rows, keys
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute('DELETE FROM entries')
+            self.conn.execute('DELETE FROM filings')
+            self.conn.commit()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.conn.close()
+        if self.resolver is not None:
+            self.resolver.close()
+
+
+if __name__ == '__main__':
+    import argparse, time
+
+    # Use the same settings as FEC Parser
+    try:
+        exec(open('usersettings.py').read())
+    except:
+        maindir = 'C:\\data\\Python\\FEC\\'
+    searchfile = maindir + 'Search.db'
+
+    parser = argparse.ArgumentParser(description='Find schedule rows in the search index FEC Parser has built.')
+    for field in searchfields:
+        parser.add_argument('--' + field, help='find rows with this ' + field)
+    parser.add_argument('--prefix', action='store_true', help='match keys that start with each term')
+    parser.add_argument('--clear', action='store_true', help='empty the search index')
+    args = parser.parse_args()
+
+    index = SearchIndex(searchfile)
+    terms = [(field, getattr(args, field)) for field in searchfields if getattr(args, field) is not None]
+    if args.clear:
+        index.clear()
+        print 'Cleared the search index.'
+    elif terms:
+        start = time.time()
+        rows = index.search(terms, args.prefix)
+        elapsed = time.time() - start
+        print searchheaderstring,
+        for imageid, table, transid in rows:
+            print str(imageid) + '\t' + table + '\t' + transid
+        print 'Found ' + str(len(rows)) + ' rows in %.0f ms.' % (elapsed * 1000)
+    else:
+        filings, rows, keys = index.size()
+        print 'Indexed filings: ' + str(filings) + '; rows: ' + str(rows) + '; keys: ' + str(keys) + '.'
+    index.close()
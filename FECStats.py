@@ -0,0 +1,251 @@
+# FEC Stats
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module records where FEC Parser spends its time and what it does
+with each filing. FEC Parser uses it when the statsflag user variable
+is set to 1 or the --stats option is given.
+
+For each filing, it records:
+ * Whether the filing was parsed, sent to review or failed.
+ * The size of the data file and the time taken to parse it.
+ * The number of rows written to each schedule and to the review file.
+ * The time spent in each stage of parsing:
+    - header: Reading and validating the header rows.
+    - database: The stored procedure call that adds the header to the
+      database, if database integration is enabled.
+    - cleanup: Cleaning up child rows (see FECNormalizer.py).
+    - conform: Finding each row's schedule and padding or trimming it
+      (see FECSchedules.py).
+    - write: Writing rows to the output files.
+    - other: Everything else, mostly reading and splitting rows.
+
+At the end of a run, a summary is printed, and the figures for every
+filing and the run as a whole are saved next to the timestamped output
+files as Stats_<timestamp>.json and Stats_<timestamp>.csv.
+
+A large file that FEC Parser splits among several worker processes is
+recorded as a single filing. Its stage times are added up across the
+workers, so they can come to more than the time taken to parse it.
+
+Timing each stage of every row adds about a tenth to the run time.
+For a closer look at the row loop, FEC Parser's --profile option runs
+it under cProfile instead and saves the results as
+Profile_<timestamp>.prof, which you can explore with Python's pstats
+module. Stages aren't timed while profiling, so the profile shows only
+the parser's own work.
+"""
+
+# Import needed libraries
+import csv, json, time
+from timeit import default_timer
+
+# Stages of parsing a filing, in the order they happen
+stages = ('header', 'database', 'cleanup', 'conform', 'write', 'other')
+
+
+class FilingStats(object):
+    """
+    Figures for a single filing.
+    """
+
+    def __init__(self, filename, timing=True, profiler=None):
+        self.filename = filename
+        self.timing = timing
+        self.profiler = profiler
+        self.result = None
+        self.reviewname = None
+        self.bytes = 0
+        self.rows = {}
+        self.stages = dict.fromkeys(stages, 0.0)
+        self.parts = 0
+        self.start = self.last = default_timer()
+        self.seconds = 0.0
+
+    def lap(self, stage):
+        """
+        Add the time since the last lap, or since the filing was started,
+        to a stage.
+        """
+        if self.timing:
+            now = default_timer()
+            self.stages[stage] += now - self.last
+            self.last = now
+
+    def start_rows(self):
+        """
+        Called when the header has been dealt with and the row loop is
+        about to start. Turns on the profiler, if there is one.
+        """
+        self.lap('header')
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def timed(self, stage, function):
+        """
+        Return a version of function that adds the time it takes to a
+        stage, or function itself if timing is turned off.
+        """
+        if not self.timing:
+            return function
+        times = self.stages
+        clock = default_timer
+
+        def timed_function(*args):
+            start = clock()
+            result = function(*args)
+            times[stage] += clock() - start
+            return result
+        return timed_function
+
+    def merge(self, record):
+        """
+        Add the rows and stage times recorded for part of the filing,
+        such as a range of a large file parsed by a worker process, given
+        as the dictionary returned by record().
+        """
+        self.parts += 1
+        for key, count in record['rows'].items():
+            self.rows[key] = self.rows.get(key, 0) + count
+        if self.timing:
+            for stage, seconds in record['stages'].items():
+                self.stages[stage] += seconds
+
+    def finish(self, result, reviewname=None):
+        """
+        Record how the filing turned out: 'parsed', 'review' or 'error'.
+        """
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.result = result
+        self.reviewname = reviewname
+        self.seconds = default_timer() - self.start
+        if self.timing and not self.parts:
+            self.stages['other'] = max(self.seconds - sum([self.stages[stage] for stage in stages
+                                                           if stage != 'other']), 0.0)
+
+    def record(self):
+        """
+        Return the figures as a dictionary that can be saved as JSON or
+        sent back from a worker process.
+        """
+        return {'filename': self.filename,
+                'result': self.result,
+                'reviewname': self.reviewname,
+                'bytes': self.bytes,
+                'seconds': self.seconds,
+                'rows': dict([(key, count) for key, count in self.rows.items() if count]),
+                'stages': self.timing and self.stages or {}}
+
+
+class Stats(object):
+    """
+    Figures for a run. Use filing() to start recording a filing and
+    add() to add its figures to the run once it's finished.
+    """
+
+    def __init__(self, timing=True, profile=False):
+        self.timing = timing
+        self.profiler = None
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+        self.filings = []
+        self.start = time.time()
+
+    def filing(self, filename):
+        return FilingStats(filename, self.timing, self.profiler)
+
+    def add(self, filing):
+        """
+        Add a finished filing's figures, given as a FilingStats or the
+        dictionary returned by its record() method.
+        """
+        if isinstance(filing, FilingStats):
+            filing = filing.record()
+        self.filings.append(filing)
+
+    def totals(self):
+        """
+        Return the figures for the run as a whole.
+        """
+        totals = {'filings': len(self.filings),
+                  'seconds': time.time() - self.start,
+                  'parsed': 0,
+                  'review': 0,
+                  'error': 0,
+                  'bytes': 0,
+                  'rows': {},
+                  'stages': dict.fromkeys(stages, 0.0)}
+        for filing in self.filings:
+            if filing['result'] in totals:
+                totals[filing['result']] += 1
+            totals['bytes'] += filing['bytes']
+            for key, count in filing['rows'].items():
+                totals['rows'][key] = totals['rows'].get(key, 0) + count
+            for stage, seconds in filing['stages'].items():
+                totals['stages'][stage] += seconds
+        totals['totalrows'] = sum(totals['rows'].values())
+        return totals
+
+    def summary(self):
+        """
+        Return a few lines of text summing up the run.
+        """
+        totals = self.totals()
+        seconds = max(totals['seconds'], 1e-9)
+        lines = ['Parsed %d filings (%d sent to review, %d errors): %d rows, %.1f MB in %.1f seconds '
+                 '(%.0f rows/sec, %.2f MB/sec).' %
+                 (totals['filings'], totals['review'], totals['error'], totals['totalrows'],
+                  totals['bytes'] / 1048576.0, totals['seconds'], totals['totalrows'] / seconds,
+                  totals['bytes'] / 1048576.0 / seconds)]
+        stagetotal = sum(totals['stages'].values())
+        if stagetotal:
+            lines.append('Time by stage: ' + ', '.join(['%s %.1fs (%.0f%%)' % (stage, totals['stages'][stage],
+                                                                               100 * totals['stages'][stage] / stagetotal)
+                                                        for stage in stages]))
+        slowest = sorted(self.filings, key=lambda filing: filing['seconds'], reverse=True)[:5]
+        if slowest:
+            lines.append('Slowest filings: ' + ', '.join(['%s %.2fs' % (filing['filename'], filing['seconds'])
+                                                          for filing in slowest]))
+        return '\n'.join(lines)
+
+    def save(self, prefix):
+        """
+        Save the figures to prefix + '.json' and prefix + '.csv'.
+        """
+        output = open(prefix + '.json', 'w')
+        try:
+            json.dump({'run': self.totals(), 'filings': self.filings}, output, indent=1, sort_keys=True)
+        finally:
+            output.close()
+
+        # One row per filing, with a column for each output and stage
+        keys = set()
+        for filing in self.filings:
+            keys.update(filing['rows'])
+        keys = sorted(keys)
+        output = open(prefix + '.csv', 'wb')
+        try:
+            writer = csv.writer(output)
+            writer.writerow(['filename', 'result', 'reviewname', 'bytes', 'seconds'] +
+                            ['rows_' + key.rstrip('/') for key in keys] +
+                            ['seconds_' + stage for stage in stages])
+            for filing in self.filings:
+                writer.writerow([filing['filename'], filing['result'], filing['reviewname'] or '',
+                                 filing['bytes'], '%.6f' % filing['seconds']] +
+                                [filing['rows'].get(key, 0) for key in keys] +
+                                ['%.6f' % filing['stages'].get(stage, 0) for stage in stages])
+        finally:
+            output.close()
+
+    def save_profile(self, path):
+        """
+        Save the cProfile results and print the busiest functions.
+        """
+        if self.profiler is None:
+            return
+        import pstats
+        self.profiler.dump_stats(path)
+        pstats.Stats(self.profiler).sort_stats('cumulative').print_stats(15)
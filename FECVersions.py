@@ -0,0 +1,130 @@
+# FEC Versions
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module lists the header versions FEC Parser supports and the
+changes needed to make each version's rows line up with the columns FEC
+Parser writes (see FECSchedules.py).
+
+Each version has a list of transforms. A transform names the form it
+applies to ('F3', 'F3P' or 'F3X', or None for all forms), the rows it
+applies to ('header' for the second header row, or a record type prefix
+such as 'SA') and a list of steps:
+ * ('insert', i, value): Insert value so that it becomes field i.
+ * ('move', i, j): Move field i so that it becomes field j.
+Fields are numbered from 0 as they appear in the data file, so field 23
+of a row is number 22. Steps are applied in order, and a row gets the
+steps of the first transform whose prefix it starts with (ignoring case
+and quotation marks, as FEC Parser always has).
+
+When a filing is opened, the transforms for its version and form are
+compiled into a Plan, so each row needs only a quick check of its
+record type rather than a series of version tests. FEC Parser applies
+the steps to a row's fields after it has split and cleaned the row. A
+row that ends before the last field a transform touches is changed
+before it is cleaned instead, because cleaning treats the end of a row
+differently from the fields in the middle.
+
+To support a new header version, add it to versions with its
+transforms. A version whose rows match an existing version's can share
+its list, for example:
+    versions['8.1'] = versions['8.0']
+"""
+
+# Header version transforms
+versions = {
+    '6.4': [
+        # Forms F3PA and F3PN:
+        # 6.4 does not have separate values for line 17a, so we need to
+        # insert blank values for 17a1 and 17a2 and leave the reported
+        # values (period and total) for 17a3.
+        ('F3P', 'header', [('insert', 34, ''), ('insert', 34, ''),
+                           ('insert', 121, ''), ('insert', 121, '')]),
+    ],
+    '7.0': [],
+    '8.0': [
+        # Schedule A: Contribution Purpose Code (field 23) removed
+        (None, 'SA', [('insert', 22, '')]),
+        # Schedule B: Expenditure Purpose Code (field 23) removed
+        (None, 'SB', [('insert', 22, '')]),
+        # Schedule E: Expenditure Purpose Code (field 23) removed
+        (None, 'SE', [('insert', 22, '')]),
+    ],
+}
+
+
+def apply_steps(steps, fields):
+    """
+    Apply a list of steps to a list of fields in place.
+    """
+    for step, i, value in steps:
+        if step == 'insert':
+            fields.insert(i, value)
+        elif step == 'move':
+            if i < len(fields):
+                fields.insert(value, fields.pop(i))
+        else:
+            raise ValueError('Unknown transform step: ' + str(step))
+
+
+def shift_steps(steps, offset):
+    """
+    Return steps with every field number moved up by offset.
+    """
+    shifted = []
+    for step, i, value in steps:
+        if step == 'move':
+            value += offset
+        shifted.append((step, i + offset, value))
+    return shifted
+
+
+def step_reach(steps):
+    """
+    Return the highest field number a list of steps touches.
+    """
+    reach = 0
+    for step, i, value in steps:
+        reach = max(reach, i)
+        if step == 'move':
+            reach = max(reach, value)
+    return reach
+
+
+class Plan(object):
+    """
+    The transforms for one header version and form. offset is the number
+    of fields added to the front of each child row before the plan is
+    applied to its fields; FEC Parser adds the form type and ImageID.
+
+    rowsteps lists a (prefix, steps, shifted steps, reach) tuple for each
+    kind of child row: the record type prefix, the steps numbered as in
+    the data file and numbered from the front of the fields, and the
+    highest field number, as in the data file, that the steps touch.
+    """
+
+    def __init__(self, version, form, offset=0):
+        self.headersteps = []
+        self.rowsteps = []
+        for transformform, rows, steps in versions[version]:
+            if transformform is not None and transformform != form:
+                continue
+            if rows == 'header':
+                self.headersteps.extend(steps)
+            else:
+                self.rowsteps.append((rows.upper(), steps, shift_steps(steps, offset), step_reach(steps)))
+
+    def header(self, fields):
+        apply_steps(self.headersteps, fields)
+
+    def match(self, rowtype):
+        """
+        Return the rowsteps entry for a row, given the start of its
+        record type with quotation marks removed and upper-cased, or
+        None if the row needs no changes.
+        """
+        for entry in self.rowsteps:
+            if rowtype.startswith(entry[0]):
+                return entry
+        return None
@@ -0,0 +1,162 @@
+# FEC Watch
+# Companion module for FEC Parser
+# Developed with Python 2.7.2
+
+"""
+This module watches the import directory for new data files so FEC
+Parser can parse them while FEC Scraper is still downloading. FEC
+Parser uses it when the --watch option is given.
+
+FEC Scraper saves each download under a temporary .part name and
+renames it once it is complete, so a file ending in .fec is always
+whole. A scanning thread looks for new .fec files and adds them to a
+queue that FEC Parser works through:
+ * On Linux, if the pyinotify library is installed
+(https://pypi.org/project/pyinotify/), the scan runs as soon as a file
+is renamed into or finishes being written to the directory. Otherwise
+the directory is scanned every interval seconds.
+ * A file copied into the directory by some other program may not be
+finished when it is first seen, so unless inotify has reported that
+it is complete, a file is queued only once it has gone interval seconds
+without changing.
+ * The queue holds at most queuesize files. When it is full, the scan
+waits for the parser to catch up, and new files simply wait in the
+import directory. FEC Scraper's maxwaiting setting can also hold back
+downloads while too many files are waiting to be parsed.
+
+Iterating over a Watcher yields the path of each file as it is queued.
+When no file is waiting, None is yielded once so the parser can finish
+off the work it has in hand before it waits for more. Iteration stops
+when Ctrl+C is pressed or when no new file has arrived for idle seconds
+(if idle is not 0).
+"""
+
+# Import needed libraries
+import os, glob, time, threading, Queue
+
+# pyinotify is optional
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+class Watcher(object):
+
+    def __init__(self, directory, queuesize=16, interval=2.0, idle=0):
+        self.directory = directory
+        self.queue = Queue.Queue(max(queuesize, 1))
+        self.interval = interval
+        self.idle = idle
+        self.stopped = False
+
+        # Files queued and still in the directory, the size and time of
+        # files not yet settled and files inotify has reported complete
+        self.queued = set()
+        self.pending = {}
+        self.complete = set()
+        self.lock = threading.Lock()
+
+        self.notifier = None
+        if pyinotify is not None:
+            manager = pyinotify.WatchManager()
+            manager.add_watch(directory, pyinotify.IN_MOVED_TO | pyinotify.IN_CLOSE_WRITE)
+            self.notifier = pyinotify.Notifier(manager, self.notify, timeout=int(interval * 1000))
+
+        self.thread = threading.Thread(target=self.watch)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def notify(self, event):
+        if event.pathname.endswith('.fec'):
+            self.lock.acquire()
+            try:
+                self.complete.add(event.pathname)
+            finally:
+                self.lock.release()
+
+    def wait(self):
+        """
+        Wait until the directory should be scanned again.
+        """
+        if self.notifier is not None:
+            if self.notifier.check_events():
+                self.notifier.read_events()
+                self.notifier.process_events()
+        else:
+            time.sleep(self.interval)
+
+    def ready(self, path):
+        """
+        Return True if a file is finished being written.
+        """
+        self.lock.acquire()
+        try:
+            if path in self.complete:
+                self.complete.discard(path)
+                return True
+        finally:
+            self.lock.release()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        state = (stat.st_size, stat.st_mtime)
+        if time.time() - stat.st_mtime >= self.interval or self.pending.get(path) == state:
+            self.pending.pop(path, None)
+            return True
+        self.pending[path] = state
+        return False
+
+    def scan(self):
+        """
+        Queue the new files in the directory. Blocks while the queue is
+        full.
+        """
+        paths = sorted(glob.glob(os.path.join(self.directory, '*.fec')))
+
+        # Files the parser has moved away can be queued again if they
+        # come back
+        self.queued &= set(paths)
+        for path in paths:
+            if path in self.queued or not self.ready(path):
+                continue
+            while not self.stopped:
+                try:
+                    self.queue.put(path, True, 0.5)
+                    break
+                except Queue.Full:
+                    pass
+            self.queued.add(path)
+
+    def watch(self):
+        while not self.stopped:
+            self.scan()
+            self.wait()
+        if self.notifier is not None:
+            self.notifier.stop()
+
+    def __iter__(self):
+        last = time.time()
+        waiting = False
+        try:
+            while True:
+                try:
+                    path = self.queue.get(True, 0.5)
+                except Queue.Empty:
+                    if not waiting:
+                        waiting = True
+                        yield None
+                    if self.idle and time.time() - last >= self.idle:
+                        return
+                    continue
+                last = time.time()
+                waiting = False
+                yield path
+        except KeyboardInterrupt:
+            print '\nStopped watching ' + self.directory + '.'
+        finally:
+            self.close()
+
+    def close(self):
+        self.stopped = True